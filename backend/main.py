@@ -1,12 +1,20 @@
 from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import psycopg
-from psycopg_pool import ConnectionPool
+from psycopg import sql
+from psycopg_pool import AsyncConnectionPool
+from starlette.background import BackgroundTask
+import asyncio
 import os
+import sys
+import json
+from contextlib import asynccontextmanager
 from typing import Optional
 import io
-from datetime import datetime
+import csv
+import tempfile
+from datetime import datetime, timezone
 import xlsxwriter
 
 from dotenv import load_dotenv
@@ -15,30 +23,91 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "2"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "20"))
+PG_POOL_TIMEOUT_SECONDS = float(os.getenv("PG_POOL_TIMEOUT_SECONDS", "30"))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "30000"))
+
 PG_CONNINFO = (
     f"dbname={os.getenv('PG_DBNAME', 'tkis_stockwise')} "
     f"user={os.getenv('PG_USER', 'postgres')} "
     f"password={os.getenv('PG_PASSWORD', '1234')} "
     f"host={os.getenv('PG_HOST', 'localhost')} "
     f"port={os.getenv('PG_PORT', '5432')} "
-    "options='-c client_encoding=UTF8'"
+    f"options='-c client_encoding=UTF8 -c statement_timeout={PG_STATEMENT_TIMEOUT_MS}'"
 )
 
-pool: Optional[ConnectionPool] = None
-
-
-def get_pool() -> ConnectionPool:
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "stockwise_events")
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+MATERIAL_DETAILS_MAX_NAMES = int(os.getenv("MATERIAL_DETAILS_MAX_NAMES", "500"))
+EXPORT_COLUMNS = [
+    "bom_material_name",
+    "item_no",
+    "unit_of_measure",
+    "material_category",
+    "forecast_12w",
+    "wape",
+    "current_stock",
+    "open_order_in_transit",
+    "weeks_of_coverage",
+    "projected_stockout_week",
+    "safety_status",
+]
+EXPORT_HEADERS = [
+    "Material",
+    "Item No",
+    "Unit",
+    "Category",
+    "12W Forecast",
+    "Error Rate (1Y)",
+    "Stock",
+    "In Transit",
+    "Coverage (Weeks)",
+    "Stock-out Week",
+    "Status",
+]
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "20"))
+# /health reports the ETL as stale when the last successful incremental sync is older than this
+ETL_STALE_SECONDS = int(os.getenv("ETL_STALE_SECONDS", "1800"))
+ETL_METRICS_DAYS = int(os.getenv("ETL_METRICS_DAYS", "35"))
+ETL_STAGE_METRICS = [
+    ("duration_seconds", "Duration of the last run of the stage", "duration_ms", 0.001),
+    ("rows", "Rows written by the last run of the stage", "row_count", 1),
+    ("fb_round_trips", "Firebird statements executed by the last run of the stage", "fb_round_trips", 1),
+    ("fb_retries", "Firebird statements retried by the last run of the stage", "fb_retries", 1),
+    ("watermark_lag_hids", "Newest source H_ID minus the synced H_ID watermark", "lag_hids", 1),
+]
+
+pool: Optional[AsyncConnectionPool] = None
+
+
+async def get_pool() -> AsyncConnectionPool:
     global pool
     if pool is None:
-        pool = ConnectionPool(conninfo=PG_CONNINFO, min_size=1, max_size=5, open=True)
+        pool = AsyncConnectionPool(
+            conninfo=PG_CONNINFO,
+            min_size=PG_POOL_MIN_SIZE,
+            max_size=PG_POOL_MAX_SIZE,
+            timeout=PG_POOL_TIMEOUT_SECONDS,
+            open=False,
+        )
+        await pool.open()
     return pool
 
 
-def run_query(sql: str, params=None):
-    with get_pool().connection() as conn:
-        with conn.cursor(row_factory=psycopg.rows.dict_row) as cur:
-            cur.execute(sql, params)
-            return cur.fetchall()
+async def close_pool() -> None:
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+async def run_query(sql: str, params=None):
+    db_pool = await get_pool()
+    async with db_pool.connection() as conn:
+        async with conn.cursor(row_factory=psycopg.rows.dict_row) as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchall()
 
 def build_materials_query(
     category: str,
@@ -48,6 +117,7 @@ def build_materials_query(
     item_no: str | None,
     sort_by: str | None,
     sort_dir: str | None,
+    max_coverage: float | None = None,
 ):
     tr_norm_expr = "lower(translate({col}, 'İIıiŞşĞğÜüÖöÇç', 'iiiissgguuoocc'))"
     tr_norm_param = "lower(translate(%s, 'İIıiŞşĞğÜüÖöÇç', 'iiiissgguuoocc'))"
@@ -58,6 +128,9 @@ def build_materials_query(
         "forecast_12w": "o.forecast_12w",
         "wape": "m.wape",
         "current_stock": "o.current_stock",
+        "open_order_in_transit": "o.open_order_in_transit",
+        "weeks_of_coverage": "o.weeks_of_coverage",
+        "projected_stockout_week": "o.projected_stockout_week",
         "safety_status": "o.safety_status",
     }
     sort_col = sort_map.get(sort_by or "")
@@ -89,24 +162,19 @@ def build_materials_query(
         where.append("o.safety_status = %s")
         params.append(status)
 
+    if max_coverage is not None:
+        # NULL coverage (no forecast demand) never runs out
+        where.append("o.weeks_of_coverage <= %s")
+        params.append(max_coverage)
+
     if supplier:
         where.append(
             """
             EXISTS (
                 SELECT 1
-                FROM core.dashboard_material_variants v
-                LEFT JOIN raw.stock_master sm
-                  ON sm.adi = v.stock_adi
-                WHERE v.bom_material_name = o.bom_material_name
-                  AND %s = ANY (
-                      ARRAY[
-                          sm.tedarikci_1,
-                          sm.tedarikci_2,
-                          sm.tedarikci_3,
-                          sm.tedarikci_4,
-                          sm.tedarikci_5
-                      ]
-                  )
+                FROM core.material_supplier ms
+                WHERE ms.bom_material_name = o.bom_material_name
+                  AND ms.supplier = %s
             )
             """
         )
@@ -142,7 +210,14 @@ def build_materials_query(
     return where_sql, params, order_sql
 
 
-app = FastAPI(title="TKIS Materials API")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await get_pool()
+    yield
+    await close_pool()
+
+
+app = FastAPI(title="TKIS Materials API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -153,18 +228,142 @@ app.add_middleware(
 )
 
 
+async def etl_freshness():
+    try:
+        rows = await run_query(
+            """
+            SELECT k.mode, k.stage, r.finished_at, r.lag_hids
+            FROM (
+                VALUES
+                    ('run_incremental', 'run_incremental'),
+                    ('run_incremental', 'incremental_bom'),
+                    ('run_incremental', 'incremental_stock'),
+                    ('run_weekly', 'run_weekly')
+            ) AS k(mode, stage)
+            LEFT JOIN LATERAL (
+                SELECT
+                    e.started_at + e.duration_ms * INTERVAL '1 millisecond' AS finished_at,
+                    e.lag_hids
+                FROM core.etl_runs e
+                WHERE e.mode = k.mode
+                  AND e.stage = k.stage
+                  AND e.status = 'ok'
+                ORDER BY e.started_at DESC
+                LIMIT 1
+            ) r ON TRUE
+            """
+        )
+    except psycopg.Error:
+        return {"freshness": "unknown"}
+
+    latest = {row["stage"]: row for row in rows}
+    last_sync_at = latest["run_incremental"]["finished_at"]
+    age = (datetime.now(timezone.utc) - last_sync_at).total_seconds() if last_sync_at else None
+    if age is None:
+        freshness = "unknown"
+    elif age > ETL_STALE_SECONDS:
+        freshness = "stale"
+    else:
+        freshness = "fresh"
+    return {
+        "freshness": freshness,
+        "last_sync_at": last_sync_at,
+        "sync_age_seconds": round(age) if age is not None else None,
+        "stale_after_seconds": ETL_STALE_SECONDS,
+        "lag_hids": {
+            "bom": latest["incremental_bom"]["lag_hids"],
+            "stock": latest["incremental_stock"]["lag_hids"],
+        },
+        "last_weekly_at": latest["run_weekly"]["finished_at"],
+    }
+
+
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    return {"status": "ok", "etl": await etl_freshness()}
+
+
+def prometheus_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@app.get("/metrics")
+async def metrics():
+    try:
+        rows = await run_query(
+            """
+            SELECT DISTINCT ON (mode, stage)
+                mode,
+                stage,
+                EXTRACT(EPOCH FROM started_at) AS started_at,
+                duration_ms,
+                row_count,
+                fb_round_trips,
+                fb_retries,
+                lag_hids,
+                status
+            FROM core.etl_runs
+            WHERE started_at > NOW() - make_interval(days => %s)
+            ORDER BY mode, stage, started_at DESC
+            """,
+            (ETL_METRICS_DAYS,),
+        )
+    except psycopg.Error:
+        # missing core.etl_runs or pool timeout: the scrape fails cleanly instead of a 500
+        return PlainTextResponse("# etl metrics unavailable\n", status_code=503, media_type="text/plain; version=0.0.4")
+    lines = []
+    for name, help_text, column, scale in ETL_STAGE_METRICS:
+        lines.append(f"# HELP stockwise_etl_stage_{name} {help_text}")
+        lines.append(f"# TYPE stockwise_etl_stage_{name} gauge")
+        for row in rows:
+            if row[column] is None:
+                continue
+            labels = f'mode="{prometheus_label(row["mode"])}",stage="{prometheus_label(row["stage"])}"'
+            lines.append(f"stockwise_etl_stage_{name}{{{labels}}} {float(row[column]) * scale:g}")
+    lines.append("# HELP stockwise_etl_stage_success Whether the last run of the stage succeeded")
+    lines.append("# TYPE stockwise_etl_stage_success gauge")
+    for row in rows:
+        labels = f'mode="{prometheus_label(row["mode"])}",stage="{prometheus_label(row["stage"])}"'
+        lines.append(f"stockwise_etl_stage_success{{{labels}}} {1 if row['status'] == 'ok' else 0}")
+    lines.append("# HELP stockwise_etl_stage_last_run_timestamp_seconds Start time of the last run of the stage")
+    lines.append("# TYPE stockwise_etl_stage_last_run_timestamp_seconds gauge")
+    for row in rows:
+        labels = f'mode="{prometheus_label(row["mode"])}",stage="{prometheus_label(row["stage"])}"'
+        lines.append(f"stockwise_etl_stage_last_run_timestamp_seconds{{{labels}}} {float(row['started_at']):.0f}")
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+async def stream_events():
+    # Dedicated connection: a LISTEN session is held for the whole stream and
+    # must not occupy one of the query pool slots.
+    async with await psycopg.AsyncConnection.connect(PG_CONNINFO, autocommit=True) as conn:
+        await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(EVENTS_CHANNEL)))
+        yield "retry: 5000\n\n"
+        while True:
+            async for notify in conn.notifies(timeout=EVENTS_KEEPALIVE_SECONDS):
+                view = notify.payload or "all"
+                data = json.dumps({"view": view, "at": datetime.now().isoformat()})
+                yield f"event: {view}\ndata: {data}\n\n"
+            yield ": keepalive\n\n"
+
+
+@app.get("/events")
+async def events():
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/materials")
-def list_materials(
+async def list_materials(
     category: str,
     q: str | None = Query(None, description="Search bom_material_name"),
     status: str | None = Query(None, description="safety_status filter"),
     supplier: str | None = Query(None, description="Filter by supplier"),
     item_no: str | None = Query(None, description="Filter by item_no"),
+    max_coverage: float | None = Query(None, ge=0, description="Only materials with weeks_of_coverage <= this"),
     sort_by: str | None = Query(None, description="Sort column"),
     sort_dir: str | None = Query(None, description="Sort direction (asc/desc)"),
     page: int = Query(1, ge=1),
@@ -178,36 +377,43 @@ def list_materials(
         item_no=item_no,
         sort_by=sort_by,
         sort_dir=sort_dir,
+        max_coverage=max_coverage,
     )
 
-    total = run_query(
-        f"SELECT COUNT(*) AS cnt FROM core.dashboard_material_overview o WHERE {where_sql}",
-        params,
-    )[0]["cnt"]
-
     offset = (page - 1) * page_size
-    rows = run_query(
-        f"""
-        SELECT o.bom_material_name,
-               o.unit_of_measure,
-               o.material_category,
-               o.forecast_12w,
-               m.wape,
-               o.current_stock,
-               o.safety_status,
-               bu.item_no
-        FROM core.dashboard_material_overview o
-        LEFT JOIN core.final_forecast_material_metrics m
-          ON m.bom_material_name = o.bom_material_name
-         AND m.method = 'BEST'
-        LEFT JOIN core.bom_unique_materials bu
-          ON bu.material_name = o.bom_material_name
-        WHERE {where_sql}
-        {order_sql}
-        LIMIT %s OFFSET %s
-        """,
-        params + [page_size, offset],
+    count_rows, rows = await asyncio.gather(
+        run_query(
+            f"SELECT COUNT(*) AS cnt FROM core.dashboard_material_overview o WHERE {where_sql}",
+            params,
+        ),
+        run_query(
+            f"""
+            SELECT o.bom_material_name,
+                   o.unit_of_measure,
+                   o.material_category,
+                   o.forecast_12w,
+                   m.wape,
+                   o.current_stock,
+                   o.open_order_in_transit,
+                   o.weeks_of_coverage,
+                   o.projected_stockout_week,
+                   o.safety_status,
+                   bu.item_no
+            FROM core.dashboard_material_overview o
+            LEFT JOIN core.final_forecast_material_metrics m
+              ON m.bom_material_name = o.bom_material_name
+             AND m.method = 'BEST'
+             AND m.horizon_weeks = 12
+            LEFT JOIN core.bom_unique_materials bu
+              ON bu.material_name = o.bom_material_name
+            WHERE {where_sql}
+            {order_sql}
+            LIMIT %s OFFSET %s
+            """,
+            params + [page_size, offset],
+        ),
     )
+    total = count_rows[0]["cnt"]
 
     return {
         "items": rows,
@@ -218,15 +424,135 @@ def list_materials(
     }
 
 
+def create_materials_workbook(path: str):
+    """Open a constant-memory workbook at path; returns (workbook, write_rows)."""
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Material List")
+
+    header_fmt = workbook.add_format({"bold": True, "bg_color": "#111827", "font_color": "#FFFFFF"})
+    num_fmt = workbook.add_format({"num_format": "0.00"})
+    status_formats = {
+        "CRITICAL": workbook.add_format({"bg_color": "#FCA5A5", "font_color": "#7F1D1D"}),
+        "MEDIUM": workbook.add_format({"bg_color": "#FDE68A", "font_color": "#78350F"}),
+        "SAFE": workbook.add_format({"bg_color": "#BBF7D0", "font_color": "#065F46"}),
+        "EN_BILGISI_EKSIK": workbook.add_format({"bg_color": "#BFDBFE", "font_color": "#1D4ED8"}),
+    }
+    status_num_formats = {
+        "CRITICAL": workbook.add_format({"bg_color": "#FCA5A5", "font_color": "#7F1D1D", "num_format": "0.00"}),
+        "MEDIUM": workbook.add_format({"bg_color": "#FDE68A", "font_color": "#78350F", "num_format": "0.00"}),
+        "SAFE": workbook.add_format({"bg_color": "#BBF7D0", "font_color": "#065F46", "num_format": "0.00"}),
+        "EN_BILGISI_EKSIK": workbook.add_format({"bg_color": "#BFDBFE", "font_color": "#1D4ED8", "num_format": "0.00"}),
+    }
+
+    worksheet.set_column(0, 0, 40)
+    worksheet.set_column(1, 1, 14)
+    worksheet.set_column(2, 2, 10)
+    worksheet.set_column(3, 3, 12)
+    worksheet.set_column(4, 8, 16)
+    worksheet.set_column(9, 10, 14)
+    worksheet.write_row(0, 0, EXPORT_HEADERS, header_fmt)
+
+    next_row = 1
+
+    # constant_memory flushes each row as soon as the next one starts, so
+    # rows must be written strictly in order.
+    def write_rows(rows) -> None:
+        nonlocal next_row
+        for row in rows:
+            idx = next_row
+            next_row += 1
+            status = row.get("safety_status") or ""
+            row_fmt = status_formats.get(status)
+            row_num_fmt = status_num_formats.get(status, num_fmt)
+
+            worksheet.write(idx, 0, row["bom_material_name"] or "", row_fmt)
+            worksheet.write(idx, 1, row.get("item_no") or "", row_fmt)
+            worksheet.write(idx, 2, row.get("unit_of_measure") or "", row_fmt)
+            worksheet.write(idx, 3, row.get("material_category") or "", row_fmt)
+            if row.get("forecast_12w") is None:
+                worksheet.write(idx, 4, "", row_fmt)
+            else:
+                worksheet.write_number(idx, 4, float(row["forecast_12w"]), row_num_fmt)
+            if row.get("wape") is None:
+                worksheet.write(idx, 5, "", row_fmt)
+            else:
+                worksheet.write_number(idx, 5, float(row["wape"]), row_num_fmt)
+            if row.get("current_stock") is None:
+                worksheet.write(idx, 6, "", row_fmt)
+            else:
+                worksheet.write_number(idx, 6, float(row["current_stock"]), row_num_fmt)
+            if row.get("open_order_in_transit") is None:
+                worksheet.write(idx, 7, "", row_fmt)
+            else:
+                worksheet.write_number(idx, 7, float(row["open_order_in_transit"]), row_num_fmt)
+            if row.get("weeks_of_coverage") is None:
+                worksheet.write(idx, 8, "", row_fmt)
+            else:
+                worksheet.write_number(idx, 8, float(row["weeks_of_coverage"]), row_num_fmt)
+            stockout = row.get("projected_stockout_week")
+            worksheet.write(idx, 9, stockout.isoformat() if stockout else "", row_fmt)
+            if row_fmt:
+                worksheet.write(idx, 10, status, row_fmt)
+            else:
+                worksheet.write(idx, 10, status)
+
+    return workbook, write_rows
+
+
+async def iter_query_batches(sql: str, params=None, batch_size: int = EXPORT_FETCH_SIZE):
+    """Yield row batches from a server-side cursor without materializing the result."""
+    db_pool = await get_pool()
+    async with db_pool.connection() as conn:
+        async with conn.cursor(name="materials_export", row_factory=psycopg.rows.dict_row) as cur:
+            cur.itersize = batch_size
+            await cur.execute(sql, params)
+            while True:
+                rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+async def build_materials_xlsx(sql: str, params) -> str:
+    fd, path = tempfile.mkstemp(prefix="material_list_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook, write_rows = await asyncio.to_thread(create_materials_workbook, path)
+        async for rows in iter_query_batches(sql, params):
+            await asyncio.to_thread(write_rows, rows)
+        await asyncio.to_thread(workbook.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+async def stream_materials_csv(sql: str, params):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # BOM so Excel detects UTF-8 for Turkish material names
+    buf.write("\ufeff")
+    writer.writerow(EXPORT_HEADERS)
+    yield buf.getvalue().encode("utf-8")
+    async for rows in iter_query_batches(sql, params):
+        buf.seek(0)
+        buf.truncate()
+        for row in rows:
+            writer.writerow([row.get(col) if row.get(col) is not None else "" for col in EXPORT_COLUMNS])
+        yield buf.getvalue().encode("utf-8")
+
+
 @app.get("/materials-export")
-def export_materials(
+async def export_materials(
     category: str,
     q: str | None = Query(None),
     status: str | None = Query(None),
     supplier: str | None = Query(None),
     item_no: str | None = Query(None),
+    max_coverage: float | None = Query(None, ge=0),
     sort_by: str | None = Query(None),
     sort_dir: str | None = Query(None),
+    export_format: str = Query("xlsx", alias="format", pattern="^(xlsx|csv)$", description="Export format (xlsx/csv)"),
 ):
     where_sql, params, order_sql = build_materials_query(
         category=category,
@@ -236,9 +562,9 @@ def export_materials(
         item_no=item_no,
         sort_by=sort_by,
         sort_dir=sort_dir,
+        max_coverage=max_coverage,
     )
-    rows = run_query(
-        f"""
+    export_sql = f"""
         SELECT o.bom_material_name,
                bu.item_no,
                o.unit_of_measure,
@@ -246,98 +572,138 @@ def export_materials(
                o.forecast_12w,
                m.wape,
                o.current_stock,
+               o.open_order_in_transit,
+               o.weeks_of_coverage,
+               o.projected_stockout_week,
                o.safety_status
         FROM core.dashboard_material_overview o
         LEFT JOIN core.final_forecast_material_metrics m
           ON m.bom_material_name = o.bom_material_name
          AND m.method = 'BEST'
+         AND m.horizon_weeks = 12
         LEFT JOIN core.bom_unique_materials bu
           ON bu.material_name = o.bom_material_name
         WHERE {where_sql}
         {order_sql}
-        """,
-        params,
-    )
-
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
-    worksheet = workbook.add_worksheet("Material List")
+    """
 
-    header_fmt = workbook.add_format({"bold": True, "bg_color": "#111827", "font_color": "#FFFFFF"})
-    num_fmt = workbook.add_format({"num_format": "0.00"})
-    status_formats = {
-        "CRITICAL": workbook.add_format({"bg_color": "#FCA5A5", "font_color": "#7F1D1D"}),
-        "MEDIUM": workbook.add_format({"bg_color": "#FDE68A", "font_color": "#78350F"}),
-        "SAFE": workbook.add_format({"bg_color": "#BBF7D0", "font_color": "#065F46"}),
-        "EN_BILGISI_EKSIK": workbook.add_format({"bg_color": "#BFDBFE", "font_color": "#1D4ED8"}),
-    }
-    status_num_formats = {
-        "CRITICAL": workbook.add_format({"bg_color": "#FCA5A5", "font_color": "#7F1D1D", "num_format": "0.00"}),
-        "MEDIUM": workbook.add_format({"bg_color": "#FDE68A", "font_color": "#78350F", "num_format": "0.00"}),
-        "SAFE": workbook.add_format({"bg_color": "#BBF7D0", "font_color": "#065F46", "num_format": "0.00"}),
-        "EN_BILGISI_EKSIK": workbook.add_format({"bg_color": "#BFDBFE", "font_color": "#1D4ED8", "num_format": "0.00"}),
-    }
+    stamp = datetime.now().strftime("%Y-%m-%d")
+    if export_format == "csv":
+        filename = f"material_list_{stamp}.csv"
+        headers = {"Content-Disposition": f'attachment; filename=\"{filename}\"'}
+        return StreamingResponse(
+            stream_materials_csv(export_sql, params),
+            media_type="text/csv; charset=utf-8",
+            headers=headers,
+        )
 
-    headers = [
-        "Material",
-        "Item No",
-        "Unit",
-        "Category",
-        "12W Forecast",
-        "Error Rate (1Y)",
-        "Stock",
-        "Status",
-    ]
-    worksheet.write_row(0, 0, headers, header_fmt)
-
-    for idx, row in enumerate(rows, start=1):
-        status = row.get("safety_status") or ""
-        row_fmt = status_formats.get(status)
-        row_num_fmt = status_num_formats.get(status, num_fmt)
-
-        worksheet.write(idx, 0, row["bom_material_name"] or "", row_fmt)
-        worksheet.write(idx, 1, row.get("item_no") or "", row_fmt)
-        worksheet.write(idx, 2, row.get("unit_of_measure") or "", row_fmt)
-        worksheet.write(idx, 3, row.get("material_category") or "", row_fmt)
-        if row.get("forecast_12w") is None:
-            worksheet.write(idx, 4, "", row_fmt)
-        else:
-            worksheet.write_number(idx, 4, float(row["forecast_12w"]), row_num_fmt)
-        if row.get("wape") is None:
-            worksheet.write(idx, 5, "", row_fmt)
-        else:
-            worksheet.write_number(idx, 5, float(row["wape"]), row_num_fmt)
-        if row.get("current_stock") is None:
-            worksheet.write(idx, 6, "", row_fmt)
-        else:
-            worksheet.write_number(idx, 6, float(row["current_stock"]), row_num_fmt)
-        if row_fmt:
-            worksheet.write(idx, 7, status, row_fmt)
-        else:
-            worksheet.write(idx, 7, status)
+    path = await build_materials_xlsx(export_sql, params)
+    # removed by the response's background task, no generator cleanup that may never start
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=f"material_list_{stamp}.xlsx",
+        background=BackgroundTask(os.remove, path),
+    )
 
-    worksheet.set_column(0, 0, 40)
-    worksheet.set_column(1, 1, 14)
-    worksheet.set_column(2, 2, 10)
-    worksheet.set_column(3, 3, 12)
-    worksheet.set_column(4, 6, 16)
-    worksheet.set_column(7, 7, 14)
 
-    workbook.close()
-    output.seek(0)
-    stamp = datetime.now().strftime("%Y-%m-%d")
-    filename = f"material_list_{stamp}.xlsx"
-    headers = {"Content-Disposition": f'attachment; filename=\"{filename}\"'}
-    return Response(
-        content=output.read(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers=headers,
+@app.get("/materials/details")
+async def material_details(
+    names: list[str] = Query(..., alias="name", description="bom_material_name (repeatable)"),
+):
+    names = [n for n in dict.fromkeys(names) if n]
+    if not names:
+        raise HTTPException(status_code=400, detail="At least one material name is required")
+    if len(names) > MATERIAL_DETAILS_MAX_NAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MATERIAL_DETAILS_MAX_NAMES} material names per request",
+        )
+    rows = await run_query(
+        """
+        WITH selected AS (
+            SELECT name AS bom_material_name, ord
+            FROM UNNEST(%s::text[]) WITH ORDINALITY AS t(name, ord)
+        ),
+        variants AS (
+            SELECT
+                v.bom_material_name,
+                v.stock_adi,
+                v.warehouse,
+                v.current_stock,
+                v.stock_uom,
+                v.open_order_in_transit,
+                COALESCE(CAST(bu.item_no AS TEXT), CAST(sm.turu3 AS TEXT)) AS item_no,
+                sm.tedarikci_1,
+                sm.tedarikci_2,
+                sm.tedarikci_3,
+                sm.tedarikci_4,
+                sm.tedarikci_5
+            FROM core.dashboard_material_variants v
+            JOIN selected s
+              ON s.bom_material_name = v.bom_material_name
+            LEFT JOIN raw.stock_master sm
+              ON sm.adi = v.stock_adi
+            LEFT JOIN core.bom_unique_materials bu
+              ON bu.material_name = v.stock_adi
+        ),
+        suppliers AS (
+            SELECT ms.bom_material_name, ms.supplier
+            FROM core.material_supplier ms
+            JOIN selected s
+              ON s.bom_material_name = ms.bom_material_name
+        ),
+        flow AS (
+            SELECT
+                f.bom_material_name,
+                f.stock_adi,
+                f.warehouse,
+                f.w22_out_qty,
+                f.w22_out_uom,
+                f.seat_consumed_qty,
+                f.seat_consumed_uom,
+                f.count_end_date
+            FROM core.dashboard_material_flow_observation f
+            JOIN selected s
+              ON s.bom_material_name = f.bom_material_name
+        )
+        SELECT
+            s.bom_material_name,
+            COALESCE(
+                (
+                    SELECT jsonb_agg(to_jsonb(v) - 'bom_material_name' ORDER BY v.stock_adi, v.warehouse)
+                    FROM variants v
+                    WHERE v.bom_material_name = s.bom_material_name
+                ),
+                '[]'::jsonb
+            ) AS variants,
+            COALESCE(
+                (
+                    SELECT jsonb_agg(x.supplier ORDER BY x.supplier)
+                    FROM suppliers x
+                    WHERE x.bom_material_name = s.bom_material_name
+                ),
+                '[]'::jsonb
+            ) AS suppliers,
+            COALESCE(
+                (
+                    SELECT jsonb_agg(to_jsonb(f) ORDER BY f.warehouse, f.stock_adi)
+                    FROM flow f
+                    WHERE f.bom_material_name = s.bom_material_name
+                ),
+                '[]'::jsonb
+            ) AS flow_observation
+        FROM selected s
+        ORDER BY s.ord
+        """,
+        (names,),
     )
+    return {"items": rows}
 
 
 @app.get("/materials/{material_name:path}/variants")
-def material_variants(material_name: str):
-    rows = run_query(
+async def material_variants(material_name: str):
+    rows = await run_query(
         """
         SELECT
             v.stock_adi,
@@ -367,27 +733,12 @@ def material_variants(material_name: str):
 
 
 @app.get("/materials/{material_name:path}/suppliers")
-def material_suppliers(material_name: str):
-    rows = run_query(
+async def material_suppliers(material_name: str):
+    rows = await run_query(
         """
-        SELECT DISTINCT supplier
-        FROM (
-            SELECT UNNEST(
-                ARRAY[
-                    sm.tedarikci_1,
-                    sm.tedarikci_2,
-                    sm.tedarikci_3,
-                    sm.tedarikci_4,
-                    sm.tedarikci_5
-                ]
-            ) AS supplier
-            FROM core.dashboard_material_variants v
-            LEFT JOIN raw.stock_master sm
-              ON sm.adi = v.stock_adi
-            WHERE v.bom_material_name = %s
-        ) s
-        WHERE supplier IS NOT NULL
-          AND supplier <> ''
+        SELECT supplier
+        FROM core.material_supplier
+        WHERE bom_material_name = %s
         ORDER BY supplier
         """,
         (material_name,),
@@ -396,24 +747,11 @@ def material_suppliers(material_name: str):
 
 
 @app.get("/suppliers")
-def list_suppliers():
-    rows = run_query(
+async def list_suppliers():
+    rows = await run_query(
         """
         SELECT DISTINCT supplier
-        FROM (
-            SELECT UNNEST(
-                ARRAY[
-                    tedarikci_1,
-                    tedarikci_2,
-                    tedarikci_3,
-                    tedarikci_4,
-                    tedarikci_5
-                ]
-            ) AS supplier
-            FROM raw.stock_master
-        ) s
-        WHERE supplier IS NOT NULL
-          AND supplier <> ''
+        FROM core.stock_supplier
         ORDER BY supplier
         """
     )
@@ -421,8 +759,8 @@ def list_suppliers():
 
 
 @app.get("/materials/{material_name:path}/flow-observation")
-def material_flow_observation(material_name: str):
-    rows = run_query(
+async def material_flow_observation(material_name: str):
+    rows = await run_query(
         """
         SELECT
             bom_material_name,
@@ -443,7 +781,7 @@ def material_flow_observation(material_name: str):
 
 
 @app.get("/forecast-details")
-def list_forecast_details(
+async def list_forecast_details(
     category: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=500),
@@ -459,18 +797,14 @@ def list_forecast_details(
 
     where_sql = " AND ".join(where)
 
-    total = run_query(
-        f"""
+    count_sql = f"""
         SELECT COUNT(*) AS cnt
         FROM core.final_forecast_category_unit_metrics
         WHERE {where_sql}
-        """,
-        params,
-    )[0]["cnt"]
+    """
 
     offset = (page - 1) * page_size
-    category_unit_rows = run_query(
-        f"""
+    category_unit_sql = f"""
         SELECT
             bom_material_category,
             bom_unit_of_measure,
@@ -482,16 +816,18 @@ def list_forecast_details(
         WHERE {where_sql}
         ORDER BY wape NULLS LAST, bom_unit_of_measure
         LIMIT %s OFFSET %s
-        """,
-        params + [page_size, offset],
-    )
-    overall_rows = run_query(
-        """
+    """
+    overall_sql = """
         SELECT scope, wape, mae, actual_sum, n_points
         FROM core.final_forecast_overall_metrics
         ORDER BY scope
-        """
+    """
+    count_rows, category_unit_rows, overall_rows = await asyncio.gather(
+        run_query(count_sql, params),
+        run_query(category_unit_sql, params + [page_size, offset]),
+        run_query(overall_sql),
     )
+    total = count_rows[0]["cnt"]
 
     return {
         "category_unit": category_unit_rows,
@@ -504,8 +840,8 @@ def list_forecast_details(
 
 
 @app.get("/forecast-meta")
-def forecast_meta():
-    rows = run_query(
+async def forecast_meta():
+    rows = await run_query(
         """
         SELECT MIN(week_start) AS first_forecast_date,
                MAX(week_start) AS last_forecast_date
@@ -518,7 +854,7 @@ def forecast_meta():
 
 
 @app.get("/open-orders")
-def list_open_orders(
+async def list_open_orders(
     q: str | None = Query(None, description="Search material name/label"),
     h_id: str | None = Query(None, description="Search by h_id"),
     page: int = Query(1, ge=1),
@@ -542,115 +878,15 @@ def list_open_orders(
     where_sql = " AND ".join(where)
     where_clause = f"WHERE {where_sql}" if where_sql else ""
 
-    total = run_query(
-        f"""
-        WITH open_orders AS (
-            SELECT
-                h_id,
-                hs_id,
-                transaction_date,
-                company_code,
-                document_type,
-                movement_status,
-                material_name,
-                material_label,
-                material_category,
-                item_no,
-                unit_of_measure,
-                SUM(quantity) AS open_qty
-            FROM raw.raw_open_order_movements
-            GROUP BY
-                h_id, hs_id, transaction_date, company_code, document_type, movement_status,
-                material_name, material_label, material_category, item_no, unit_of_measure
-        )
+    count_sql = f"""
         SELECT COUNT(*) AS cnt
-        FROM open_orders o
+        FROM core.open_order_lines o
         {where_clause}
-        """,
-        params,
-    )[0]["cnt"]
+    """
 
     offset = (page - 1) * page_size
-    rows = run_query(
-        f"""
-        WITH open_orders AS (
-            SELECT
-                h_id,
-                hs_id,
-                transaction_date,
-                company_code,
-                document_type,
-                movement_status,
-                material_name,
-                material_label,
-                material_category,
-                item_no,
-                unit_of_measure,
-                CASE
-                    WHEN unit_of_measure = 'PktAdtMt' THEN 'Mt'
-                    WHEN unit_of_measure = 'PktAdt' THEN 'Adet'
-                    ELSE unit_of_measure
-                END AS unit_norm,
-                SUM(quantity) AS open_qty
-            FROM raw.raw_open_order_movements
-            GROUP BY
-                h_id, hs_id, transaction_date, company_code, document_type, movement_status,
-                material_name, material_label, material_category, item_no, unit_of_measure, unit_norm
-        ),
-        open_orders_with_next AS (
-            SELECT
-                o.*,
-                LEAD(o.transaction_date) OVER (
-                    PARTITION BY o.material_name, o.unit_norm
-                    ORDER BY o.transaction_date, o.h_id
-                ) AS next_order_date
-            FROM open_orders o
-        ),
-        matched_receipts AS (
-            SELECT
-                r.ref_hid AS h_id,
-                r.material_name,
-                CASE
-                    WHEN r.unit_of_measure = 'PktAdtMt' THEN 'Mt'
-                    WHEN r.unit_of_measure = 'PktAdt' THEN 'Adet'
-                    ELSE r.unit_of_measure
-                END AS unit_norm,
-                SUM(r.quantity) AS matched_qty,
-                ARRAY_AGG(DISTINCT r.h_id) AS received_hids
-            FROM raw.raw_stock_movements r
-            JOIN open_orders_with_next o
-              ON o.h_id = r.ref_hid
-             AND o.material_name = r.material_name
-             AND o.unit_norm = CASE
-                    WHEN r.unit_of_measure = 'PktAdtMt' THEN 'Mt'
-                    WHEN r.unit_of_measure = 'PktAdt' THEN 'Adet'
-                    ELSE r.unit_of_measure
-                END
-             AND r.transaction_date >= o.transaction_date
-            WHERE r.ref_hid IS NOT NULL
-              AND r.document_type LIKE 'Depo Giri%%'
-              AND r.company_code = 'WAREHOUSE22'
-            GROUP BY
-                r.ref_hid,
-                r.material_name,
-                CASE
-                    WHEN r.unit_of_measure = 'PktAdtMt' THEN 'Mt'
-                    WHEN r.unit_of_measure = 'PktAdt' THEN 'Adet'
-                    ELSE r.unit_of_measure
-                END
-        ),
-        open_orders_enriched AS (
-            SELECT
-                o.*,
-                COALESCE(m.matched_qty, 0) AS matched_qty,
-                m.received_hids,
-                GREATEST(o.open_qty - COALESCE(m.matched_qty, 0), 0) AS residual_open
-            FROM open_orders_with_next o
-            LEFT JOIN matched_receipts m
-              ON m.h_id = o.h_id
-             AND m.material_name = o.material_name
-             AND m.unit_norm = o.unit_norm
-        )
+    # receipt matching lives in the core.open_order_lines view, shared with the dashboard build
+    rows_sql = f"""
         SELECT
             o.h_id,
             o.hs_id,
@@ -667,13 +903,16 @@ def list_open_orders(
             o.matched_qty AS received_qty,
             o.residual_open AS remaining_qty,
             o.received_hids
-        FROM open_orders_enriched o
+        FROM core.open_order_lines o
         {where_clause}
         ORDER BY o.transaction_date DESC, o.h_id
         LIMIT %s OFFSET %s
-        """,
-        params + [page_size, offset],
+    """
+    count_rows, rows = await asyncio.gather(
+        run_query(count_sql, params),
+        run_query(rows_sql, params + [page_size, offset]),
     )
+    total = count_rows[0]["cnt"]
 
     return {
         "items": rows,
@@ -682,3 +921,16 @@ def list_open_orders(
         "total": total,
         "total_pages": (total - 1) // page_size + 1 if total else 0,
     }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    if sys.platform == "win32":
+        # psycopg's async driver cannot run on the default Proactor event loop.
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    uvicorn.run(
+        app,
+        host=os.getenv("API_HOST", "127.0.0.1"),
+        port=int(os.getenv("API_PORT", "8000")),
+    )
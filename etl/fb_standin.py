@@ -0,0 +1,351 @@
+"""
+Local stand-in for the Firebird source used by raw_sync.
+
+Selected with FB_SOURCE=sqlite:<path>. The SQLite file mirrors the columns raw_sync reads
+from HAREKETLER, HAREKET_SATIR, STOK_KARTI and STOK_TURLER. The RECETE_STORSCREEN(?)
+stored procedure is emulated by the RECETE_STORSCREEN_ROWS table (one row per recipe
+line, keyed by H_ID). generate() builds a deterministic data set and append_activity()
+adds newer documents so the incremental loop has something to pick up.
+"""
+import logging
+import os
+import random
+import re
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+LOG = logging.getLogger("raw_sync")
+
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+
+# statements executed through any stand-in connection (round trips in the real source)
+STATEMENTS = 0
+
+RECETE_CALL_RE = re.compile(r"RECETE_STORSCREEN\s*\(\s*\?\s*\)", re.IGNORECASE)
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS HAREKETLER (
+    H_ID     INTEGER PRIMARY KEY,
+    TARIH    DATE,
+    TIPI     TEXT,
+    DURUM    TEXT,
+    FIRMA    TEXT,
+    REF_HID  INTEGER,
+    HTIPI    INTEGER,
+    HDURUM   INTEGER
+);
+CREATE INDEX IF NOT EXISTS IX_HAREKETLER_HTIPI_TARIH ON HAREKETLER (HTIPI, TARIH);
+
+CREATE TABLE IF NOT EXISTS HAREKET_SATIR (
+    HS_ID          INTEGER PRIMARY KEY,
+    H_ID           INTEGER,
+    URUN_TURU      TEXT,
+    URUN_KODU      TEXT,
+    BIRIM          TEXT,
+    TOPLAM_MIKTAR  NUMERIC
+);
+CREATE INDEX IF NOT EXISTS IX_HAREKET_SATIR_HID ON HAREKET_SATIR (H_ID);
+
+CREATE TABLE IF NOT EXISTS STOK_KARTI (
+    S_ID      INTEGER PRIMARY KEY,
+    ADI       TEXT,
+    TAM_ADI   TEXT,
+    ANA_GRUP  TEXT,
+    ALT_GRUP  TEXT,
+    BIRIM     TEXT,
+    TURU      TEXT,
+    TURU2     TEXT,
+    TURU3     TEXT
+);
+CREATE INDEX IF NOT EXISTS IX_STOK_KARTI_ADI ON STOK_KARTI (ADI);
+
+CREATE TABLE IF NOT EXISTS STOK_TURLER (
+    S_ID         INTEGER,
+    ADI          TEXT,
+    RENK_ID      INTEGER,
+    ACIKLAMA     TEXT,
+    ENI          NUMERIC,
+    BOYU         NUMERIC,
+    AGIRLIK      NUMERIC,
+    ANA_TUR      TEXT,
+    TEDARIKCI_1  TEXT,
+    TEDARIKCI_2  TEXT,
+    TEDARIKCI_3  TEXT,
+    TEDARIKCI_4  TEXT,
+    TEDARIKCI_5  TEXT,
+    RECETE_1     TEXT,
+    RECETE_2     TEXT,
+    RECETE_3     TEXT,
+    RECETE_4     TEXT,
+    RECETE_5     TEXT,
+    RECETE_6     TEXT,
+    RECETE_7     TEXT,
+    KATOLOG      TEXT,
+    KUMAS_EN     NUMERIC,
+    KUMAS_BOY    NUMERIC,
+    SURE_1       NUMERIC,
+    SURE_2       NUMERIC,
+    EK_1         TEXT,
+    EK_2         TEXT,
+    EK_3         TEXT
+);
+CREATE INDEX IF NOT EXISTS IX_STOK_TURLER_ADI ON STOK_TURLER (ADI);
+
+CREATE TABLE IF NOT EXISTS RECETE_STORSCREEN_ROWS (
+    H_ID      INTEGER,
+    ANAGRUP   TEXT,
+    URUN      TEXT,
+    TURU      TEXT,
+    SBUP_ADI  TEXT,
+    MIKTAR    NUMERIC,
+    BIRIM     TEXT,
+    RMEK      TEXT,
+    RITEM     TEXT,
+    HSID      INTEGER
+);
+CREATE INDEX IF NOT EXISTS IX_RECETE_STORSCREEN_ROWS_HID ON RECETE_STORSCREEN_ROWS (H_ID);
+"""
+
+COLORS = ["BEYAZ", "KREM", "GRI", "ANTRASIT", "BEJ", "MAVI", "YESIL", "SIYAH", "KAHVE", "PEMBE"]
+CATEGORIES = [("KUMAŞ", "Mt2", 0.45), ("PROFİL", "Mt", 0.30), ("AKSESUAR", "Adet", 0.25)]
+SEAT_WAREHOUSES = ["JALUZİ KOLTUK DEPO", "KATLAMALI KOLTUK DEPO", "STOR KOLTUK DEPO"]
+SUPPLIERS = ["TEDARIKCI A", "TEDARIKCI B", "TEDARIKCI C", "TEDARIKCI D"]
+PRODUCTS = ["STOR", "ZEBRA", "JALUZI", "KATLAMALI"]
+
+
+class StandinCursor:
+    """DB-API cursor that rewrites the Firebird-only syntax raw_sync uses."""
+
+    def __init__(self, conn: "StandinConnection"):
+        self._cur = conn.raw.cursor()
+
+    def execute(self, sql: str, params: Sequence[object] = ()):
+        global STATEMENTS
+        sql = RECETE_CALL_RE.sub("(SELECT * FROM RECETE_STORSCREEN_ROWS WHERE H_ID = ?)", sql)
+        STATEMENTS += 1
+        self._cur.execute(sql, tuple(_adapt(p) for p in params))
+        return self
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchmany(self, size: int = 1000):
+        return self._cur.fetchmany(size)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def close(self) -> None:
+        self._cur.close()
+
+
+class StandinConnection:
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Firebird stand-in database not found: {path} (create it with fb_standin.generate)")
+        self.path = path
+        self.raw = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+
+    def cursor(self) -> StandinCursor:
+        return StandinCursor(self)
+
+    def close(self) -> None:
+        self.raw.close()
+
+
+def _adapt(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def connect(path: str) -> StandinConnection:
+    LOG.info("Connecting to Firebird stand-in (SQLite) %s", path)
+    return StandinConnection(path)
+
+
+def material_names(count: int) -> List[Dict[str, object]]:
+    materials = []
+    for i in range(count):
+        category, uom, _ = CATEGORIES[i % len(CATEGORIES)]
+        color = COLORS[i % len(COLORS)]
+        tag = "KUMAS" if category == "KUMAŞ" else category[:3]
+        materials.append({
+            "name": f"{color}-{tag}-{i:04d}",
+            "category": category,
+            "uom": uom,
+            "color": color,
+            "item_no": "" if category == "KUMAŞ" else f"IT{i % 40:03d}",
+        })
+    return materials
+
+
+def _create(conn: sqlite3.Connection) -> None:
+    conn.executescript(SCHEMA_SQL)
+
+
+def _stock_cards(conn: sqlite3.Connection, materials: List[Dict[str, object]], rng: random.Random) -> None:
+    kart_rows = []
+    tur_rows = []
+    s_id = 1
+    for m in materials:
+        variants = 2 if m["category"] == "KUMAŞ" else 1
+        for v in range(variants):
+            adi = m["name"] if v == 0 else f"{m['name']}-V{v}"
+            stock_uom = "Mt" if m["category"] == "KUMAŞ" else m["uom"]
+            width = str(rng.choice([180, 200, 250, 280, 300])) if m["category"] == "KUMAŞ" else ""
+            kart_rows.append((
+                s_id, f"LBL-{adi}", adi, m["category"], m["category"], stock_uom, m["category"], m["category"], m["item_no"],
+            ))
+            suppliers = rng.sample(SUPPLIERS, 2)
+            tur_rows.append((
+                s_id, adi, COLORS.index(m["color"]), adi, 0, 0, 0, m["category"],
+                suppliers[0], suppliers[1], None, None, None,
+                None, None, None, None, None, None, None,
+                None, width or None, None, 0, 0,
+                m["color"], width, None,
+            ))
+            s_id += 1
+    conn.executemany("INSERT INTO STOK_KARTI VALUES (?,?,?,?,?,?,?,?,?)", kart_rows)
+    conn.executemany(f"INSERT INTO STOK_TURLER VALUES ({','.join('?' * 28)})", tur_rows)
+
+
+def _next_ids(conn: sqlite3.Connection) -> Dict[str, int]:
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(H_ID), 0) FROM HAREKETLER")
+    h_id = cur.fetchone()[0]
+    cur.execute("SELECT COALESCE(MAX(HS_ID), 0) FROM HAREKET_SATIR")
+    hs_id = cur.fetchone()[0]
+    cur.execute("SELECT COALESCE(MAX(HSID), 0) FROM RECETE_STORSCREEN_ROWS")
+    recete_id = cur.fetchone()[0]
+    return {"h_id": h_id + 1, "hs_id": hs_id + 1, "recete": recete_id + 1}
+
+
+def _load_materials(conn: sqlite3.Connection) -> List[Dict[str, object]]:
+    cur = conn.cursor()
+    cur.execute("SELECT ADI, ANA_TUR, EK_1, S_ID FROM STOK_TURLER WHERE ADI NOT LIKE '%-V_' ORDER BY S_ID")
+    rows = cur.fetchall()
+    uoms = {c: u for c, u, _ in CATEGORIES}
+    cur.execute("SELECT TAM_ADI, TURU3 FROM STOK_KARTI")
+    item_nos = dict(cur.fetchall())
+    return [
+        {"name": adi, "category": cat, "uom": uoms.get(cat, "Adet"), "color": color, "item_no": item_nos.get(adi) or ""}
+        for adi, cat, color, _ in rows
+    ]
+
+
+def _activity(
+    conn: sqlite3.Connection,
+    materials: List[Dict[str, object]],
+    start: date,
+    days: int,
+    orders_per_day: int,
+    rng: random.Random,
+) -> Dict[str, int]:
+    ids = _next_ids(conn)
+    weights = [w for _, _, w in CATEGORIES]
+    by_category = {c: [m for m in materials if m["category"] == c] for c, _, _ in CATEGORIES}
+    headers, lines, recete = [], [], []
+    open_orders: List[int] = []
+
+    for day in range(days):
+        d = start + timedelta(days=day)
+        if d.weekday() == 6:
+            continue
+
+        # production orders + recipe lines (RECETE_STORSCREEN)
+        for _ in range(max(1, int(rng.gauss(orders_per_day, orders_per_day * 0.2)))):
+            h_id = ids["h_id"]
+            ids["h_id"] += 1
+            headers.append((h_id, d, "Üretim", rng.choice(["Aktif", "Son"]), f"MUSTERI {rng.randint(1, 300):03d}", None, rng.choice([21, 22]), 0))
+            for _ in range(rng.randint(2, 6)):
+                category = rng.choices([c for c, _, _ in CATEGORIES], weights=weights)[0]
+                m = rng.choice(by_category[category])
+                qty = round(rng.uniform(0.2, 4.0), 3) if category != "AKSESUAR" else rng.randint(1, 8)
+                recete.append((
+                    h_id, rng.choice(PRODUCTS), m["category"], m["name"], f"SBUP {rng.randint(1, 20)}",
+                    qty, m["uom"], rng.choice(["5019", "Z5004", "1000", "2000", "3000"]), m["item_no"], ids["recete"],
+                ))
+                ids["recete"] += 1
+
+        # purchase orders (open orders: HTIPI 10 / HDURUM 34)
+        for _ in range(rng.randint(0, 3)):
+            h_id = ids["h_id"]
+            ids["h_id"] += 1
+            headers.append((h_id, d, "Sipariş", "Sipar", rng.choice(SUPPLIERS), None, 10, 34))
+            open_orders.append(h_id)
+            for _ in range(rng.randint(1, 4)):
+                m = rng.choice(materials)
+                lines.append((ids["hs_id"], h_id, m["name"], f"LBL-{m['name']}", "Mt" if m["category"] == "KUMAŞ" else m["uom"], round(rng.uniform(50, 500), 2)))
+                ids["hs_id"] += 1
+
+        # warehouse movements (HTIPI 50 in / 51 out), receipts reference an open order
+        for _ in range(rng.randint(5, 15)):
+            inbound = rng.random() < 0.35
+            h_id = ids["h_id"]
+            ids["h_id"] += 1
+            ref_hid = rng.choice(open_orders) if inbound and open_orders and rng.random() < 0.6 else None
+            headers.append((
+                h_id, d, "Depo Giriş" if inbound else "Depo Çıkış", "Aktif", "WAREHOUSE22", ref_hid, 50 if inbound else 51, 0,
+            ))
+            for _ in range(rng.randint(1, 5)):
+                m = rng.choice(materials)
+                lines.append((ids["hs_id"], h_id, m["name"], f"LBL-{m['name']}", "Mt" if m["category"] == "KUMAŞ" else m["uom"], round(rng.uniform(1, 120), 2)))
+                ids["hs_id"] += 1
+
+        # seat warehouse counts: a few consecutive days at the start of each month
+        if d.day <= 2:
+            for warehouse in SEAT_WAREHOUSES:
+                h_id = ids["h_id"]
+                ids["h_id"] += 1
+                headers.append((h_id, d, "Depo Giriş", "Aktif", warehouse, None, 50, 0))
+                for m in rng.sample(materials, min(len(materials), 15)):
+                    lines.append((ids["hs_id"], h_id, m["name"], f"LBL-{m['name']}", m["uom"], round(rng.uniform(1, 60), 2)))
+                    ids["hs_id"] += 1
+
+    conn.executemany("INSERT INTO HAREKETLER VALUES (?,?,?,?,?,?,?,?)", [(*h[:1], h[1].isoformat(), *h[2:]) for h in headers])
+    conn.executemany("INSERT INTO HAREKET_SATIR VALUES (?,?,?,?,?,?)", lines)
+    conn.executemany("INSERT INTO RECETE_STORSCREEN_ROWS VALUES (?,?,?,?,?,?,?,?,?,?)", recete)
+    conn.commit()
+    return {"headers": len(headers), "lines": len(lines), "recipe_rows": len(recete)}
+
+
+def generate(
+    path: str,
+    materials: int = 200,
+    start: str = "2023-01-01",
+    days: int = 365,
+    orders_per_day: int = 40,
+    seed: int = 7,
+) -> Dict[str, int]:
+    """Create a fresh stand-in database (an existing file is replaced)."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        _create(conn)
+        mats = material_names(materials)
+        _stock_cards(conn, mats, rng)
+        counts = _activity(conn, mats, date.fromisoformat(start), days, orders_per_day, rng)
+    finally:
+        conn.close()
+    counts["materials"] = materials
+    LOG.info("Generated Firebird stand-in %s: %s", path, counts)
+    return counts
+
+
+def append_activity(path: str, days: int = 1, orders_per_day: int = 40, seed: Optional[int] = None) -> Dict[str, int]:
+    """Add documents dated after the newest TARIH with higher H_IDs (live activity)."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT MAX(TARIH) FROM HAREKETLER")
+        last = cur.fetchone()[0]
+        start = date.fromisoformat(last) + timedelta(days=1) if last else date.today()
+        counts = _activity(conn, _load_materials(conn), start, days, orders_per_day, rng)
+    finally:
+        conn.close()
+    return counts
@@ -12,29 +12,65 @@ Models:
 Backtest:
   - last 52 weeks
   - 1-week-ahead rolling origin
+  - 12-week cumulative WAPE/MAE drives selection, EXTRA_HORIZONS (4, 8 weeks)
+    are scored in the same origin loop (horizon_weeks rows of the metrics table)
+  - the chosen model's residuals give P50/P80/P95 12-week demand (final_forecast_summary)
 Inactive rule:
   - if last 26 weeks sum = 0, force forecast = 0
+Model pruning:
+  - materials are classified by ADI / CV^2 (Syntetos-Boylan) over the last
+    BACKTEST_WEEKS + FORECAST_H weeks, each class only backtests DEMAND_CLASS_MODELS
+Selection (selection="halving"):
+  - every candidate is scored on every HALVING_STRIDE-th origin (newest first),
+    only the HALVING_KEEP best continue on the remaining origins
 
 Outputs:
   - material_level_backtest.csv
   - category_unit_backtest.csv
   - overall_backtest.csv
+
+main() can run as a library stage (raw_sync FORECAST_MODE=inprocess) on an
+existing connection and returns timings/counts. statsmodels is imported on the
+first ETS fit only. main(run_id=...) checkpoints per material batch and resumes.
+Every published forecast is also appended to core.forecast_history under its run id.
+--materials / --category / --since-changed rerun only the selected materials and
+merge them into the published tables (category / overall metrics from stored sums).
 """
 
 import argparse
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Tuple
+import csv
+import io
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 import psycopg2
-from statsmodels.tsa.holtwinters import ExponentialSmoothing, SimpleExpSmoothing
 
 HISTORY_MIN = 4
 BACKTEST_WEEKS = 52
 FORECAST_H = 12
 ETS_ZERO_RATIO_MAX = 0.4
 INACTIVE_WEEKS = 26
+HALVING_STRIDE = 4
+HALVING_KEEP = 2
+# extra cumulative backtest horizons (weeks) scored alongside FORECAST_H
+EXTRA_HORIZONS = (4, 8)
+# 12-week demand quantiles (percent) from the chosen model's backtest residuals
+DEMAND_QUANTILES = (50, 80, 95)
+ADI_CUTOFF = 1.32
+CV2_CUTOFF = 0.49
+
+# candidate models per demand class: ETS only where demand is regular, TSB only where it is intermittent
+DEMAND_CLASS_MODELS = {
+    "smooth": ("ETS", "MA4", "MA13", "MA26"),
+    "erratic": ("ETS", "MA13", "MA26"),
+    "intermittent": ("TSB", "MA13", "MA26"),
+    "lumpy": ("TSB", "MA26"),
+    "no_demand": ("MA26",),
+}
 
 WEEKDAY_MAP = {
     0: "MON",
@@ -51,27 +87,154 @@ def pg_conn(conn_str: str):
     return psycopg2.connect(conn_str)
 
 
-def load_weekly(conn_str: str) -> pd.DataFrame:
-    conn = pg_conn(conn_str)
-    df = pd.read_sql("""
+def load_weekly(conn, materials: Optional[Sequence[str]] = None, weeks: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Dense weekly frame of core.weekly_consumption_sparse. A forecast shard passes
+    its materials and the run's week index (load_week_index) so every shard sees
+    the same weeks and cutoff as a single-process run.
+    """
+    where = "WHERE bom_material_name = ANY(%(materials)s)" if materials is not None else ""
+    sparse = pd.read_sql(f"""
         SELECT
             bom_material_name,
             bom_material_category,
             bom_unit_of_measure,
             week_start,
-            qty::float
-        FROM core.weekly_consumption
-        ORDER BY bom_material_name, week_start
-    """, conn)
-    conn.close()
+            qty::float AS qty,
+            last_transaction_date
+        FROM core.weekly_consumption_sparse
+        {where}
+    """, conn, params={"materials": list(materials)} if materials is not None else None)
 
-    df["week_start"] = pd.to_datetime(df["week_start"])
+    df = densify_weekly(sparse, weeks)
     df["qty"] = pd.to_numeric(df["qty"], errors="coerce").fillna(0.0)
     df["bom_material_name"] = df["bom_material_name"].astype(str).fillna("").str.strip()
     df = df[df["bom_material_name"] != ""]
     return df
 
 
+def weekly_cutoff(max_tx: pd.Timestamp) -> pd.Timestamp:
+    """Last full week start: the last week counts as full once its data reaches Friday."""
+    max_tx = pd.Timestamp(max_tx).normalize()
+    max_week_start = max_tx - pd.Timedelta(days=int(max_tx.dayofweek))
+    if max_tx >= max_week_start + pd.Timedelta(days=4):
+        return max_week_start
+    return max_week_start - pd.Timedelta(days=7)
+
+
+def load_week_index(conn) -> List[str]:
+    """Every week_start up to the cutoff over all materials (ISO dates, JSON-friendly)."""
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(last_transaction_date) FROM core.weekly_consumption_sparse")
+    max_tx = cur.fetchone()[0]
+    if max_tx is None:
+        cur.close()
+        return []
+    cur.execute(
+        "SELECT DISTINCT week_start FROM core.weekly_consumption_sparse WHERE week_start <= %s ORDER BY week_start",
+        (weekly_cutoff(max_tx).date(),),
+    )
+    weeks = [pd.Timestamp(r[0]).date().isoformat() for r in cur.fetchall()]
+    cur.close()
+    return weeks
+
+
+def load_published_week_index(conn) -> List[str]:
+    """
+    Week index of the published forecast (core.final_forecast_weeks), so a targeted
+    rerun keeps its cutoff while weekly_consumption_sparse moves on. Tables published
+    before the index was stored fall back to the weeks before the first forecast week.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('core.final_forecast_weeks') IS NOT NULL")
+    if cur.fetchone()[0]:
+        cur.execute("SELECT week_start FROM core.final_forecast_weeks ORDER BY week_start")
+    else:
+        cur.execute(
+            """
+            SELECT DISTINCT week_start
+            FROM core.weekly_consumption_sparse
+            WHERE week_start < (SELECT MIN(week_start) FROM core.final_forecast)
+            ORDER BY week_start
+            """
+        )
+    weeks = [pd.Timestamp(r[0]).date().isoformat() for r in cur.fetchall()]
+    cur.close()
+    return weeks
+
+
+def densify_weekly(sparse: pd.DataFrame, weeks: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Expand sparse (material, week) consumption to every material x every week
+    up to the last full week, filling missing weeks with 0.
+    The last week counts as full once its data reaches Friday. weeks overrides
+    the week index (and so the cutoff) derived from sparse itself.
+    """
+    columns = ["bom_material_name", "bom_material_category", "bom_unit_of_measure", "week_start", "qty"]
+    if sparse.empty:
+        return pd.DataFrame(columns=columns)
+
+    sparse = sparse.copy()
+    sparse["week_start"] = pd.to_datetime(sparse["week_start"])
+    if weeks is not None:
+        if not len(weeks):
+            return pd.DataFrame(columns=columns)
+        weeks = pd.DatetimeIndex(pd.to_datetime(list(weeks)), name="week_start")
+        cutoff = weeks.max()
+    else:
+        cutoff = weekly_cutoff(pd.to_datetime(sparse["last_transaction_date"]).max())
+
+    attrs = sparse.groupby("bom_material_name")[["bom_material_category", "bom_unit_of_measure"]].min()
+    in_range = sparse[sparse["week_start"] <= cutoff]
+    if weeks is None:
+        weeks = pd.DatetimeIndex(np.sort(in_range["week_start"].unique()), name="week_start")
+    if in_range.empty:
+        return pd.DataFrame(columns=columns)
+
+    matrix = in_range.pivot_table(
+        index="bom_material_name",
+        columns="week_start",
+        values="qty",
+        aggfunc="sum",
+    )
+    matrix = matrix.reindex(index=attrs.index, columns=weeks).fillna(0.0)
+    dense = matrix.melt(ignore_index=False, value_name="qty").reset_index()
+    dense = dense.merge(attrs, left_on="bom_material_name", right_index=True, how="left")
+    dense = dense.sort_values(["bom_material_name", "week_start"]).reset_index(drop=True)
+    return dense[columns]
+
+
+def classify_demand(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    ADI (weeks per non-zero week, counted from the first demand in the window) and
+    CV^2 of the non-zero quantities for every material of the dense weekly frame,
+    in one pass over the material x week matrix.
+    """
+    matrix = df.pivot_table(index="bom_material_name", columns="week_start", values="qty", aggfunc="sum").fillna(0.0)
+    values = matrix.to_numpy(dtype=float)[:, -(BACKTEST_WEEKS + FORECAST_H):]
+    nonzero = values > 0
+    count = nonzero.sum(axis=1)
+    has_demand = count > 0
+    safe_count = np.where(has_demand, count, 1)
+    periods = values.shape[1] - np.argmax(nonzero, axis=1)
+    adi = np.where(has_demand, periods / safe_count, np.nan)
+    mean = np.where(nonzero, values, 0.0).sum(axis=1) / safe_count
+    var = np.where(nonzero, (values - mean[:, None]) ** 2, 0.0).sum(axis=1) / safe_count
+    cv2 = np.where(has_demand & (mean > 0), var / np.where(mean > 0, mean, 1.0) ** 2, np.nan)
+
+    demand_class = np.select(
+        [
+            ~has_demand,
+            (adi < ADI_CUTOFF) & (cv2 < CV2_CUTOFF),
+            adi < ADI_CUTOFF,
+            cv2 < CV2_CUTOFF,
+        ],
+        ["no_demand", "smooth", "erratic", "intermittent"],
+        default="lumpy",
+    )
+    return pd.DataFrame({"adi": adi, "cv2": cv2, "demand_class": demand_class}, index=matrix.index)
+
+
 def to_weekly_series(series: pd.Series) -> pd.Series:
     s = series.groupby(series.index).sum().sort_index()
     if s.empty:
@@ -114,6 +277,8 @@ def tsb_forecast_array(series: pd.Series, h: int) -> np.ndarray:
 
 
 def ets_forecast(series: pd.Series) -> float:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing, SimpleExpSmoothing
+
     try:
         m = ExponentialSmoothing(series, trend="add").fit(optimized=True)
         return float(m.forecast(1)[0])
@@ -126,6 +291,8 @@ def ets_forecast(series: pd.Series) -> float:
 
 
 def ets_forecast_array(series: pd.Series, h: int) -> np.ndarray:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing, SimpleExpSmoothing
+
     try:
         m = ExponentialSmoothing(series, trend="add").fit(optimized=True)
         return np.asarray(m.forecast(h), dtype=float)
@@ -148,11 +315,16 @@ class MetricSums:
     abs_err: float = 0.0
     actual_sum: float = 0.0
     count: int = 0
+    # eliminated by successive halving: scored on the sampled origins only
+    partial: bool = False
+    # actual - forecast per origin, for the demand quantiles of the chosen model
+    residuals: List[float] = field(default_factory=list)
 
     def add(self, actual: float, forecast: float) -> None:
         self.abs_err += abs(actual - forecast)
         self.actual_sum += float(actual)
         self.count += 1
+        self.residuals.append(float(actual) - float(forecast))
 
     def wape(self) -> float:
         if self.actual_sum == 0:
@@ -165,10 +337,25 @@ class MetricSums:
         return self.abs_err / self.count
 
 
-def backtest_material(series: pd.Series) -> Dict[str, MetricSums]:
+def backtest_material(
+    series: pd.Series,
+    candidates: Optional[Iterable[str]] = None,
+    fit_counts: Optional[Dict[str, int]] = None,
+    selection: str = "full",
+    horizons: Iterable[int] = (),
+    horizon_sums: Optional[Dict[int, Dict[str, MetricSums]]] = None,
+) -> Dict[str, MetricSums]:
+    """
+    Rolling-origin backtest of the eligible models, limited to candidates when given.
+    selection="halving" finishes the full evaluation for the HALVING_KEEP leaders of
+    a sparse origin subset only, the others are returned with partial=True.
+    fit_counts accumulates "fits", "fits_avoided", "ets_fits_avoided" and "halving_fits_avoided".
+    Shorter cumulative horizons (weeks < FORECAST_H) are scored from the same model
+    outputs into horizon_sums[h][method], selection still uses FORECAST_H only.
+    """
     s = to_weekly_series(series)
     zero_ratio = float((s.tail(BACKTEST_WEEKS) == 0).mean()) if len(s) else 1.0
-    methods = {
+    methods: Dict[str, Callable] = {
         "TSB": lambda x: tsb_forecast_array(x, FORECAST_H),
         "MA4": lambda x: ma_forecast_array(x, 4, FORECAST_H),
         "MA13": lambda x: ma_forecast_array(x, 13, FORECAST_H),
@@ -176,7 +363,17 @@ def backtest_material(series: pd.Series) -> Dict[str, MetricSums]:
     }
     if zero_ratio < ETS_ZERO_RATIO_MAX:
         methods["ETS"] = lambda x: ets_forecast_array(x, FORECAST_H)
+    pruned: List[str] = []
+    if candidates is not None:
+        allowed = set(candidates)
+        pruned = [m for m in methods if m not in allowed]
+        methods = {m: fn for m, fn in methods.items() if m in allowed}
     sums = {m: MetricSums() for m in methods}
+    horizons = sorted({int(h) for h in horizons if 0 < int(h) < FORECAST_H})
+    if horizon_sums is None:
+        horizon_sums = {}
+    for h in horizons:
+        horizon_sums[h] = {m: MetricSums() for m in methods}
 
     last_date = s.index.max()
     if pd.isna(last_date):
@@ -187,16 +384,40 @@ def backtest_material(series: pd.Series) -> Dict[str, MetricSums]:
 
     start_asof = end_asof - pd.Timedelta(weeks=BACKTEST_WEEKS - 1)
     target_asofs = s.loc[(s.index >= start_asof) & (s.index <= end_asof)].index
-
-    for as_of in target_asofs:
-        hist = s.loc[s.index <= as_of]
-        if len(hist) < HISTORY_MIN:
-            continue
-        actual = float(s.loc[as_of + pd.Timedelta(weeks=1) : as_of + pd.Timedelta(weeks=FORECAST_H)].sum())
-        for name, fn in methods.items():
-            fc = np.asarray(fn(hist), dtype=float)
-            fc_sum = float(np.maximum(0.0, fc).sum())
-            sums[name].add(actual, fc_sum)
+    # s is a regular weekly series: positions replace date masks, actuals of every
+    # horizon are prefix-sum differences
+    origins = [as_of for as_of in target_asofs if s.index.get_loc(as_of) + 1 >= HISTORY_MIN]
+    actual_cum = np.concatenate(([0.0], np.cumsum(s.to_numpy(dtype=float))))
+
+    def evaluate(names: List[str], as_ofs: Iterable[pd.Timestamp], eliminated: int = 0) -> None:
+        for as_of in as_ofs:
+            i = s.index.get_loc(as_of)
+            hist = s.iloc[: i + 1]
+            actual = float(actual_cum[i + 1 + FORECAST_H] - actual_cum[i + 1])
+            for name in names:
+                fc_cum = np.cumsum(np.maximum(0.0, np.asarray(methods[name](hist), dtype=float)))
+                sums[name].add(actual, float(fc_cum[-1]))
+                for h in horizons:
+                    horizon_sums[h][name].add(float(actual_cum[i + 1 + h] - actual_cum[i + 1]), float(fc_cum[h - 1]))
+            if fit_counts is not None:
+                fit_counts["fits"] += len(names)
+                fit_counts["fits_avoided"] += len(pruned)
+                fit_counts["ets_fits_avoided"] += int("ETS" in pruned)
+                fit_counts["halving_fits_avoided"] += eliminated
+
+    names = list(methods)
+    if selection == "halving" and len(names) > HALVING_KEEP:
+        sampled = origins[::-HALVING_STRIDE]
+        sampled_set = set(sampled)
+        evaluate(names, sampled)
+        ranked = sorted(names, key=lambda m: sums[m].wape())
+        for name in ranked[HALVING_KEEP:]:
+            sums[name].partial = True
+            for h in horizons:
+                horizon_sums[h][name].partial = True
+        evaluate(ranked[:HALVING_KEEP], [a for a in origins if a not in sampled_set], len(ranked) - HALVING_KEEP)
+    else:
+        evaluate(names, origins)
 
     return sums
 
@@ -205,6 +426,8 @@ def choose_best_method(sums: Dict[str, MetricSums]) -> str:
     best_method = None
     best_wape = float("inf")
     for m, s in sums.items():
+        if s.partial:
+            continue
         w = s.wape()
         if w < best_wape:
             best_method = m
@@ -221,7 +444,7 @@ def material_inactive(series: pd.Series) -> bool:
     return float(recent.sum()) == 0.0
 
 
-def zero_forecast_sums(series: pd.Series) -> MetricSums:
+def zero_forecast_sums(series: pd.Series, horizon: int = FORECAST_H) -> MetricSums:
     s = to_weekly_series(series)
     last_date = s.index.max()
     if pd.isna(last_date):
@@ -233,11 +456,37 @@ def zero_forecast_sums(series: pd.Series) -> MetricSums:
     target_asofs = s.loc[(s.index >= start_asof) & (s.index <= end_asof)].index
     sums = MetricSums()
     for as_of in target_asofs:
-        actual = float(s.loc[as_of + pd.Timedelta(weeks=1) : as_of + pd.Timedelta(weeks=FORECAST_H)].sum())
+        actual = float(s.loc[as_of + pd.Timedelta(weeks=1) : as_of + pd.Timedelta(weeks=horizon)].sum())
         sums.add(actual, 0.0)
     return sums
 
 
+def add_demand_quantiles(summary_rows: List[Dict[str, object]], residuals: Sequence[np.ndarray]) -> None:
+    """
+    forecast_p50/p80/p95_12w = forecast_12w + the residual quantile of the chosen
+    model's backtest (actual - forecast per origin), for all materials in one pass
+    over a NaN-padded residual matrix. INACTIVE_ZERO stays 0, no residuals -> None.
+    """
+    if not summary_rows:
+        return
+    width = max(max((len(r) for r in residuals), default=0), 1)
+    matrix = np.full((len(summary_rows), width), np.nan)
+    for i, r in enumerate(residuals):
+        matrix[i, : len(r)] = r
+    forecast = np.array([float(row["forecast_12w"]) for row in summary_rows])
+    scored = ~np.isnan(matrix).all(axis=1)
+    values = np.full((len(DEMAND_QUANTILES), len(summary_rows)), np.nan)
+    if scored.any():
+        q = np.nanquantile(matrix[scored], [p / 100.0 for p in DEMAND_QUANTILES], axis=1)
+        values[:, scored] = np.maximum(0.0, forecast[scored] + q)
+    for i, row in enumerate(summary_rows):
+        for j, p in enumerate(DEMAND_QUANTILES):
+            if row["chosen_method"] == "INACTIVE_ZERO":
+                row[f"forecast_p{p}_12w"] = 0.0
+            else:
+                row[f"forecast_p{p}_12w"] = None if np.isnan(values[j, i]) else float(values[j, i])
+
+
 def forecast_next_12w(series: pd.Series, method: str) -> np.ndarray:
     s = to_weekly_series(series)
     if method == "INACTIVE_ZERO":
@@ -255,42 +504,27 @@ def forecast_next_12w(series: pd.Series, method: str) -> np.ndarray:
     return np.zeros(FORECAST_H, dtype=float)
 
 
-def write_results_to_db(
-    conn_str: str,
-    forecast_rows: List[Dict[str, object]],
-    summary_rows: List[Dict[str, object]],
-    material_metrics: pd.DataFrame,
-    category_metrics: pd.DataFrame,
-    overall_metrics: pd.DataFrame,
-) -> None:
-    conn = pg_conn(conn_str)
-    cur = conn.cursor()
-
-    cur.execute("DROP TABLE IF EXISTS core.final_forecast;")
-    cur.execute("DROP TABLE IF EXISTS core.final_forecast_summary;")
-    cur.execute("DROP TABLE IF EXISTS core.final_forecast_material_metrics;")
-    cur.execute("DROP TABLE IF EXISTS core.final_forecast_category_unit_metrics;")
-    cur.execute("DROP TABLE IF EXISTS core.final_forecast_overall_metrics;")
-
-    cur.execute("""
+RESULT_TABLES_DDL = [
+    """
         CREATE TABLE core.final_forecast_summary (
             bom_material_name TEXT PRIMARY KEY,
             chosen_method TEXT,
             wape_12w NUMERIC,
-            forecast_12w NUMERIC
+            forecast_12w NUMERIC,
+            forecast_p50_12w NUMERIC,
+            forecast_p80_12w NUMERIC,
+            forecast_p95_12w NUMERIC
         );
-    """)
-
-    cur.execute("""
+    """,
+    """
         CREATE TABLE core.final_forecast (
             bom_material_name TEXT,
             week_start DATE,
             forecast_qty NUMERIC,
             chosen_method TEXT
         );
-    """)
-
-    cur.execute("""
+    """,
+    """
         CREATE TABLE core.final_forecast_material_metrics (
             bom_material_name TEXT,
             bom_material_category TEXT,
@@ -301,11 +535,14 @@ def write_results_to_db(
             actual_sum NUMERIC,
             n_points INTEGER,
             inactive_flag INTEGER,
-            best_method TEXT
+            best_method TEXT,
+            demand_class TEXT,
+            candidate_models TEXT,
+            abs_err NUMERIC,
+            horizon_weeks INTEGER
         );
-    """)
-
-    cur.execute("""
+    """,
+    """
         CREATE TABLE core.final_forecast_category_unit_metrics (
             bom_material_category TEXT,
             bom_unit_of_measure TEXT,
@@ -314,9 +551,8 @@ def write_results_to_db(
             actual_sum NUMERIC,
             n_points INTEGER
         );
-    """)
-
-    cur.execute("""
+    """,
+    """
         CREATE TABLE core.final_forecast_overall_metrics (
             scope TEXT,
             wape NUMERIC,
@@ -324,151 +560,505 @@ def write_results_to_db(
             actual_sum NUMERIC,
             n_points INTEGER
         );
+    """,
+    """
+        CREATE TABLE core.final_forecast_weeks (
+            week_start DATE PRIMARY KEY
+        );
+    """,
+]
+
+SUMMARY_COLUMNS = [
+    "bom_material_name",
+    "chosen_method",
+    "wape_12w",
+    "forecast_12w",
+    "forecast_p50_12w",
+    "forecast_p80_12w",
+    "forecast_p95_12w",
+]
+FORECAST_COLUMNS = ["bom_material_name", "week_start", "forecast_qty", "chosen_method"]
+MATERIAL_METRIC_COLUMNS = [
+    "bom_material_name",
+    "bom_material_category",
+    "bom_unit_of_measure",
+    "method",
+    "wape",
+    "mae",
+    "actual_sum",
+    "n_points",
+    "inactive_flag",
+    "best_method",
+    "demand_class",
+    "candidate_models",
+    "abs_err",
+    "horizon_weeks",
+]
+CATEGORY_METRIC_COLUMNS = ["bom_material_category", "bom_unit_of_measure", "wape", "mae", "actual_sum", "n_points"]
+OVERALL_METRIC_COLUMNS = ["scope", "wape", "mae", "actual_sum", "n_points"]
+HISTORY_COLUMNS = ["run_id", "bom_material_name", "week_start", "horizon", "forecast_qty", "chosen_method"]
+WEEK_COLUMNS = ["week_start"]
+
+# WAPE / MAE as in MetricSums.wape() / mae(), from stored best-model sums
+SUMS_METRICS_SQL = """
+    CASE
+        WHEN SUM(actual_sum) = 0 THEN CASE WHEN SUM(abs_err) > 0 THEN 'Infinity'::numeric ELSE 0 END
+        ELSE SUM(abs_err) / SUM(actual_sum) * 100.0
+    END AS wape,
+    CASE WHEN SUM(n_points) = 0 THEN 'Infinity'::numeric ELSE SUM(abs_err) / SUM(n_points) END AS mae,
+    COALESCE(SUM(actual_sum), 0) AS actual_sum,
+    COALESCE(SUM(n_points), 0) AS n_points
+"""
+
+
+def create_result_tables(cur) -> None:
+    """Drop and recreate the final_forecast* tables (inside the caller's transaction)."""
+    cur.execute("DROP TABLE IF EXISTS core.final_forecast;")
+    cur.execute("DROP TABLE IF EXISTS core.final_forecast_summary;")
+    cur.execute("DROP TABLE IF EXISTS core.final_forecast_material_metrics;")
+    cur.execute("DROP TABLE IF EXISTS core.final_forecast_category_unit_metrics;")
+    cur.execute("DROP TABLE IF EXISTS core.final_forecast_overall_metrics;")
+    cur.execute("DROP TABLE IF EXISTS core.final_forecast_weeks;")
+    for ddl in RESULT_TABLES_DDL:
+        cur.execute(ddl)
+
+
+def copy_value(value) -> object:
+    if value is None:
+        return "\\N"
+    if isinstance(value, float) and not np.isfinite(value):
+        return "NaN" if np.isnan(value) else ("Infinity" if value > 0 else "-Infinity")
+    return value
+
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Dict[str, object]]) -> int:
+    """COPY dict rows into table (CSV, \\N as NULL so empty strings stay empty strings)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    count = 0
+    for row in rows:
+        writer.writerow([copy_value(row[c]) for c in columns])
+        count += 1
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buf,
+    )
+    return count
+
+
+def new_run_id(prefix: str = "") -> str:
+    return prefix + time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+
+def ensure_history_table(cur, years: Iterable[int]) -> None:
+    """
+    core.forecast_history keeps every published forecast (append-only), range
+    partitioned by target week per year. actual_qty / abs_err are filled by
+    raw_sync score_forecast_history once the week closes.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.forecast_history (
+            run_id TEXT NOT NULL,
+            bom_material_name TEXT NOT NULL,
+            week_start DATE NOT NULL,
+            horizon INTEGER,
+            forecast_qty NUMERIC,
+            chosen_method TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            actual_qty NUMERIC,
+            abs_err NUMERIC,
+            scored_at TIMESTAMPTZ
+        ) PARTITION BY RANGE (week_start);
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_forecast_history_material ON core.forecast_history (bom_material_name, week_start);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_forecast_history_unscored ON core.forecast_history (week_start) WHERE scored_at IS NULL;")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_forecast_history_run ON core.forecast_history (run_id);")
+    for year in sorted(set(int(y) for y in years)):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS core.forecast_history_{year}
+            PARTITION OF core.forecast_history
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+        """)
+    cur.execute("""
+        CREATE OR REPLACE VIEW core.forecast_accuracy AS
+        SELECT
+            bom_material_name,
+            horizon,
+            COUNT(*) AS n_points,
+            SUM(abs_err) AS abs_err,
+            SUM(actual_qty) AS actual_sum,
+            CASE WHEN SUM(actual_qty) = 0 THEN NULL ELSE SUM(abs_err) / SUM(actual_qty) * 100.0 END AS wape,
+            AVG(abs_err) AS mae,
+            MAX(week_start) AS last_scored_week
+        FROM core.forecast_history
+        WHERE scored_at IS NOT NULL
+        GROUP BY bom_material_name, horizon;
     """)
 
-    for r in summary_rows:
-        cur.execute("""
-            INSERT INTO core.final_forecast_summary
-            (bom_material_name, chosen_method, wape_12w, forecast_12w)
-            VALUES (%s, %s, %s, %s)
-        """, (
-            r["bom_material_name"], r["chosen_method"],
-            r["wape_12w"], r["forecast_12w"]
-        ))
-
-    for r in forecast_rows:
-        cur.execute("""
-            INSERT INTO core.final_forecast
-            (bom_material_name, week_start, forecast_qty, chosen_method)
-            VALUES (%s, %s, %s, %s)
-        """, (
-            r["bom_material_name"], r["week_start"],
-            r["forecast_qty"], r["chosen_method"]
-        ))
-
-    for _, r in material_metrics.iterrows():
-        cur.execute("""
-            INSERT INTO core.final_forecast_material_metrics
-            (bom_material_name, bom_material_category, bom_unit_of_measure, method, wape, mae, actual_sum, n_points, inactive_flag, best_method)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            r["bom_material_name"], r["bom_material_category"], r["bom_unit_of_measure"],
-            r["method"], r["wape"], r["mae"], r["actual_sum"], int(r["n_points"]),
-            int(r["inactive_flag"]), r["best_method"]
-        ))
-
-    for _, r in category_metrics.iterrows():
-        cur.execute("""
-            INSERT INTO core.final_forecast_category_unit_metrics
-            (bom_material_category, bom_unit_of_measure, wape, mae, actual_sum, n_points)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            r["bom_material_category"], r["bom_unit_of_measure"],
-            r["wape"], r["mae"], r["actual_sum"], int(r["n_points"])
-        ))
-
-    for _, r in overall_metrics.iterrows():
-        cur.execute("""
-            INSERT INTO core.final_forecast_overall_metrics
-            (scope, wape, mae, actual_sum, n_points)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
-            r["scope"], r["wape"], r["mae"], r["actual_sum"], int(r["n_points"])
-        ))
 
+def history_rows(run_id: str, forecast_rows: Iterable[Dict[str, object]]) -> Iterable[Dict[str, object]]:
+    """forecast_rows (ordered by week per material) with run_id and horizon 1..FORECAST_H."""
+    horizon: Dict[str, int] = {}
+    for row in forecast_rows:
+        h = horizon.get(row["bom_material_name"], 0) + 1
+        horizon[row["bom_material_name"]] = h
+        yield {**row, "run_id": run_id, "horizon": h}
+
+
+def write_results_to_db(
+    conn,
+    forecast_rows: List[Dict[str, object]],
+    summary_rows: List[Dict[str, object]],
+    material_metrics: pd.DataFrame,
+    category_metrics: pd.DataFrame,
+    overall_metrics: pd.DataFrame,
+    run_id: Optional[str] = None,
+    weeks: Iterable[object] = (),
+) -> None:
+    cur = conn.cursor()
+    create_result_tables(cur)
+    copy_rows(cur, "core.final_forecast_weeks", WEEK_COLUMNS, ({"week_start": w} for w in weeks))
+    copy_rows(cur, "core.final_forecast_summary", SUMMARY_COLUMNS, summary_rows)
+    copy_rows(cur, "core.final_forecast", FORECAST_COLUMNS, forecast_rows)
+    copy_rows(cur, "core.final_forecast_material_metrics", MATERIAL_METRIC_COLUMNS, material_metrics.to_dict("records"))
+    copy_rows(cur, "core.final_forecast_category_unit_metrics", CATEGORY_METRIC_COLUMNS, category_metrics.to_dict("records"))
+    copy_rows(cur, "core.final_forecast_overall_metrics", OVERALL_METRIC_COLUMNS, overall_metrics.to_dict("records"))
+    ensure_history_table(cur, {r["week_start"].year for r in forecast_rows})
+    copy_rows(cur, "core.forecast_history", HISTORY_COLUMNS, history_rows(run_id or new_run_id(), forecast_rows))
+    cur.close()
     conn.commit()
-    conn.close()
 
 
-def main(conn_str: str, out_material: str, out_category: str, out_overall: str) -> None:
-    df = load_weekly(conn_str)
-    if df.empty:
-        raise SystemExit("No data in core.weekly_consumption")
+def merge_results_to_db(
+    conn,
+    materials: Sequence[str],
+    forecast_rows: List[Dict[str, object]],
+    summary_rows: List[Dict[str, object]],
+    material_rows: List[Dict[str, object]],
+    run_id: str,
+) -> None:
+    """
+    Replace the published rows of materials in core.final_forecast, final_forecast_summary
+    and final_forecast_material_metrics in one transaction. Category / unit metrics of the
+    affected categories and the overall row are recomputed from the stored BEST sums
+    (abs_err, actual_sum, n_points at FORECAST_H) of final_forecast_material_metrics,
+    the forecasts are appended to core.forecast_history and the materials are queued
+    for the next incremental dashboard merge.
+    """
+    names = list(materials)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT DISTINCT bom_material_category, bom_unit_of_measure
+        FROM core.final_forecast_material_metrics
+        WHERE bom_material_name = ANY(%s) AND method = 'BEST'
+        """,
+        (names,),
+    )
+    keys = set(cur.fetchall())
+    keys |= {(r["bom_material_category"], r["bom_unit_of_measure"]) for r in summary_rows}
+    for table in ("core.final_forecast", "core.final_forecast_summary", "core.final_forecast_material_metrics"):
+        cur.execute(f"DELETE FROM {table} WHERE bom_material_name = ANY(%s)", (names,))
+    copy_rows(cur, "core.final_forecast_summary", SUMMARY_COLUMNS, summary_rows)
+    copy_rows(cur, "core.final_forecast", FORECAST_COLUMNS, forecast_rows)
+    copy_rows(cur, "core.final_forecast_material_metrics", MATERIAL_METRIC_COLUMNS, material_rows)
+
+    categories = [k[0] for k in keys]
+    units = [k[1] for k in keys]
+    cur.execute(
+        """
+        DELETE FROM core.final_forecast_category_unit_metrics c
+        USING UNNEST(%s::text[], %s::text[]) AS k(category, unit)
+        WHERE c.bom_material_category IS NOT DISTINCT FROM k.category
+          AND c.bom_unit_of_measure IS NOT DISTINCT FROM k.unit
+        """,
+        (categories, units),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO core.final_forecast_category_unit_metrics
+            (bom_material_category, bom_unit_of_measure, wape, mae, actual_sum, n_points)
+        SELECT m.bom_material_category, m.bom_unit_of_measure, {SUMS_METRICS_SQL}
+        FROM core.final_forecast_material_metrics m
+        JOIN UNNEST(%s::text[], %s::text[]) AS k(category, unit)
+          ON m.bom_material_category IS NOT DISTINCT FROM k.category
+         AND m.bom_unit_of_measure IS NOT DISTINCT FROM k.unit
+        WHERE m.method = 'BEST' AND m.horizon_weeks = %s
+        GROUP BY m.bom_material_category, m.bom_unit_of_measure
+        """,
+        (categories, units, FORECAST_H),
+    )
+    cur.execute("DELETE FROM core.final_forecast_overall_metrics WHERE scope = 'ALL_MATERIALS_BEST'")
+    cur.execute(
+        f"""
+        INSERT INTO core.final_forecast_overall_metrics (scope, wape, mae, actual_sum, n_points)
+        SELECT 'ALL_MATERIALS_BEST', {SUMS_METRICS_SQL}
+        FROM core.final_forecast_material_metrics
+        WHERE method = 'BEST' AND horizon_weeks = %s
+        """,
+        (FORECAST_H,),
+    )
+    ensure_history_table(cur, {r["week_start"].year for r in forecast_rows})
+    copy_rows(cur, "core.forecast_history", HISTORY_COLUMNS, history_rows(run_id, forecast_rows))
+    cur.execute("SELECT to_regclass('core.dashboard_dirty_materials') IS NOT NULL")
+    if cur.fetchone()[0]:
+        cur.execute(
+            """
+            INSERT INTO core.dashboard_dirty_materials (bom_material_name)
+            SELECT UNNEST(%s::text[])
+            ON CONFLICT (bom_material_name) DO NOTHING
+            """,
+            (names,),
+        )
+    cur.close()
+    conn.commit()
 
-    material_info = (
-        df.groupby("bom_material_name")[["bom_material_category", "bom_unit_of_measure"]]
-          .first()
-          .reset_index()
+
+def select_materials(
+    conn,
+    materials: Optional[Sequence[str]] = None,
+    category: Optional[str] = None,
+    since_changed: Optional[str] = None,
+) -> List[str]:
+    """
+    Materials of core.weekly_consumption_sparse matching every given selector:
+    a name list, a bom_material_category, or weekly rows updated after since_changed.
+    """
+    clauses = []
+    params: Dict[str, object] = {}
+    if materials:
+        clauses.append("bom_material_name = ANY(%(materials)s)")
+        params["materials"] = list(materials)
+    if category:
+        clauses.append("bom_material_category = %(category)s")
+        params["category"] = category
+    if since_changed:
+        clauses.append("updated_at > %(since_changed)s")
+        params["since_changed"] = since_changed
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT DISTINCT bom_material_name FROM core.weekly_consumption_sparse {where} ORDER BY bom_material_name",
+        params,
     )
+    names = [r[0] for r in cur.fetchall()]
+    cur.close()
+    return names
+
+
+def new_fit_counts() -> Dict[str, int]:
+    return {"fits": 0, "fits_avoided": 0, "ets_fits_avoided": 0, "halving_fits_avoided": 0}
+
+
+def forecast_material(
+    mat: str,
+    g: pd.DataFrame,
+    demand_class: str,
+    prune_models: bool = True,
+    selection: str = "full",
+    fit_counts: Optional[Dict[str, int]] = None,
+    horizons: Iterable[int] = EXTRA_HORIZONS,
+) -> Dict[str, object]:
+    """
+    Backtest, choose and forecast one material of the dense weekly frame.
+    Returns its metric rows (FORECAST_H plus one set per extra horizon), forecast
+    rows, summary row (with the chosen model's abs_err / actual_sum / n_points for
+    re-aggregation) and category / unit.
+    """
+    s = g.set_index("week_start")["qty"].sort_index()
+    candidates = DEMAND_CLASS_MODELS[demand_class] if prune_models else None
+    horizon_sums: Dict[int, Dict[str, MetricSums]] = {}
+    sums = backtest_material(s, candidates, fit_counts, selection, horizons, horizon_sums)
+    inactive = material_inactive(s)
+    best_method = "INACTIVE_ZERO" if inactive else choose_best_method(sums)
+
+    if inactive:
+        best_sums = zero_forecast_sums(s)
+    else:
+        best_sums = sums.get(best_method, MetricSums())
+
+    cat = str(g["bom_material_category"].iloc[0])
+    unit = str(g["bom_unit_of_measure"].iloc[0])
+    candidate_models = ",".join(sums)
+
+    def metric_row(method: str, ms: MetricSums, horizon: int) -> Dict[str, object]:
+        return {
+            "bom_material_name": mat,
+            "bom_material_category": cat,
+            "bom_unit_of_measure": unit,
+            "method": method,
+            "wape": ms.wape(),
+            "mae": ms.mae(),
+            "actual_sum": ms.actual_sum,
+            "n_points": ms.count,
+            "inactive_flag": int(inactive),
+            "best_method": best_method,
+            "demand_class": demand_class,
+            "candidate_models": candidate_models,
+            "abs_err": ms.abs_err,
+            "horizon_weeks": horizon,
+        }
+
+    material_rows: List[Dict[str, object]] = [metric_row(m, ms, FORECAST_H) for m, ms in sums.items()]
+    # Add chosen method row for easy filtering
+    material_rows.append(metric_row("BEST", best_sums, FORECAST_H))
+    for h, h_sums in sorted(horizon_sums.items()):
+        material_rows.extend(metric_row(m, ms, h) for m, ms in h_sums.items())
+        h_best = zero_forecast_sums(s, h) if inactive else h_sums.get(best_method, MetricSums())
+        material_rows.append(metric_row("BEST", h_best, h))
 
+    forecast_rows: List[Dict[str, object]] = []
+    fc = forecast_next_12w(s, best_method)
+    fc = np.maximum(0.0, np.asarray(fc, dtype=float))
+    last_date = to_weekly_series(s).index.max()
+    if pd.notna(last_date):
+        future_idx = pd.date_range(last_date + pd.Timedelta(weeks=1), periods=FORECAST_H, freq=pd.infer_freq(to_weekly_series(s).index) or "W-TUE")
+        for dt, qty in zip(future_idx, fc):
+            forecast_rows.append({
+                "bom_material_name": mat,
+                "week_start": dt.date(),
+                "forecast_qty": float(qty),
+                "chosen_method": best_method,
+            })
+
+    summary = {
+        "bom_material_name": mat,
+        "bom_material_category": cat,
+        "bom_unit_of_measure": unit,
+        "chosen_method": best_method,
+        "wape_12w": best_sums.wape(),
+        "forecast_12w": float(np.sum(fc)),
+        # filled by add_demand_quantiles over all materials
+        "forecast_p50_12w": None,
+        "forecast_p80_12w": None,
+        "forecast_p95_12w": None,
+        "abs_err": best_sums.abs_err,
+        "actual_sum": best_sums.actual_sum,
+        "n_points": best_sums.count,
+    }
+    return {
+        "material_rows": material_rows,
+        "forecast_rows": forecast_rows,
+        "summary": summary,
+        "best_sums": best_sums,
+        "residuals": np.asarray(best_sums.residuals, dtype=float),
+        "category": cat,
+        "unit": unit,
+    }
+
+
+def forecast_materials(
+    df: pd.DataFrame,
+    demand: pd.DataFrame,
+    prune_models: bool,
+    selection: str,
+    fit_counts: Dict[str, int],
+    horizons: Iterable[int],
+) -> Tuple[List[Dict[str, object]], List[Dict[str, object]], List[Dict[str, object]]]:
+    """forecast_material over every material of the dense frame: metric, forecast and summary rows (with quantiles)."""
     material_rows: List[Dict[str, object]] = []
-    category_sums: Dict[Tuple[str, str], MetricSums] = {}
-    overall_sums = MetricSums()
     forecast_rows: List[Dict[str, object]] = []
     summary_rows: List[Dict[str, object]] = []
+    residuals: List[np.ndarray] = []
 
     for mat, g in df.groupby("bom_material_name"):
-        s = g.set_index("week_start")["qty"].sort_index()
-        sums = backtest_material(s)
-        inactive = material_inactive(s)
-        best_method = "INACTIVE_ZERO" if inactive else choose_best_method(sums)
-
-        if inactive:
-            best_sums = zero_forecast_sums(s)
-        else:
-            best_sums = sums.get(best_method, MetricSums())
-
-        info = material_info[material_info["bom_material_name"] == mat].iloc[0]
-        cat = str(info["bom_material_category"])
-        unit = str(info["bom_unit_of_measure"])
-
-        key = (cat, unit)
-        category_sums.setdefault(key, MetricSums())
-        category_sums[key].abs_err += best_sums.abs_err
-        category_sums[key].actual_sum += best_sums.actual_sum
-        category_sums[key].count += best_sums.count
-
-        overall_sums.abs_err += best_sums.abs_err
-        overall_sums.actual_sum += best_sums.actual_sum
-        overall_sums.count += best_sums.count
-
-        for m, ms in sums.items():
-            material_rows.append({
-                "bom_material_name": mat,
-                "bom_material_category": cat,
-                "bom_unit_of_measure": unit,
-                "method": m,
-                "wape": ms.wape(),
-                "mae": ms.mae(),
-                "actual_sum": ms.actual_sum,
-                "n_points": ms.count,
-                "inactive_flag": int(inactive),
-                "best_method": best_method,
-            })
+        demand_class = str(demand.at[mat, "demand_class"]) if mat in demand.index else "no_demand"
+        result = forecast_material(mat, g, demand_class, prune_models, selection, fit_counts, horizons)
+        material_rows.extend(result["material_rows"])
+        forecast_rows.extend(result["forecast_rows"])
+        summary_rows.append(result["summary"])
+        residuals.append(result["residuals"])
 
-        # Add chosen method row for easy filtering
-        material_rows.append({
-            "bom_material_name": mat,
-            "bom_material_category": cat,
-            "bom_unit_of_measure": unit,
-            "method": "BEST",
-            "wape": best_sums.wape(),
-            "mae": best_sums.mae(),
-            "actual_sum": best_sums.actual_sum,
-            "n_points": best_sums.count,
-            "inactive_flag": int(inactive),
-            "best_method": best_method,
-        })
+    add_demand_quantiles(summary_rows, residuals)
+    return material_rows, forecast_rows, summary_rows
 
-        fc = forecast_next_12w(s, best_method)
-        fc = np.maximum(0.0, np.asarray(fc, dtype=float))
-        last_date = to_weekly_series(s).index.max()
-        if pd.notna(last_date):
-            future_idx = pd.date_range(last_date + pd.Timedelta(weeks=1), periods=FORECAST_H, freq=pd.infer_freq(to_weekly_series(s).index) or "W-TUE")
-            for dt, qty in zip(future_idx, fc):
-                forecast_rows.append({
-                    "bom_material_name": mat,
-                    "week_start": dt.date(),
-                    "forecast_qty": float(qty),
-                    "chosen_method": best_method,
-                })
-
-        summary_rows.append({
-            "bom_material_name": mat,
-            "chosen_method": best_method,
-            "wape_12w": best_sums.wape(),
-            "forecast_12w": float(np.sum(fc)),
-        })
+
+def main(
+    conn_str: str,
+    out_material: str,
+    out_category: str,
+    out_overall: str,
+    conn=None,
+    prune_models: bool = True,
+    selection: str = "full",
+    run_id: Optional[str] = None,
+    horizons: Iterable[int] = EXTRA_HORIZONS,
+    materials: Optional[Sequence[str]] = None,
+    category: Optional[str] = None,
+    since_changed: Optional[str] = None,
+) -> Dict[str, object]:
+    """
+    Backtest, choose and write forecasts. Reuses conn when given (it is committed,
+    not closed), otherwise connects with conn_str. Returns timings in seconds and counts.
+    With run_id the run is checkpointed: results are staged per material batch
+    (forecast_queue shards) under run_id, and calling again with the same run_id
+    after a crash only computes the unfinished batches before publishing.
+    materials / category / since_changed rerun only the selected materials and
+    merge them into the published tables (run_targeted).
+    """
+    targeted = bool(materials or category or since_changed)
+    if targeted and run_id:
+        raise ValueError("run_id checkpoints full runs only, targeted reruns are not staged")
+    own_conn = conn is None
+    if own_conn:
+        conn = pg_conn(conn_str)
+    try:
+        if targeted:
+            return run_targeted(conn, materials, category, since_changed, prune_models, selection, horizons)
+        if run_id:
+            import forecast_queue
+
+            return forecast_queue.run_coordinator(
+                conn,
+                out_material,
+                out_category,
+                out_overall,
+                prune_models,
+                selection,
+                run_id=run_id,
+                reclaim_running=True,
+                horizons=horizons,
+            )
+        return run(conn, out_material, out_category, out_overall, prune_models, selection, horizons)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def run(
+    conn,
+    out_material: str,
+    out_category: str,
+    out_overall: str,
+    prune_models: bool = True,
+    selection: str = "full",
+    horizons: Iterable[int] = EXTRA_HORIZONS,
+) -> Dict[str, object]:
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    df = load_weekly(conn)
+    timings["load"] = time.perf_counter() - started
+    if df.empty:
+        raise RuntimeError("No data in core.weekly_consumption_sparse")
+    step = time.perf_counter()
+    demand = classify_demand(df)
+    timings["classify"] = time.perf_counter() - step
+    fit_counts = new_fit_counts()
+    step = time.perf_counter()
+
+    material_rows, forecast_rows, summary_rows = forecast_materials(df, demand, prune_models, selection, fit_counts, horizons)
+
+    category_sums: Dict[Tuple[str, str], MetricSums] = {}
+    overall_sums = MetricSums()
+    for row in summary_rows:
+        key = (row["bom_material_category"], row["bom_unit_of_measure"])
+        for sums in (category_sums.setdefault(key, MetricSums()), overall_sums):
+            sums.abs_err += row["abs_err"]
+            sums.actual_sum += row["actual_sum"]
+            sums.count += row["n_points"]
+    timings["backtest"] = time.perf_counter() - step
+    step = time.perf_counter()
 
     material_df = pd.DataFrame(material_rows)
     material_df.to_csv(out_material, index=False)
@@ -495,14 +1085,84 @@ def main(conn_str: str, out_material: str, out_category: str, out_overall: str)
     }])
     overall_df.to_csv(out_overall, index=False)
 
+    timings["csv"] = time.perf_counter() - step
+    step = time.perf_counter()
+
     write_results_to_db(
-        conn_str=conn_str,
+        conn=conn,
         forecast_rows=forecast_rows,
         summary_rows=summary_rows,
         material_metrics=material_df,
         category_metrics=category_df,
         overall_metrics=overall_df,
+        weeks=sorted(pd.to_datetime(df["week_start"]).dt.date.unique()),
     )
+    timings["write"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - started
+
+    return {
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+        "materials": len(summary_rows),
+        "inactive": sum(1 for r in summary_rows if r["chosen_method"] == "INACTIVE_ZERO"),
+        "forecast_rows": len(forecast_rows),
+        "metric_rows": len(material_df),
+        "overall_wape": overall_sums.wape(),
+        "demand_classes": demand["demand_class"].value_counts().to_dict(),
+        **fit_counts,
+    }
+
+
+def run_targeted(
+    conn,
+    materials: Optional[Sequence[str]] = None,
+    category: Optional[str] = None,
+    since_changed: Optional[str] = None,
+    prune_models: bool = True,
+    selection: str = "full",
+    horizons: Iterable[int] = EXTRA_HORIZONS,
+) -> Dict[str, object]:
+    """
+    Rerun the selected materials on the published run's week index (same cutoff
+    and forecast weeks, load_published_week_index) and merge them into the
+    published final_forecast* tables. The backtest CSVs are
+    full-run outputs and are not rewritten.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('core.final_forecast_material_metrics') IS NOT NULL")
+    published = cur.fetchone()[0]
+    cur.close()
+    if not published:
+        raise RuntimeError("No published forecast to merge into, run a full forecast first")
+    names = select_materials(conn, materials, category, since_changed)
+    run_id = new_run_id("targeted-")
+    if not names:
+        conn.commit()
+        return {"run_id": run_id, "materials": 0, "timings": {"total": round(time.perf_counter() - started, 3)}}
+    df = load_weekly(conn, names, load_published_week_index(conn))
+    timings["load"] = time.perf_counter() - started
+    step = time.perf_counter()
+    # materials without weeks up to the cutoff drop out of the published tables, as in a full run
+    demand = classify_demand(df) if not df.empty else pd.DataFrame(columns=["demand_class"])
+    fit_counts = new_fit_counts()
+    material_rows, forecast_rows, summary_rows = forecast_materials(df, demand, prune_models, selection, fit_counts, horizons)
+    timings["backtest"] = time.perf_counter() - step
+    step = time.perf_counter()
+    merge_results_to_db(conn, names, forecast_rows, summary_rows, material_rows, run_id)
+    timings["write"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - started
+
+    return {
+        "run_id": run_id,
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+        "materials": len(summary_rows),
+        "inactive": sum(1 for r in summary_rows if r["chosen_method"] == "INACTIVE_ZERO"),
+        "forecast_rows": len(forecast_rows),
+        "metric_rows": len(material_rows),
+        "demand_classes": demand["demand_class"].value_counts().to_dict(),
+        **fit_counts,
+    }
 
 
 if __name__ == "__main__":
@@ -511,6 +1171,25 @@ if __name__ == "__main__":
     ap.add_argument("--out-material", default="material_level_backtest.csv")
     ap.add_argument("--out-category", default="category_unit_backtest.csv")
     ap.add_argument("--out-overall", default="overall_backtest.csv")
+    ap.add_argument("--no-prune", action="store_true", help="backtest every model regardless of demand class")
+    ap.add_argument("--selection", choices=["full", "halving"], default="full")
+    ap.add_argument("--run-id", default=None, help="checkpoint under this run id, resume it if it exists")
+    ap.add_argument("--horizons", default=",".join(str(h) for h in EXTRA_HORIZONS), help="extra backtest horizons in weeks, e.g. 4,8")
+    ap.add_argument("--materials", nargs="+", default=None, help="rerun only these bom_material_name values and merge them")
+    ap.add_argument("--category", default=None, help="rerun only this bom_material_category and merge it")
+    ap.add_argument("--since-changed", default=None, help="rerun only materials with weekly rows updated after this timestamp")
     args = ap.parse_args()
 
-    main(args.pg_conn, args.out_material, args.out_category, args.out_overall)
+    print(main(
+        args.pg_conn,
+        args.out_material,
+        args.out_category,
+        args.out_overall,
+        prune_models=not args.no_prune,
+        selection=args.selection,
+        run_id=args.run_id,
+        horizons=[int(h) for h in args.horizons.split(",") if h.strip()],
+        materials=args.materials,
+        category=args.category,
+        since_changed=args.since_changed,
+    ))
@@ -0,0 +1,705 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Distributed forecast runs coordinated through PostgreSQL.
+
+Coordinator:
+  - enqueues the materials of core.weekly_consumption_sparse in shards of
+    FORECAST_SHARD_SIZE into core.forecast_jobs (one core.forecast_runs row per run)
+  - optionally starts local workers, works shards itself while waiting
+  - aggregates category / overall metrics from the staged abs_err / actual_sum
+    sums and publishes core.final_forecast* in one transaction
+Worker (this host or any other with PG access):
+  - claims one queued shard at a time with FOR UPDATE SKIP LOCKED and a lease
+  - runs backtest + forecast, COPYs rows into core.forecast_stage_* and marks the
+    shard done in the same transaction
+Crashes:
+  - a running shard whose lease expired is claimed again (up to FORECAST_MAX_ATTEMPTS)
+  - a worker that lost its lease rolls back instead of staging a duplicate
+  - a coordinator restarted with the same run id keeps the done shards and
+    publishes once every shard is done (forecast_backtest.main(run_id=...)
+    uses this as a checkpointed single-process run)
+
+Usage:
+  python forecast_queue.py coordinator [--local-workers N] [--run-id ID]
+  python forecast_queue.py worker [--run-id ID] [--exit-when-idle]
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import psycopg2
+
+import forecast_backtest as fb
+
+LOG = logging.getLogger("forecast_queue")
+
+FORECAST_SHARD_SIZE = int(os.getenv("FORECAST_SHARD_SIZE", "200"))
+FORECAST_LEASE_SECONDS = int(os.getenv("FORECAST_LEASE_SECONDS", "600"))
+FORECAST_MAX_ATTEMPTS = int(os.getenv("FORECAST_MAX_ATTEMPTS", "3"))
+FORECAST_WORKER_POLL_SECONDS = float(os.getenv("FORECAST_WORKER_POLL_SECONDS", "5"))
+FORECAST_STAGE_RETENTION_DAYS = int(os.getenv("FORECAST_STAGE_RETENTION_DAYS", "7"))  # staged rows of failed runs
+
+STAGE_SUMMARY_COLUMNS = [
+    "bom_material_name",
+    "bom_material_category",
+    "bom_unit_of_measure",
+    "chosen_method",
+    "wape_12w",
+    "forecast_12w",
+    "forecast_p50_12w",
+    "forecast_p80_12w",
+    "forecast_p95_12w",
+    "abs_err",
+    "actual_sum",
+    "n_points",
+]
+
+
+def ensure_queue_schema(conn) -> None:
+    cur = conn.cursor()
+    cur.execute("CREATE SCHEMA IF NOT EXISTS core;")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.forecast_runs (
+            run_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'running',
+            options JSONB,
+            shard_count INTEGER,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMPTZ,
+            error TEXT
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.forecast_jobs (
+            run_id TEXT NOT NULL REFERENCES core.forecast_runs(run_id) ON DELETE CASCADE,
+            shard INTEGER NOT NULL,
+            materials TEXT[] NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_until TIMESTAMPTZ,
+            started_at TIMESTAMPTZ,
+            finished_at TIMESTAMPTZ,
+            stats JSONB,
+            error TEXT,
+            PRIMARY KEY (run_id, shard)
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_forecast_jobs_claim ON core.forecast_jobs (status, lease_until);")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.forecast_stage_summary (
+            run_id TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            bom_material_name TEXT,
+            bom_material_category TEXT,
+            bom_unit_of_measure TEXT,
+            chosen_method TEXT,
+            wape_12w NUMERIC,
+            forecast_12w NUMERIC,
+            forecast_p50_12w NUMERIC,
+            forecast_p80_12w NUMERIC,
+            forecast_p95_12w NUMERIC,
+            abs_err NUMERIC,
+            actual_sum NUMERIC,
+            n_points INTEGER
+        );
+    """)
+    for column in ("forecast_p50_12w", "forecast_p80_12w", "forecast_p95_12w"):
+        cur.execute(f"ALTER TABLE core.forecast_stage_summary ADD COLUMN IF NOT EXISTS {column} NUMERIC;")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.forecast_stage_forecast (
+            run_id TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            bom_material_name TEXT,
+            week_start DATE,
+            forecast_qty NUMERIC,
+            chosen_method TEXT
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.forecast_stage_metrics (
+            run_id TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            bom_material_name TEXT,
+            bom_material_category TEXT,
+            bom_unit_of_measure TEXT,
+            method TEXT,
+            wape NUMERIC,
+            mae NUMERIC,
+            actual_sum NUMERIC,
+            n_points INTEGER,
+            inactive_flag INTEGER,
+            best_method TEXT,
+            demand_class TEXT,
+            candidate_models TEXT,
+            abs_err NUMERIC,
+            horizon_weeks INTEGER
+        );
+    """)
+    cur.execute("ALTER TABLE core.forecast_stage_metrics ADD COLUMN IF NOT EXISTS horizon_weeks INTEGER;")
+    for table in ("forecast_stage_summary", "forecast_stage_forecast", "forecast_stage_metrics"):
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_run ON core.{table} (run_id, shard);")
+    cur.close()
+    conn.commit()
+
+
+# ----------------------------
+# Worker
+# ----------------------------
+
+def claim_job(conn, worker: str, run_id: Optional[str] = None) -> Optional[Dict[str, object]]:
+    """Claim one queued (or lease-expired) shard of a running run, or None."""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE core.forecast_jobs j
+        SET status = 'running',
+            worker = %(worker)s,
+            attempts = j.attempts + 1,
+            lease_until = NOW() + make_interval(secs => %(lease)s),
+            started_at = NOW(),
+            error = NULL
+        FROM (
+            SELECT fj.run_id, fj.shard
+            FROM core.forecast_jobs fj
+            JOIN core.forecast_runs fr ON fr.run_id = fj.run_id AND fr.status = 'running'
+            WHERE (fj.status = 'queued'
+                   OR (fj.status = 'running' AND fj.lease_until < NOW() AND fj.attempts < %(max_attempts)s))
+              AND (%(run_id)s::text IS NULL OR fj.run_id = %(run_id)s)
+            ORDER BY fj.run_id, fj.shard
+            LIMIT 1
+            FOR UPDATE OF fj SKIP LOCKED
+        ) c
+        WHERE j.run_id = c.run_id AND j.shard = c.shard
+        RETURNING j.run_id, j.shard, j.materials, j.attempts,
+                  (SELECT options FROM core.forecast_runs r WHERE r.run_id = j.run_id)
+    """, {"worker": worker, "lease": FORECAST_LEASE_SECONDS, "max_attempts": FORECAST_MAX_ATTEMPTS, "run_id": run_id})
+    row = cur.fetchone()
+    cur.close()
+    conn.commit()
+    if not row:
+        return None
+    return {
+        "run_id": row[0],
+        "shard": row[1],
+        "materials": list(row[2]),
+        "attempt": row[3],
+        "options": row[4] or {},
+        "worker": worker,
+    }
+
+
+def extend_lease(conn, job: Dict[str, object]) -> None:
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE core.forecast_jobs
+        SET lease_until = NOW() + make_interval(secs => %s)
+        WHERE run_id = %s AND shard = %s AND status = 'running' AND attempts = %s AND worker = %s
+        """,
+        (FORECAST_LEASE_SECONDS, job["run_id"], job["shard"], job["attempt"], job["worker"]),
+    )
+    cur.close()
+    conn.commit()
+
+
+def process_job(conn, job: Dict[str, object]) -> Dict[str, object]:
+    """Backtest + forecast the shard's materials, stage the rows and mark the shard done."""
+    started = time.perf_counter()
+    options = job["options"]
+    df = fb.load_weekly(conn, job["materials"], options.get("weeks"))
+    conn.commit()
+    demand = fb.classify_demand(df) if not df.empty else None
+    fit_counts = fb.new_fit_counts()
+
+    summary_rows: List[Dict[str, object]] = []
+    forecast_rows: List[Dict[str, object]] = []
+    metric_rows: List[Dict[str, object]] = []
+    residuals: List[object] = []
+    demand_classes: Dict[str, int] = {}
+    heartbeat = time.monotonic()
+    for mat, g in df.groupby("bom_material_name"):
+        demand_class = str(demand.at[mat, "demand_class"]) if mat in demand.index else "no_demand"
+        demand_classes[demand_class] = demand_classes.get(demand_class, 0) + 1
+        result = fb.forecast_material(
+            mat,
+            g,
+            demand_class,
+            options.get("prune_models", True),
+            options.get("selection", "full"),
+            fit_counts,
+            options.get("horizons", fb.EXTRA_HORIZONS),
+        )
+        summary_rows.append(result["summary"])
+        residuals.append(result["residuals"])
+        forecast_rows.extend(result["forecast_rows"])
+        metric_rows.extend(result["material_rows"])
+        if time.monotonic() - heartbeat > FORECAST_LEASE_SECONDS / 3:
+            extend_lease(conn, job)
+            heartbeat = time.monotonic()
+    fb.add_demand_quantiles(summary_rows, residuals)
+
+    stats = {
+        "materials": len(summary_rows),
+        "inactive": sum(1 for r in summary_rows if r["chosen_method"] == "INACTIVE_ZERO"),
+        "forecast_rows": len(forecast_rows),
+        "metric_rows": len(metric_rows),
+        "demand_classes": demand_classes,
+        "seconds": round(time.perf_counter() - started, 3),
+        **fit_counts,
+    }
+
+    stamp = {"run_id": job["run_id"], "shard": job["shard"]}
+    cur = conn.cursor()
+    fb.copy_rows(
+        cur,
+        "core.forecast_stage_summary",
+        ["run_id", "shard"] + STAGE_SUMMARY_COLUMNS,
+        ({**stamp, **r} for r in summary_rows),
+    )
+    fb.copy_rows(
+        cur,
+        "core.forecast_stage_forecast",
+        ["run_id", "shard"] + fb.FORECAST_COLUMNS,
+        ({**stamp, **r} for r in forecast_rows),
+    )
+    fb.copy_rows(
+        cur,
+        "core.forecast_stage_metrics",
+        ["run_id", "shard"] + fb.MATERIAL_METRIC_COLUMNS,
+        ({**stamp, **r} for r in metric_rows),
+    )
+    cur.execute(
+        """
+        UPDATE core.forecast_jobs
+        SET status = 'done', finished_at = NOW(), lease_until = NULL, stats = %s
+        WHERE run_id = %s AND shard = %s AND status = 'running' AND attempts = %s AND worker = %s
+        """,
+        (json.dumps(stats), job["run_id"], job["shard"], job["attempt"], job["worker"]),
+    )
+    if cur.rowcount != 1:
+        # lease expired and the shard was claimed again: the other attempt owns the result
+        cur.close()
+        conn.rollback()
+        LOG.warning("Lost lease on forecast shard %s/%s; discarding staged rows", job["run_id"], job["shard"])
+        return stats
+    cur.close()
+    conn.commit()
+    return stats
+
+
+def fail_job(conn, job: Dict[str, object], error: str) -> None:
+    """Requeue the shard, or mark it failed once it used FORECAST_MAX_ATTEMPTS."""
+    conn.rollback()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE core.forecast_jobs
+        SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+            lease_until = NULL,
+            finished_at = NOW(),
+            error = %s
+        WHERE run_id = %s AND shard = %s AND status = 'running' AND attempts = %s AND worker = %s
+        """,
+        (FORECAST_MAX_ATTEMPTS, error[:2000], job["run_id"], job["shard"], job["attempt"], job["worker"]),
+    )
+    cur.close()
+    conn.commit()
+
+
+def work_one(conn, worker: str, run_id: Optional[str] = None) -> bool:
+    """Claim and process one shard. Returns False when nothing was claimable."""
+    job = claim_job(conn, worker, run_id)
+    if job is None:
+        return False
+    LOG.info(
+        "Worker %s: shard %s/%s (%d materials, attempt %d)",
+        worker,
+        job["run_id"],
+        job["shard"],
+        len(job["materials"]),
+        job["attempt"],
+    )
+    try:
+        stats = process_job(conn, job)
+    except Exception as exc:
+        LOG.exception("Worker %s: shard %s/%s failed", worker, job["run_id"], job["shard"])
+        fail_job(conn, job, repr(exc))
+        return True
+    LOG.info("Worker %s: shard %s/%s done in %.1fs", worker, job["run_id"], job["shard"], stats["seconds"])
+    return True
+
+
+def default_worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(conn, worker: Optional[str] = None, run_id: Optional[str] = None, exit_when_idle: bool = False) -> int:
+    """Process shards until idle (exit_when_idle) or forever. Returns the number of shards handled."""
+    worker = worker or default_worker_name()
+    handled = 0
+    while True:
+        if work_one(conn, worker, run_id):
+            handled += 1
+            continue
+        if exit_when_idle:
+            return handled
+        time.sleep(FORECAST_WORKER_POLL_SECONDS)
+
+
+# ----------------------------
+# Coordinator
+# ----------------------------
+
+def enqueue_run(
+    conn,
+    options: Dict[str, object],
+    shard_size: int = FORECAST_SHARD_SIZE,
+    run_id: Optional[str] = None,
+) -> str:
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT bom_material_name FROM core.weekly_consumption_sparse ORDER BY 1")
+    materials = [r[0] for r in cur.fetchall() if r[0] is not None and str(r[0]).strip() != ""]
+    if not materials:
+        cur.close()
+        conn.rollback()
+        raise RuntimeError("No data in core.weekly_consumption_sparse")
+    shard_size = max(shard_size, 1)
+    shards = [materials[i:i + shard_size] for i in range(0, len(materials), shard_size)]
+    run_id = run_id or fb.new_run_id()
+    # staged rows of failed runs nobody resumed
+    cur.execute(
+        """
+        SELECT run_id FROM core.forecast_runs
+        WHERE status = 'failed' AND created_at < NOW() - make_interval(days => %s)
+        """,
+        (FORECAST_STAGE_RETENTION_DAYS,),
+    )
+    for (stale_run,) in cur.fetchall():
+        stage_cleanup(cur, stale_run)
+    cur.execute(
+        "INSERT INTO core.forecast_runs (run_id, options, shard_count) VALUES (%s, %s, %s)",
+        (run_id, json.dumps(options), len(shards)),
+    )
+    cur.executemany(
+        "INSERT INTO core.forecast_jobs (run_id, shard, materials) VALUES (%s, %s, %s)",
+        [(run_id, i, shard) for i, shard in enumerate(shards)],
+    )
+    cur.close()
+    conn.commit()
+    LOG.info("Forecast run %s: %d materials in %d shards", run_id, len(materials), len(shards))
+    return run_id
+
+
+def resume_run(conn, run_id: str, reclaim_running: bool = False) -> Optional[str]:
+    """
+    Reopen an existing run: failed shards are queued again with fresh attempts,
+    running shards too when reclaim_running (their worker is known to be gone).
+    Returns the run status before resuming, None when run_id does not exist.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT status FROM core.forecast_runs WHERE run_id = %s FOR UPDATE", (run_id,))
+    row = cur.fetchone()
+    if row is None or row[0] == "published":
+        cur.close()
+        conn.commit()
+        return row[0] if row else None
+    statuses = ["failed", "running"] if reclaim_running else ["failed"]
+    cur.execute(
+        """
+        UPDATE core.forecast_jobs
+        SET status = 'queued', attempts = 0, worker = NULL, lease_until = NULL, error = NULL
+        WHERE run_id = %s AND status = ANY(%s)
+        """,
+        (run_id, statuses),
+    )
+    requeued = cur.rowcount
+    cur.execute(
+        "UPDATE core.forecast_runs SET status = 'running', finished_at = NULL, error = NULL WHERE run_id = %s",
+        (run_id,),
+    )
+    cur.execute("SELECT COUNT(*) FROM core.forecast_jobs WHERE run_id = %s AND status = 'done'", (run_id,))
+    done = int(cur.fetchone()[0])
+    cur.close()
+    conn.commit()
+    LOG.info("Resuming forecast run %s (was %s): %d shards already done, %d requeued", run_id, row[0], done, requeued)
+    return row[0]
+
+
+def run_progress(conn, run_id: str) -> Dict[str, int]:
+    """Shard counts by status, after failing lease-expired shards that used every attempt."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE core.forecast_jobs
+        SET status = 'failed', lease_until = NULL, finished_at = NOW(),
+            error = COALESCE(error, 'lease expired after max attempts')
+        WHERE run_id = %s AND status = 'running' AND lease_until < NOW() AND attempts >= %s
+        """,
+        (run_id, FORECAST_MAX_ATTEMPTS),
+    )
+    cur.execute("SELECT status, COUNT(*) FROM core.forecast_jobs WHERE run_id = %s GROUP BY status", (run_id,))
+    counts = {status: int(n) for status, n in cur.fetchall()}
+    cur.close()
+    conn.commit()
+    return counts
+
+
+def finish_run(conn, run_id: str, status: str, error: Optional[str] = None) -> None:
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE core.forecast_runs SET status = %s, finished_at = NOW(), error = %s WHERE run_id = %s",
+        (status, error, run_id),
+    )
+    cur.close()
+    conn.commit()
+
+
+def stage_cleanup(cur, run_id: str) -> None:
+    for table in ("forecast_stage_summary", "forecast_stage_forecast", "forecast_stage_metrics"):
+        cur.execute(f"DELETE FROM core.{table} WHERE run_id = %s", (run_id,))
+
+
+def publish_run(conn, run_id: str) -> None:
+    """Replace core.final_forecast* with the staged rows of run_id in one transaction."""
+    summary_cols = ", ".join(fb.SUMMARY_COLUMNS)
+    material_cols = ", ".join(fb.MATERIAL_METRIC_COLUMNS)
+    cur = conn.cursor()
+    fb.create_result_tables(cur)
+    cur.execute(
+        """
+        INSERT INTO core.final_forecast_weeks (week_start)
+        SELECT DISTINCT w::date
+        FROM core.forecast_runs r, jsonb_array_elements_text(r.options -> 'weeks') AS w
+        WHERE r.run_id = %s
+        """,
+        (run_id,),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO core.final_forecast_summary ({summary_cols})
+        SELECT {summary_cols}
+        FROM core.forecast_stage_summary WHERE run_id = %s
+        """,
+        (run_id,),
+    )
+    cur.execute(
+        """
+        INSERT INTO core.final_forecast (bom_material_name, week_start, forecast_qty, chosen_method)
+        SELECT bom_material_name, week_start, forecast_qty, chosen_method
+        FROM core.forecast_stage_forecast WHERE run_id = %s
+        """,
+        (run_id,),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO core.final_forecast_material_metrics ({material_cols})
+        SELECT {material_cols} FROM core.forecast_stage_metrics WHERE run_id = %s
+        """,
+        (run_id,),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO core.final_forecast_category_unit_metrics
+            (bom_material_category, bom_unit_of_measure, wape, mae, actual_sum, n_points)
+        SELECT bom_material_category, bom_unit_of_measure, {fb.SUMS_METRICS_SQL}
+        FROM core.forecast_stage_summary WHERE run_id = %s
+        GROUP BY bom_material_category, bom_unit_of_measure
+        """,
+        (run_id,),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO core.final_forecast_overall_metrics (scope, wape, mae, actual_sum, n_points)
+        SELECT 'ALL_MATERIALS_BEST', {fb.SUMS_METRICS_SQL}
+        FROM core.forecast_stage_summary WHERE run_id = %s
+        """,
+        (run_id,),
+    )
+    cur.execute(
+        "SELECT DISTINCT EXTRACT(YEAR FROM week_start)::int FROM core.forecast_stage_forecast WHERE run_id = %s",
+        (run_id,),
+    )
+    fb.ensure_history_table(cur, [r[0] for r in cur.fetchall()])
+    cur.execute(
+        """
+        INSERT INTO core.forecast_history (run_id, bom_material_name, week_start, horizon, forecast_qty, chosen_method)
+        SELECT
+            run_id,
+            bom_material_name,
+            week_start,
+            ROW_NUMBER() OVER (PARTITION BY bom_material_name ORDER BY week_start),
+            forecast_qty,
+            chosen_method
+        FROM core.forecast_stage_forecast WHERE run_id = %s
+        """,
+        (run_id,),
+    )
+    stage_cleanup(cur, run_id)
+    cur.execute(
+        "UPDATE core.forecast_runs SET status = 'published', finished_at = NOW() WHERE run_id = %s",
+        (run_id,),
+    )
+    cur.close()
+    conn.commit()
+
+
+def export_csv(conn, out_material: str, out_category: str, out_overall: str) -> None:
+    cur = conn.cursor()
+    for table, path in (
+        ("core.final_forecast_material_metrics", out_material),
+        ("core.final_forecast_category_unit_metrics", out_category),
+        ("core.final_forecast_overall_metrics", out_overall),
+    ):
+        if not path:
+            continue
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            cur.copy_expert(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)", fh)
+    cur.close()
+    conn.commit()
+
+
+def start_local_workers(run_id: str, count: int) -> List[subprocess.Popen]:
+    cmd = [sys.executable, os.path.abspath(__file__), "worker", "--run-id", run_id, "--exit-when-idle"]
+    return [subprocess.Popen(cmd) for _ in range(count)]
+
+
+def run_result(conn, run_id: str, timings: Dict[str, float]) -> Dict[str, object]:
+    """Counts summed over the shards' stats, in the shape of forecast_backtest.main()."""
+    cur = conn.cursor()
+    cur.execute("SELECT stats FROM core.forecast_jobs WHERE run_id = %s", (run_id,))
+    jobs = [r[0] or {} for r in cur.fetchall()]
+    cur.execute("SELECT wape FROM core.final_forecast_overall_metrics")
+    overall = cur.fetchone()
+    cur.close()
+    conn.commit()
+
+    result: Dict[str, object] = {
+        "run_id": run_id,
+        "shards": len(jobs),
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+        "overall_wape": float(overall[0]) if overall and overall[0] is not None else None,
+        "demand_classes": {},
+    }
+    for key in ("materials", "inactive", "forecast_rows", "metric_rows", *fb.new_fit_counts()):
+        result[key] = sum(int(j.get(key, 0)) for j in jobs)
+    for j in jobs:
+        for demand_class, n in (j.get("demand_classes") or {}).items():
+            result["demand_classes"][demand_class] = result["demand_classes"].get(demand_class, 0) + int(n)
+    return result
+
+
+def run_coordinator(
+    conn,
+    out_material: str,
+    out_category: str,
+    out_overall: str,
+    prune_models: bool = True,
+    selection: str = "full",
+    local_workers: int = 0,
+    work: bool = True,
+    run_id: Optional[str] = None,
+    reclaim_running: bool = False,
+    horizons: Iterable[int] = fb.EXTRA_HORIZONS,
+) -> Dict[str, object]:
+    """
+    Enqueue a run, wait for every shard (working shards itself when work=True),
+    then publish. Returns timings in seconds and counts like forecast_backtest.main().
+    An existing run_id is resumed: done shards are kept, the rest is (re)computed
+    with the run's original options and week index.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    ensure_queue_schema(conn)
+    previous = resume_run(conn, run_id, reclaim_running) if run_id else None
+    if previous == "published":
+        LOG.info("Forecast run %s is already published", run_id)
+        return run_result(conn, run_id, timings)
+    if previous is None:
+        options = {
+            "weeks": fb.load_week_index(conn),
+            "prune_models": prune_models,
+            "selection": selection,
+            "horizons": [int(h) for h in horizons],
+        }
+        run_id = enqueue_run(conn, options, run_id=run_id)
+    timings["enqueue"] = time.perf_counter() - started
+
+    step = time.perf_counter()
+    procs = start_local_workers(run_id, local_workers) if local_workers > 0 else []
+    worker = f"{default_worker_name()}:coordinator"
+    try:
+        while True:
+            if work and work_one(conn, worker, run_id):
+                continue
+            counts = run_progress(conn, run_id)
+            pending = counts.get("queued", 0) + counts.get("running", 0)
+            if pending == 0:
+                break
+            time.sleep(FORECAST_WORKER_POLL_SECONDS if not work else 1.0)
+    except BaseException as exc:
+        conn.rollback()
+        finish_run(conn, run_id, "failed", repr(exc))
+        raise
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+            proc.wait()
+    timings["shards"] = time.perf_counter() - step
+
+    if counts.get("failed", 0):
+        # staged shards are kept so a resume of run_id only recomputes the failed ones
+        finish_run(conn, run_id, "failed", f"{counts['failed']} shard(s) failed")
+        raise RuntimeError(f"Forecast run {run_id}: {counts['failed']} shard(s) failed; nothing published")
+
+    step = time.perf_counter()
+    publish_run(conn, run_id)
+    timings["publish"] = time.perf_counter() - step
+    step = time.perf_counter()
+    export_csv(conn, out_material, out_category, out_overall)
+    timings["csv"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - started
+    return run_result(conn, run_id, timings)
+
+
+if __name__ == "__main__":
+    from run_forecast import build_conn_str, forecast_options
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pg-conn", default=None, help="psycopg2 conninfo (default: PG_* env)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    coord = sub.add_parser("coordinator", help="enqueue a run, wait for the shards and publish")
+    coord.add_argument("--local-workers", type=int, default=int(os.getenv("FORECAST_LOCAL_WORKERS", "0")))
+    coord.add_argument("--no-work", action="store_true", help="only coordinate, leave every shard to workers")
+    coord.add_argument("--run-id", default=None, help="resume (or start) this run id")
+    wrk = sub.add_parser("worker", help="claim and process shards")
+    wrk.add_argument("--run-id", default=None, help="only shards of this run")
+    wrk.add_argument("--exit-when-idle", action="store_true")
+    wrk.add_argument("--name", default=None, help="worker name (default host:pid)")
+    args = ap.parse_args()
+
+    pg = psycopg2.connect(args.pg_conn or build_conn_str())
+    try:
+        if args.command == "coordinator":
+            print(run_coordinator(
+                pg,
+                **forecast_options(),
+                local_workers=args.local_workers,
+                work=not args.no_work,
+                run_id=args.run_id,
+            ))
+        else:
+            ensure_queue_schema(pg)
+            print({"shards": run_worker(pg, args.name, args.run_id, args.exit_when_idle)})
+    finally:
+        pg.close()
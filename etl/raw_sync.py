@@ -1,17 +1,25 @@
 import os
 import time
 import calendar
+import functools
 import logging
 import subprocess
 import gzip
+import hashlib
+import random
+import re
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import contextmanager
+from dataclasses import dataclass, field
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, date, timedelta
-from typing import Iterable, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from dotenv import load_dotenv
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 import pyodbc
 
 
@@ -53,6 +61,7 @@ FB_CFG = {
 FB_DSN_LIVE = os.getenv("FB_ODBC_DSN_LIVE", os.getenv("FB_ODBC_DSN", "live"))
 FB_DSN_FULL = os.getenv("FB_ODBC_DSN_FULL", os.getenv("FB_ODBC_DSN", "test"))
 FB_ACTIVE_DSN = FB_DSN_LIVE
+FB_SOURCE = os.getenv("FB_SOURCE", "odbc")  # odbc | sqlite:<path> (fb_standin, offline tests/benchmarks)
 
 PG_CFG = {
     "host": os.getenv("PG_HOST", "127.0.0.1"),
@@ -71,17 +80,31 @@ FULL_WINDOW_MONTHS = int(os.getenv("FULL_WINDOW_MONTHS", "6"))
 CORE_5MIN_SQL = os.getenv("CORE_5MIN_SQL", "")
 CORE_5MIN_SECONDS = int(os.getenv("CORE_5MIN_SECONDS", "3600"))
 CORE_WEEKLY_PRE_SQL = os.getenv("CORE_WEEKLY_PRE_SQL", "etl/sql/core_weekly_pre_forecast.sql")
-CORE_WEEKLY_POST_SQL = os.getenv("CORE_WEEKLY_POST_SQL", "etl/sql/core_weekly_post_forecast.sql")
+CORE_WEEKLY_POST_SQL = os.getenv("CORE_WEEKLY_POST_SQL", "")  # optional extra SQL after the forecast
 CORE_MAPPING_SQL = os.getenv("CORE_MAPPING_SQL", "")
-CORE_DASHBOARD_SQL = os.getenv("CORE_DASHBOARD_SQL", "etl/sql/core_dashboard_refresh.sql")
+CORE_MAPPING_INCREMENTAL_SQL = os.getenv("CORE_MAPPING_INCREMENTAL_SQL", "etl/sql/core_mapping_incremental.sql")
+CORE_DASHBOARD_SQL = os.getenv("CORE_DASHBOARD_SQL", "etl/sql/core_dashboard_build.sql")
 CORE_DASHBOARD_SECONDS = int(os.getenv("CORE_DASHBOARD_SECONDS", "1800"))
+CORE_DASHBOARD_SWAP_SQL = os.getenv("CORE_DASHBOARD_SWAP_SQL", "etl/sql/core_dashboard_swap.sql")
+CORE_DASHBOARD_MERGE_SQL = os.getenv("CORE_DASHBOARD_MERGE_SQL", "etl/sql/core_dashboard_merge.sql")
+DASHBOARD_MODE = os.getenv("DASHBOARD_MODE", "incremental").lower()  # incremental | full
 MONTHLY_SEAT_SQL = os.getenv("MONTHLY_SEAT_SQL", "etl/sql/core_monthly_seat.sql")
+SEAT_MODE = os.getenv("SEAT_MODE", "incremental").lower()  # incremental | monthly
 MONTHLY_ENABLED = os.getenv("MONTHLY_ENABLED", "true").lower() in ("1", "true", "yes")
 MONTHLY_DAY = int(os.getenv("MONTHLY_DAY", "2"))
 MONTHLY_TIME = os.getenv("MONTHLY_TIME", "02:00")
 MONTHLY_WINDOW_MINUTES = int(os.getenv("MONTHLY_WINDOW_MINUTES", "120"))
 OPEN_ORDER_SECONDS = int(os.getenv("OPEN_ORDER_SECONDS", "1800"))
+FORECAST_MODE = os.getenv("FORECAST_MODE", "inprocess").lower()  # inprocess | distributed | subprocess (FORECAST_COMMAND) | off
+FORECAST_LOCAL_WORKERS = int(os.getenv("FORECAST_LOCAL_WORKERS", "0"))  # distributed: worker processes started on this host
+FORECAST_CHECKPOINT = os.getenv("FORECAST_CHECKPOINT", "true").lower() in ("1", "true", "yes")  # weekly run resumable by run id
 FORECAST_COMMAND = os.getenv("FORECAST_COMMAND", "")
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "stockwise_events")
+RAW_PARTITIONED = os.getenv("RAW_PARTITIONED", "true").lower() in ("1", "true", "yes")
+SQL_JOB_WORKERS = int(os.getenv("SQL_JOB_WORKERS", "4"))
+SQL_JOB_RUNS_ENABLED = os.getenv("SQL_JOB_RUNS_ENABLED", "true").lower() in ("1", "true", "yes")
+SQL_EXPLAIN_SAMPLE = float(os.getenv("SQL_EXPLAIN_SAMPLE", "0"))  # fraction of statements run under EXPLAIN ANALYZE
+ETL_RUNS_ENABLED = os.getenv("ETL_RUNS_ENABLED", "true").lower() in ("1", "true", "yes")
 WEEKLY_ENABLED = os.getenv("WEEKLY_ENABLED", "true").lower() in ("1", "true", "yes")
 WEEKLY_DAY = int(os.getenv("WEEKLY_DAY", "0"))  # 0=Monday
 WEEKLY_TIME = os.getenv("WEEKLY_TIME", "02:00")
@@ -101,6 +124,14 @@ LAST_DASHBOARD_RUN = None
 LAST_WEEKLY_RUN = None
 LAST_MONTHLY_RUN = None
 LAST_OPEN_ORDER_RUN = None
+SQL_JOB_POOL = None
+# Firebird statements executed / failed attempts that were retried (read as deltas by track_stage)
+FB_ROUND_TRIPS = 0
+FB_RETRIES = 0
+ETL_RUN = None
+ETL_STAGES = []
+# set when raw.stock_master was reloaded and its match keys must be diffed against the snapshot
+MAPPING_STOCK_CHECK_PENDING = True
 
 
 # ---------------------------
@@ -113,6 +144,10 @@ def normalize_fb_path(path: str) -> str:
 
 def connect_fb(dsn: Optional[str] = None) -> pyodbc.Connection:
     dsn = dsn or FB_ACTIVE_DSN
+    if FB_SOURCE.startswith("sqlite:"):
+        import fb_standin
+
+        return fb_standin.connect(FB_SOURCE[len("sqlite:"):])
     LOG.info("Connecting to Firebird via ODBC %s:%s/%s", FB_CFG["host"], FB_CFG["port"], FB_CFG["database"])
     pyodbc.pooling = False
 
@@ -221,11 +256,260 @@ def connect_pg() -> psycopg2.extensions.connection:
 # PG schema helpers
 # ---------------------------
 
+STOCK_SUPPLIER_INSERT_SQL = f"""
+    INSERT INTO core.stock_supplier (stock_adi, supplier)
+    SELECT DISTINCT sm.adi, s.supplier
+    FROM {RAW_SCHEMA}.stock_master sm
+    CROSS JOIN LATERAL UNNEST(
+        ARRAY[sm.tedarikci_1, sm.tedarikci_2, sm.tedarikci_3, sm.tedarikci_4, sm.tedarikci_5]
+    ) AS s(supplier)
+    WHERE sm.adi IS NOT NULL
+      AND s.supplier IS NOT NULL
+      AND s.supplier <> ''
+"""
+
+
+# raw movement tables range-partitioned by transaction_date (yearly + DEFAULT for NULL/out-of-range)
+RAW_PARTITIONED_COLUMNS = {
+    "raw_bom_consumption": [
+        ("h_id", "INTEGER"),
+        ("transaction_date", "DATE"),
+        ("company_code", "TEXT"),
+        ("document_type", "TEXT"),
+        ("material_category", "TEXT"),
+        ("material_name", "TEXT"),
+        ("unit_of_measure", "TEXT"),
+        ("quantity", "NUMERIC"),
+        ("item_no", "TEXT"),
+        ("created_at", "TIMESTAMP DEFAULT NOW()"),
+        ("material_color", "TEXT"),
+    ],
+    "raw_stock_movements": [
+        ("h_id", "INTEGER"),
+        ("ref_hid", "INTEGER"),
+        ("hs_id", "INTEGER"),
+        ("transaction_date", "DATE"),
+        ("company_code", "TEXT"),
+        ("document_type", "TEXT"),
+        ("movement_status", "TEXT"),
+        ("material_name", "TEXT"),
+        ("material_label", "TEXT"),
+        ("material_category", "TEXT"),
+        ("item_no", "TEXT"),
+        ("unit_of_measure", "TEXT"),
+        ("quantity", "NUMERIC"),
+        ("created_at", "TIMESTAMP DEFAULT NOW()"),
+    ],
+}
+
+
+def raw_table_is_partitioned(pg, table: str) -> bool:
+    with pg.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relkind = 'p'
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relname = %s
+            """,
+            (RAW_SCHEMA, table),
+        )
+        row = cur.fetchone()
+        return bool(row and row[0])
+
+
+def create_partitioned_raw_table(pg, table: str, start_year: int) -> None:
+    columns = ",\n            ".join(f"{name} {ddl}" for name, ddl in RAW_PARTITIONED_COLUMNS[table])
+    with pg.cursor() as cur:
+        cur.execute(f"""
+        CREATE TABLE {RAW_SCHEMA}.{table} (
+            id BIGSERIAL,
+            {columns}
+        ) PARTITION BY RANGE (transaction_date);
+        """)
+        cur.execute(f"CREATE TABLE {RAW_SCHEMA}.{table}_default PARTITION OF {RAW_SCHEMA}.{table} DEFAULT;")
+    ensure_raw_partitions(pg, table, start_year)
+    LOG.info("Created partitioned %s.%s (yearly from %d)", RAW_SCHEMA, table, start_year)
+
+
+def ensure_raw_partitions(pg, table: str, start_year: Optional[int] = None) -> None:
+    """Create yearly partitions through next year; rows already in DEFAULT for a new range are moved."""
+    if start_year is None:
+        start_year = parse_ymd(FULL_START).year
+    with pg.cursor() as cur:
+        for year in range(start_year, datetime.now().year + 2):
+            part = f"{table}_{year}"
+            if pg_table_exists(pg, RAW_SCHEMA, part):
+                continue
+            lo, hi = f"{year}-01-01", f"{year + 1}-01-01"
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE raw_partition_move ON COMMIT DROP AS
+                SELECT * FROM {RAW_SCHEMA}.{table}_default
+                WHERE transaction_date >= %s AND transaction_date < %s
+                """,
+                (lo, hi),
+            )
+            moved = cur.rowcount
+            if moved:
+                cur.execute(
+                    f"DELETE FROM {RAW_SCHEMA}.{table}_default WHERE transaction_date >= %s AND transaction_date < %s",
+                    (lo, hi),
+                )
+            cur.execute(
+                f"""
+                CREATE TABLE {RAW_SCHEMA}.{part}
+                PARTITION OF {RAW_SCHEMA}.{table}
+                FOR VALUES FROM ('{lo}') TO ('{hi}')
+                """
+            )
+            if moved:
+                cur.execute(f"INSERT INTO {RAW_SCHEMA}.{table} SELECT * FROM raw_partition_move")
+                LOG.info("Moved %d rows from %s_default into %s", moved, table, part)
+            cur.execute("DROP TABLE raw_partition_move")
+
+
+def ensure_raw_indexes(pg) -> None:
+    """Indexes on the partitioned parents propagate to every partition (plain heaps get them too)."""
+    with pg.cursor() as cur:
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_bom_consumption_hid
+        ON {RAW_SCHEMA}.raw_bom_consumption (h_id);
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_bom_consumption_item
+        ON {RAW_SCHEMA}.raw_bom_consumption (item_no);
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_bom_consumption_date_brin
+        ON {RAW_SCHEMA}.raw_bom_consumption USING brin (transaction_date);
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_bom_consumption_material_date
+        ON {RAW_SCHEMA}.raw_bom_consumption (material_name, transaction_date);
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_stock_mov_hid
+          ON {RAW_SCHEMA}.raw_stock_movements (h_id);
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_stock_mov_hsid
+          ON {RAW_SCHEMA}.raw_stock_movements (hs_id);
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_stock_mov_date_brin
+          ON {RAW_SCHEMA}.raw_stock_movements USING brin (transaction_date);
+        """)
+        # seat count events, W22 outflows and receipt matching filter on warehouse + document type + date
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_stock_mov_wh_doc_date
+          ON {RAW_SCHEMA}.raw_stock_movements (company_code, document_type, transaction_date);
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS ix_raw_stock_mov_ref_hid
+          ON {RAW_SCHEMA}.raw_stock_movements (ref_hid, material_name)
+          WHERE ref_hid IS NOT NULL;
+        """)
+
+
+def partition_raw_table(pg, table: str) -> None:
+    """One-off migration of an existing heap table to the partitioned layout (single transaction)."""
+    if raw_table_is_partitioned(pg, table):
+        LOG.info("%s.%s is already partitioned", RAW_SCHEMA, table)
+        return
+    heap = f"{table}_heap"
+    columns = ", ".join(["id"] + [name for name, _ in RAW_PARTITIONED_COLUMNS[table]])
+    with pg.cursor() as cur:
+        cur.execute(f"SELECT MIN(transaction_date), COUNT(*) FROM {RAW_SCHEMA}.{table}")
+        min_date, total = cur.fetchone()
+        start_year = parse_ymd(FULL_START).year
+        if min_date is not None:
+            start_year = min(start_year, min_date.year)
+        LOG.info("Partitioning %s.%s rows=%d (from %d)", RAW_SCHEMA, table, total, start_year)
+        cur.execute(f"ALTER TABLE {RAW_SCHEMA}.{table} RENAME TO {heap}")
+        # the serial sequence and index names are schema-wide; free them for the new table
+        cur.execute(f"ALTER SEQUENCE IF EXISTS {RAW_SCHEMA}.{table}_id_seq RENAME TO {heap}_id_seq")
+        cur.execute(
+            """
+            SELECT indexname
+            FROM pg_indexes
+            WHERE schemaname = %s AND tablename = %s AND indexname LIKE 'ix\\_%%'
+            """,
+            (RAW_SCHEMA, heap),
+        )
+        for (index_name,) in cur.fetchall():
+            cur.execute(f"DROP INDEX {RAW_SCHEMA}.{index_name}")
+    create_partitioned_raw_table(pg, table, start_year)
+    with pg.cursor() as cur:
+        cur.execute(f"INSERT INTO {RAW_SCHEMA}.{table} ({columns}) SELECT {columns} FROM {RAW_SCHEMA}.{heap}")
+        moved = cur.rowcount
+        if moved != total:
+            raise RuntimeError(f"Partition migration of {table} copied {moved} of {total} rows")
+        cur.execute(
+            f"""
+            SELECT setval(
+                pg_get_serial_sequence('{RAW_SCHEMA}.{table}', 'id'),
+                GREATEST(COALESCE(MAX(id), 0), 1)
+            )
+            FROM {RAW_SCHEMA}.{table}
+            """
+        )
+        cur.execute(f"DROP TABLE {RAW_SCHEMA}.{heap}")
+    ensure_raw_indexes(pg)
+    pg.commit()
+    with pg.cursor() as cur:
+        cur.execute(f"ANALYZE {RAW_SCHEMA}.{table}")
+    pg.commit()
+    LOG.info("Partitioning %s.%s complete", RAW_SCHEMA, table)
+
+
+# weekly consumption aggregated per (material, week) for BOM rows with %s < h_id <= %s
+WEEKLY_SPARSE_UPSERT_SQL = f"""
+    INSERT INTO core.weekly_consumption_sparse AS t (
+        bom_material_name,
+        week_start,
+        qty,
+        bom_material_category,
+        bom_item_no,
+        bom_unit_of_measure,
+        last_transaction_date,
+        updated_at
+    )
+    SELECT
+        material_name,
+        date_trunc('week', transaction_date)::date,
+        SUM(quantity),
+        MIN(material_category),
+        MIN(item_no),
+        MIN(unit_of_measure),
+        MAX(transaction_date),
+        NOW()
+    FROM {RAW_SCHEMA}.raw_bom_consumption
+    WHERE h_id > %s
+      AND h_id <= %s
+      AND material_name IS NOT NULL
+      AND transaction_date IS NOT NULL
+    GROUP BY material_name, date_trunc('week', transaction_date)::date
+    ON CONFLICT (bom_material_name, week_start) DO UPDATE
+    SET qty = COALESCE(t.qty, 0) + COALESCE(EXCLUDED.qty, 0),
+        bom_material_category = LEAST(t.bom_material_category, EXCLUDED.bom_material_category),
+        bom_item_no = LEAST(t.bom_item_no, EXCLUDED.bom_item_no),
+        bom_unit_of_measure = LEAST(t.bom_unit_of_measure, EXCLUDED.bom_unit_of_measure),
+        last_transaction_date = GREATEST(t.last_transaction_date, EXCLUDED.last_transaction_date),
+        updated_at = NOW()
+"""
+
+
 def ensure_pg_schema(pg) -> None:
     with pg.cursor() as cur:
         cur.execute(f"CREATE SCHEMA IF NOT EXISTS {RAW_SCHEMA};")
         cur.execute("CREATE SCHEMA IF NOT EXISTS core;")
 
+        if RAW_PARTITIONED:
+            for table in RAW_PARTITIONED_COLUMNS:
+                if not pg_table_exists(pg, RAW_SCHEMA, table):
+                    create_partitioned_raw_table(pg, table, parse_ymd(FULL_START).year)
+
         cur.execute(f"""
         CREATE TABLE IF NOT EXISTS {RAW_SCHEMA}.raw_bom_consumption (
             id SERIAL PRIMARY KEY,
@@ -246,16 +530,6 @@ def ensure_pg_schema(pg) -> None:
         ADD COLUMN IF NOT EXISTS material_color TEXT;
         """)
 
-        cur.execute(f"""
-        CREATE INDEX IF NOT EXISTS ix_raw_bom_consumption_hid
-        ON {RAW_SCHEMA}.raw_bom_consumption (h_id);
-        """)
-
-        cur.execute(f"""
-        CREATE INDEX IF NOT EXISTS ix_raw_bom_consumption_item
-        ON {RAW_SCHEMA}.raw_bom_consumption (item_no);
-        """)
-
         cur.execute(f"""
         CREATE TABLE IF NOT EXISTS {RAW_SCHEMA}.raw_stock_movements (
             id SERIAL PRIMARY KEY,
@@ -298,14 +572,10 @@ def ensure_pg_schema(pg) -> None:
         );
         """)
 
-        cur.execute(f"""
-        CREATE INDEX IF NOT EXISTS ix_raw_stock_mov_hid
-          ON {RAW_SCHEMA}.raw_stock_movements (h_id);
-        """)
-        cur.execute(f"""
-        CREATE INDEX IF NOT EXISTS ix_raw_stock_mov_hsid
-          ON {RAW_SCHEMA}.raw_stock_movements (hs_id);
-        """)
+        ensure_raw_indexes(pg)
+        for table in RAW_PARTITIONED_COLUMNS:
+            if raw_table_is_partitioned(pg, table):
+                ensure_raw_partitions(pg, table)
 
         cur.execute(f"""
         CREATE TABLE IF NOT EXISTS {RAW_SCHEMA}.stock_master (
@@ -372,6 +642,14 @@ def ensure_pg_schema(pg) -> None:
         ON CONFLICT DO NOTHING;
         """)
         cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.seat_event_state (
+            warehouse      TEXT PRIMARY KEY,
+            last_trx_date  DATE NOT NULL,
+            last_event_id  BIGINT NOT NULL,
+            updated_at     TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """)
+        cur.execute("""
         CREATE TABLE IF NOT EXISTS core.raw_current_stock (
             stock_adi TEXT,
             warehouse TEXT,
@@ -388,24 +666,379 @@ def ensure_pg_schema(pg) -> None:
             material_category TEXT
         );
         """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.stock_supplier (
+            stock_adi TEXT NOT NULL,
+            supplier  TEXT NOT NULL,
+            PRIMARY KEY (stock_adi, supplier)
+        );
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_stock_supplier_supplier
+          ON core.stock_supplier (supplier);
+        """)
+        # placeholder until the first dashboard build swaps in the indexed table
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.material_supplier (
+            bom_material_name TEXT NOT NULL,
+            supplier          TEXT NOT NULL
+        );
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.weekly_consumption_sparse (
+            bom_material_name     TEXT NOT NULL,
+            week_start            DATE NOT NULL,
+            qty                   NUMERIC,
+            bom_material_category TEXT,
+            bom_item_no           TEXT,
+            bom_unit_of_measure   TEXT,
+            last_transaction_date DATE,
+            updated_at            TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (bom_material_name, week_start)
+        );
+        """)
+        # core.weekly_consumption used to be a dense materials x weeks table rebuilt
+        # by the weekly pre-forecast SQL; it is now a view densifying the sparse table.
+        cur.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'core'
+                  AND c.relname = 'weekly_consumption'
+                  AND c.relkind = 'r'
+            ) THEN
+                EXECUTE 'DROP TABLE core.weekly_consumption';
+            END IF;
+        END $$;
+        """)
+        cur.execute("""
+        CREATE OR REPLACE VIEW core.weekly_consumption AS
+        WITH max_dates AS (
+            SELECT
+                MAX(last_transaction_date) AS max_tx_date,
+                date_trunc('week', MAX(last_transaction_date))::date AS max_week_start
+            FROM core.weekly_consumption_sparse
+        ),
+        cutoff AS (
+            SELECT
+                CASE
+                    WHEN max_tx_date >= (max_week_start + INTERVAL '4 days') THEN max_week_start
+                    ELSE (max_week_start - INTERVAL '7 days')::date
+                END AS last_full_week_start
+            FROM max_dates
+        ),
+        material_map AS (
+            SELECT
+                bom_material_name,
+                MIN(bom_material_category) AS bom_material_category,
+                MIN(bom_item_no) AS bom_item_no,
+                MIN(bom_unit_of_measure) AS bom_unit_of_measure
+            FROM core.weekly_consumption_sparse
+            GROUP BY bom_material_name
+        ),
+        all_weeks AS (
+            SELECT DISTINCT s.week_start
+            FROM core.weekly_consumption_sparse s, cutoff c
+            WHERE s.week_start <= c.last_full_week_start
+        )
+        SELECT
+            m.bom_material_name,
+            m.bom_material_category,
+            m.bom_item_no,
+            m.bom_unit_of_measure,
+            w.week_start,
+            COALESCE(s.qty, 0) AS qty
+        FROM material_map m
+        CROSS JOIN all_weeks w
+        LEFT JOIN core.weekly_consumption_sparse s
+          ON s.bom_material_name = m.bom_material_name
+         AND s.week_start = w.week_start;
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.mapping_dirty_materials (
+            bom_material_name TEXT PRIMARY KEY,
+            marked_at         TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.stock_master_match_keys (
+            adi   TEXT,
+            ek_1  TEXT,
+            ek_2  TEXT,
+            turu3 TEXT
+        );
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_stock_master_match_keys_adi
+          ON core.stock_master_match_keys (adi);
+        """)
+        # first start after the snapshot was introduced: assume the current mapping matches stock_master
+        cur.execute(f"""
+        INSERT INTO core.stock_master_match_keys (adi, ek_1, ek_2, turu3)
+        SELECT DISTINCT adi, ek_1, ek_2::text, turu3
+        FROM {RAW_SCHEMA}.stock_master
+        WHERE adi IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM core.stock_master_match_keys)
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.sql_job_runs (
+            id          BIGSERIAL PRIMARY KEY,
+            run_id      TEXT NOT NULL,
+            file        TEXT NOT NULL,
+            step        TEXT,
+            stmt_index  INTEGER NOT NULL,
+            stmt_hash   TEXT NOT NULL,
+            stmt_head   TEXT,
+            started_at  TIMESTAMP NOT NULL,
+            duration_ms NUMERIC NOT NULL,
+            row_count   BIGINT,
+            status      TEXT NOT NULL,
+            error       TEXT,
+            explain     JSONB
+        );
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_sql_job_runs_file_stmt
+          ON core.sql_job_runs (file, stmt_index, stmt_hash);
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_sql_job_runs_started
+          ON core.sql_job_runs (started_at);
+        """)
+        # one row per tracked stage; the entry point itself is the row with stage = mode
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.etl_runs (
+            id             BIGSERIAL PRIMARY KEY,
+            run_id         TEXT NOT NULL,
+            mode           TEXT NOT NULL,
+            stage          TEXT NOT NULL,
+            depth          INTEGER NOT NULL,
+            started_at     TIMESTAMPTZ NOT NULL,
+            duration_ms    NUMERIC NOT NULL,
+            row_count      BIGINT,
+            fb_round_trips INTEGER NOT NULL DEFAULT 0,
+            fb_retries     INTEGER NOT NULL DEFAULT 0,
+            watermark_hid  BIGINT,
+            source_hid     BIGINT,
+            lag_hids       BIGINT,
+            status         TEXT NOT NULL,
+            error          TEXT
+        );
+        """)
+        cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_etl_runs_stage_started
+          ON core.etl_runs (mode, stage, started_at DESC);
+        """)
+        # started_at used to be naive ETL-host local time: convert once with this host's UTC offset
+        cur.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'core' AND table_name = 'etl_runs' AND column_name = 'started_at'
+        """)
+        row = cur.fetchone()
+        if row and row[0] == "timestamp without time zone":
+            offset = datetime.now().astimezone().utcoffset().total_seconds()
+            cur.execute(
+                """
+                ALTER TABLE core.etl_runs
+                  ALTER COLUMN started_at TYPE TIMESTAMPTZ
+                  USING (started_at - %s * INTERVAL '1 second') AT TIME ZONE 'UTC'
+                """,
+                (offset,),
+            )
+        # forecasts written before the quantile columns existed: the dashboard falls back to forecast_12w
+        cur.execute("""
+        ALTER TABLE IF EXISTS core.final_forecast_summary
+          ADD COLUMN IF NOT EXISTS forecast_p50_12w NUMERIC,
+          ADD COLUMN IF NOT EXISTS forecast_p80_12w NUMERIC,
+          ADD COLUMN IF NOT EXISTS forecast_p95_12w NUMERIC;
+        """)
+        # live overview built before the stock-out projection: the next merge inserts these columns
+        cur.execute("""
+        ALTER TABLE IF EXISTS core.dashboard_material_overview
+          ADD COLUMN IF NOT EXISTS open_order_in_transit NUMERIC,
+          ADD COLUMN IF NOT EXISTS weeks_of_coverage NUMERIC,
+          ADD COLUMN IF NOT EXISTS projected_stockout_week DATE;
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.dashboard_dirty_materials (
+            bom_material_name TEXT PRIMARY KEY,
+            marked_at         TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """)
+        # materials built by the next core_dashboard_build.sql run (filled by run_dashboard_refresh)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.dashboard_build_scope (
+            bom_material_name TEXT PRIMARY KEY
+        );
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS core.stage_generation (
+            name        TEXT PRIMARY KEY,
+            generation  BIGINT NOT NULL DEFAULT 0,
+            updated_at  TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """)
+        cur.execute("""
+        CREATE OR REPLACE FUNCTION core.unit_norm(uom TEXT)
+        RETURNS TEXT
+        LANGUAGE sql
+        IMMUTABLE
+        AS $$
+            SELECT CASE
+                WHEN uom = 'PktAdtMt' THEN 'Mt'
+                WHEN uom = 'PktAdt' THEN 'Adet'
+                ELSE uom
+            END
+        $$;
+        """)
+        # open-order receipt matching shared by the dashboard build and the backend open-order list
+        cur.execute(f"""
+        CREATE OR REPLACE VIEW core.open_order_receipts AS
+        WITH order_keys AS (
+            SELECT
+                h_id,
+                material_name,
+                core.unit_norm(unit_of_measure) AS unit_norm,
+                MIN(transaction_date) AS order_date
+            FROM {RAW_SCHEMA}.raw_open_order_movements
+            GROUP BY h_id, material_name, core.unit_norm(unit_of_measure)
+        )
+        SELECT
+            k.h_id,
+            k.material_name,
+            k.unit_norm,
+            SUM(r.quantity) AS matched_qty,
+            ARRAY_AGG(DISTINCT r.h_id) AS received_hids
+        FROM order_keys k
+        JOIN {RAW_SCHEMA}.raw_stock_movements r
+          ON r.ref_hid = k.h_id
+         AND r.material_name = k.material_name
+         AND core.unit_norm(r.unit_of_measure) = k.unit_norm
+         AND r.transaction_date >= k.order_date
+        WHERE r.ref_hid IS NOT NULL
+          AND r.document_type LIKE 'Depo Giri%'
+          AND r.company_code = 'WAREHOUSE22'
+        GROUP BY k.h_id, k.material_name, k.unit_norm;
+        """)
+        cur.execute(f"""
+        CREATE OR REPLACE VIEW core.open_order_lines AS
+        WITH open_orders AS (
+            SELECT
+                h_id,
+                hs_id,
+                transaction_date,
+                company_code,
+                document_type,
+                movement_status,
+                material_name,
+                material_label,
+                material_category,
+                item_no,
+                unit_of_measure,
+                core.unit_norm(unit_of_measure) AS unit_norm,
+                SUM(quantity) AS open_qty
+            FROM {RAW_SCHEMA}.raw_open_order_movements
+            GROUP BY
+                h_id, hs_id, transaction_date, company_code, document_type, movement_status,
+                material_name, material_label, material_category, item_no, unit_of_measure
+        )
+        SELECT
+            o.*,
+            COALESCE(m.matched_qty, 0) AS matched_qty,
+            m.received_hids,
+            GREATEST(o.open_qty - COALESCE(m.matched_qty, 0), 0) AS residual_open
+        FROM open_orders o
+        LEFT JOIN core.open_order_receipts m
+          ON m.h_id = o.h_id
+         AND m.material_name = o.material_name
+         AND m.unit_norm = o.unit_norm;
+        """)
+        cur.execute(f"""
+        CREATE OR REPLACE VIEW core.open_order_in_transit AS
+        WITH open_orders AS (
+            SELECT
+                h_id,
+                material_name,
+                core.unit_norm(unit_of_measure) AS unit_norm,
+                SUM(quantity) AS open_qty
+            FROM {RAW_SCHEMA}.raw_open_order_movements
+            GROUP BY h_id, material_name, unit_of_measure, transaction_date
+        )
+        SELECT
+            o.material_name AS stock_adi,
+            o.unit_norm,
+            SUM(GREATEST(o.open_qty - COALESCE(m.matched_qty, 0), 0)) AS in_transit_qty
+        FROM open_orders o
+        LEFT JOIN core.open_order_receipts m
+          ON m.h_id = o.h_id
+         AND m.material_name = o.material_name
+         AND m.unit_norm = o.unit_norm
+        GROUP BY o.material_name, o.unit_norm;
+        """)
+        # first start after the supplier tables were introduced
+        cur.execute(f"""
+        {STOCK_SUPPLIER_INSERT_SQL}
+          AND NOT EXISTS (SELECT 1 FROM core.stock_supplier)
+        """)
 
     pg.commit()
 
 
+def rebuild_stock_supplier(pg) -> None:
+    with pg.cursor() as cur:
+        cur.execute("TRUNCATE TABLE core.stock_supplier")
+        cur.execute(STOCK_SUPPLIER_INSERT_SQL)
+        total = cur.rowcount
+    pg.commit()
+    LOG.info("Rebuild core.stock_supplier complete: %d rows", total)
+
+
+def rebuild_weekly_consumption_sparse(pg) -> None:
+    with pg.cursor() as cur:
+        cur.execute(f"SELECT COALESCE(MAX(h_id), 0) FROM {RAW_SCHEMA}.raw_bom_consumption")
+        max_hid = int(cur.fetchone()[0])
+        cur.execute("TRUNCATE TABLE core.weekly_consumption_sparse")
+        cur.execute(WEEKLY_SPARSE_UPSERT_SQL, (0, max_hid))
+        total = cur.rowcount
+    # rows and watermark commit together
+    set_core_state_hid(pg, "weekly_consumption_sparse", max_hid)
+    LOG.info("Rebuild core.weekly_consumption_sparse complete: %d rows", total)
+    score_forecast_history(pg)
+
+
 def truncate_table(pg, table_name: str) -> None:
     with pg.cursor() as cur:
         cur.execute(f"TRUNCATE TABLE {RAW_SCHEMA}.{table_name}")
     pg.commit()
 
-def write_weekly_marker() -> None:
+def write_weekly_marker(**fields: str) -> None:
+    """fields (e.g. stage, forecast_run_id) tell a retry where the weekly run stopped."""
     marker_dir = os.path.dirname(WEEKLY_MARKER_FILE)
     if marker_dir:
         os.makedirs(marker_dir, exist_ok=True)
     payload = f"started_at={datetime.now().isoformat()}\n"
+    payload += "".join(f"{key}={value}\n" for key, value in fields.items())
     with open(WEEKLY_MARKER_FILE, "w", encoding="utf-8") as f:
         f.write(payload)
 
 
+def read_weekly_marker() -> Dict[str, str]:
+    try:
+        with open(WEEKLY_MARKER_FILE, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return {}
+    fields = {}
+    for line in lines:
+        key, sep, value = line.partition("=")
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
 def clear_weekly_marker() -> None:
     try:
         os.remove(WEEKLY_MARKER_FILE)
@@ -430,10 +1063,12 @@ def backup_raw_bom_consumption(pg) -> Optional[str]:
     with pg.cursor() as cur, gzip.open(path, "wt", encoding="utf-8", newline="") as f:
         cur.copy_expert(
             f"""
-            COPY {RAW_SCHEMA}.raw_bom_consumption
-                (h_id, transaction_date, company_code, document_type,
-                 material_category, material_name, unit_of_measure,
-                 quantity, item_no, material_color)
+            COPY (
+                SELECT h_id, transaction_date, company_code, document_type,
+                       material_category, material_name, unit_of_measure,
+                       quantity, item_no, material_color
+                FROM {RAW_SCHEMA}.raw_bom_consumption
+            )
             TO STDOUT WITH (FORMAT CSV)
             """,
             f,
@@ -508,6 +1143,61 @@ def set_core_state_hid(pg, name: str, last_hid: int) -> None:
         )
     pg.commit()
 
+def notify_views(pg, *views: str) -> None:
+    """Signal backend /events listeners that the given frontend views changed."""
+    if not EVENTS_CHANNEL or not views:
+        return
+    with pg.cursor() as cur:
+        for view in views:
+            cur.execute("SELECT pg_notify(%s, %s)", (EVENTS_CHANNEL, view))
+    pg.commit()
+
+
+def mark_dashboard_dirty_by_stock(pg, stock_names: Sequence[str]) -> int:
+    """Queue the BOM materials whose dashboard variants include any of the given stock cards."""
+    if not stock_names or not pg_table_exists(pg, "core", "dashboard_material_variants"):
+        # no live dashboard yet; the first refresh is a full rebuild anyway
+        return 0
+    with pg.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO core.dashboard_dirty_materials (bom_material_name)
+            SELECT DISTINCT bom_material_name
+            FROM core.dashboard_material_variants
+            WHERE stock_adi = ANY(%s)
+            UNION
+            SELECT DISTINCT bom_material_name
+            FROM core.bom_to_stock_map
+            WHERE stock_adi = ANY(%s)
+            ON CONFLICT (bom_material_name) DO NOTHING
+            """,
+            (list(stock_names), list(stock_names)),
+        )
+        marked = cur.rowcount
+    pg.commit()
+    return marked
+
+
+def mark_dashboard_dirty_by_bom_hid(pg, last_hid: int) -> int:
+    """Queue the BOM materials that received consumption rows after last_hid."""
+    with pg.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO core.dashboard_dirty_materials (bom_material_name)
+            SELECT DISTINCT material_name
+            FROM {RAW_SCHEMA}.raw_bom_consumption
+            WHERE h_id > %s
+              AND material_name IS NOT NULL
+              AND material_name <> ''
+            ON CONFLICT (bom_material_name) DO NOTHING
+            """,
+            (last_hid,),
+        )
+        marked = cur.rowcount
+    pg.commit()
+    return marked
+
+
 def pg_table_exists(pg, schema: str, table: str) -> bool:
     with pg.cursor() as cur:
         cur.execute(
@@ -547,7 +1237,7 @@ def split_sql_statements(sql_text: str) -> List[str]:
                 continue
         if ch == ";" and not in_dollar:
             stmt = "".join(buf).strip()
-            if stmt:
+            if has_sql_body(stmt):
                 statements.append(stmt)
             buf = []
             i += 1
@@ -555,11 +1245,258 @@ def split_sql_statements(sql_text: str) -> List[str]:
         buf.append(ch)
         i += 1
     tail = "".join(buf).strip()
-    if tail:
+    if has_sql_body(tail):
         statements.append(tail)
     return statements
 
 
+def has_sql_body(stmt: str) -> bool:
+    # a trailing comment block is not a statement (psycopg2 rejects empty queries)
+    return any(line.strip() and not line.strip().startswith("--") for line in stmt.splitlines())
+
+
+# ---------------------------
+# SQL job runner
+# ---------------------------
+
+SQL_STEP_RE = re.compile(r"^--\s*@step\s+(\S+)\s*$", re.MULTILINE)
+
+
+@dataclass
+class SqlStep:
+    name: str
+    statements: List[str]
+    reads: Set[str] = field(default_factory=set)
+    writes: Set[str] = field(default_factory=set)
+    barrier: bool = False
+    first_index: int = 0
+
+
+@dataclass
+class SqlJobRun:
+    """Per-statement timings of one execute_sql_file call, saved to core.sql_job_runs."""
+    file: str
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    records: List[tuple] = field(default_factory=list)
+
+
+EXPLAINABLE_RE = re.compile(
+    r"^(SELECT|INSERT|UPDATE|DELETE|WITH|VALUES|CREATE\s+(UNLOGGED\s+)?TABLE\s+\S+\s+AS)\b",
+    re.IGNORECASE,
+)
+
+
+def strip_leading_comments(stmt: str) -> str:
+    lines = stmt.splitlines()
+    while lines and (not lines[0].strip() or lines[0].strip().startswith("--")):
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def explain_row_count(explain) -> Optional[int]:
+    try:
+        plan = explain[0]["Plan"]
+        if plan.get("Node Type") == "ModifyTable" and plan.get("Plans"):
+            plan = plan["Plans"][0]
+        return int(plan.get("Actual Rows", 0) * plan.get("Actual Loops", 1))
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+def timed_execute(cur, stmt: str, run: Optional[SqlJobRun], stmt_index: int, step: Optional[str] = None) -> None:
+    """Execute one statement; with a run, record duration/rows and sample EXPLAIN (ANALYZE, BUFFERS)."""
+    if run is None:
+        cur.execute(stmt)
+        return
+    body = strip_leading_comments(stmt)
+    stmt_hash = hashlib.md5(" ".join(body.split()).encode("utf-8")).hexdigest()[:16]
+    explain = None
+    row_count = None
+    status = "ok"
+    error = None
+    started_at = datetime.now()
+    started = time.perf_counter()
+    try:
+        if SQL_EXPLAIN_SAMPLE > 0 and EXPLAINABLE_RE.match(body) and random.random() < SQL_EXPLAIN_SAMPLE:
+            # EXPLAIN ANALYZE executes the statement, so it replaces the plain execution
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + body)
+            explain = cur.fetchone()[0]
+            row_count = explain_row_count(explain)
+        else:
+            cur.execute(stmt)
+            row_count = cur.rowcount if cur.rowcount >= 0 else None
+    except Exception as exc:
+        status = "error"
+        error = repr(exc)[:2000]
+        raise
+    finally:
+        run.records.append(
+            (
+                run.run_id,
+                os.path.basename(run.file),
+                step,
+                stmt_index,
+                stmt_hash,
+                " ".join(body.split())[:200],
+                started_at,
+                round((time.perf_counter() - started) * 1000.0, 1),
+                row_count,
+                status,
+                error,
+                psycopg2.extras.Json(explain) if explain is not None else None,
+            )
+        )
+
+
+def save_sql_job_run(pg, run: Optional[SqlJobRun]) -> None:
+    if run is None or not run.records:
+        return
+    try:
+        with pg.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO core.sql_job_runs (
+                    run_id, file, step, stmt_index, stmt_hash, stmt_head,
+                    started_at, duration_ms, row_count, status, error, explain
+                )
+                VALUES %s
+                """,
+                run.records,
+            )
+        pg.commit()
+    except Exception as exc:
+        pg.rollback()
+        LOG.warning("Could not save sql_job_runs for %s: %s", run.file, repr(exc))
+
+
+def parse_sql_steps(sql_text: str) -> List[SqlStep]:
+    """
+    Split a SQL file into steps declared with header comments:
+        -- @step <name>
+        -- @reads <schema.table>, ...
+        -- @writes <schema.table>, ...
+        -- @barrier            (runs alone, after every earlier step)
+    Returns [] for files without @step markers.
+    """
+    matches = list(SQL_STEP_RE.finditer(sql_text))
+    if not matches:
+        return []
+    steps = []
+    preamble = split_sql_statements(sql_text[: matches[0].start()])
+    if preamble:
+        steps.append(SqlStep(name="preamble", statements=preamble, barrier=True))
+    stmt_count = len(preamble)
+    for idx, match in enumerate(matches):
+        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(sql_text)
+        body = sql_text[match.start():end]
+        step = SqlStep(name=match.group(1), statements=split_sql_statements(body), first_index=stmt_count)
+        stmt_count += len(step.statements)
+        for line in body.splitlines():
+            line = line.strip()
+            if line.startswith("-- @reads"):
+                step.reads.update(t.strip().lower() for t in line[len("-- @reads"):].split(",") if t.strip())
+            elif line.startswith("-- @writes"):
+                step.writes.update(t.strip().lower() for t in line[len("-- @writes"):].split(",") if t.strip())
+            elif line.startswith("-- @barrier"):
+                step.barrier = True
+        steps.append(step)
+    return steps
+
+
+def build_step_dependencies(steps: Sequence[SqlStep]) -> Dict[int, Set[int]]:
+    """A step waits for every earlier step it shares a written table with (or any step across a barrier)."""
+    deps: Dict[int, Set[int]] = {}
+    for j, step in enumerate(steps):
+        deps[j] = set()
+        for i in range(j):
+            earlier = steps[i]
+            if earlier.barrier or step.barrier:
+                deps[j].add(i)
+            elif earlier.writes & (step.reads | step.writes) or earlier.reads & step.writes:
+                deps[j].add(i)
+    return deps
+
+
+def get_sql_job_pool():
+    global SQL_JOB_POOL
+    if SQL_JOB_POOL is None:
+        SQL_JOB_POOL = psycopg2.pool.ThreadedConnectionPool(
+            1,
+            max(1, SQL_JOB_WORKERS),
+            host=PG_CFG["host"],
+            port=PG_CFG["port"],
+            dbname=PG_CFG["db"],
+            user=PG_CFG["user"],
+            password=PG_CFG["password"],
+        )
+    return SQL_JOB_POOL
+
+
+def run_sql_step(con, step: SqlStep, run: Optional[SqlJobRun] = None) -> float:
+    started = time.perf_counter()
+    try:
+        with con.cursor() as cur:
+            for offset, stmt in enumerate(step.statements):
+                timed_execute(cur, stmt, run, step.first_index + offset, step.name)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return time.perf_counter() - started
+
+
+def run_pooled_sql_step(step: SqlStep, run: Optional[SqlJobRun] = None) -> float:
+    pool = get_sql_job_pool()
+    con = pool.getconn()
+    try:
+        con.set_client_encoding("UTF8")
+        return run_sql_step(con, step, run)
+    finally:
+        pool.putconn(con)
+
+
+def run_sql_steps(pg, path: str, steps: Sequence[SqlStep], run: Optional[SqlJobRun] = None) -> None:
+    """Run annotated steps as a DAG; barrier steps run alone on the caller's connection."""
+    deps = build_step_dependencies(steps)
+    pending = list(range(len(steps)))
+    done: Set[int] = set()
+    running = {}
+    started = time.perf_counter()
+    pg.commit()
+    with ThreadPoolExecutor(max_workers=max(1, SQL_JOB_WORKERS), thread_name_prefix="sqljob") as executor:
+        while pending or running:
+            for idx in list(pending):
+                if not deps[idx] <= done:
+                    continue
+                step = steps[idx]
+                if step.barrier:
+                    if running:
+                        continue
+                    pending.remove(idx)
+                    elapsed = run_sql_step(pg, step, run)
+                    LOG.info("SQL step %s/%s done in %.1fs (serial)", os.path.basename(path), step.name, elapsed)
+                    done.add(idx)
+                    continue
+                if len(running) >= SQL_JOB_WORKERS:
+                    break
+                pending.remove(idx)
+                running[executor.submit(run_pooled_sql_step, step, run)] = idx
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                idx = running.pop(future)
+                try:
+                    elapsed = future.result()
+                except Exception:
+                    LOG.error("SQL step %s/%s failed", os.path.basename(path), steps[idx].name)
+                    raise
+                LOG.info("SQL step %s/%s done in %.1fs", os.path.basename(path), steps[idx].name, elapsed)
+                done.add(idx)
+    LOG.info("SQL file %s done in %.1fs (%d steps, workers=%d)", os.path.basename(path), time.perf_counter() - started, len(steps), SQL_JOB_WORKERS)
+
+
 def resolve_sql_path(path: str) -> str:
     if not path:
         return path
@@ -571,42 +1508,186 @@ def resolve_sql_path(path: str) -> str:
 def execute_sql_file(pg, path: str) -> None:
     sql_path = resolve_sql_path(path)
     sql_text = open(sql_path, "r", encoding="utf-8").read()
-    for stmt in split_sql_statements(sql_text):
-        stmt_upper = stmt.strip().upper()
+    run = SqlJobRun(file=sql_path) if SQL_JOB_RUNS_ENABLED else None
+    with track_stage(pg, os.path.basename(sql_path)):
+        try:
+            run_sql_text(pg, sql_path, sql_text, run)
+        except Exception:
+            pg.rollback()
+            raise
+        finally:
+            save_sql_job_run(pg, run)
+
+
+def run_sql_text(pg, sql_path: str, sql_text: str, run: Optional[SqlJobRun]) -> None:
+    steps = parse_sql_steps(sql_text) if SQL_JOB_WORKERS > 1 else []
+    if steps:
+        run_sql_steps(pg, sql_path, steps, run)
+        return
+    for stmt_index, stmt in enumerate(split_sql_statements(sql_text)):
+        stmt_upper = strip_leading_comments(stmt).strip().upper()
         if stmt_upper.startswith("REFRESH MATERIALIZED VIEW CONCURRENTLY"):
             pg.commit()
             pg.autocommit = True
             try:
                 with pg.cursor() as cur:
-                    cur.execute(stmt)
+                    timed_execute(cur, stmt, run, stmt_index)
             finally:
                 pg.autocommit = False
         else:
             with pg.cursor() as cur:
-                cur.execute(stmt)
+                timed_execute(cur, stmt, run, stmt_index)
     pg.commit()
 
 
 
 
 
+# ---------------------------
+# ETL run metrics
+# ---------------------------
+
+@dataclass
+class EtlStage:
+    name: str
+    started_at: datetime
+    started: float
+    fb_round_trips: int
+    fb_retries: int
+    rows: Optional[int] = None
+    watermark_hid: Optional[int] = None
+    source_hid: Optional[int] = None
+
+
+@dataclass
+class EtlRun:
+    """Stage metrics of one top-level entry point (run_incremental, run_weekly, ...), saved to core.etl_runs."""
+    mode: str
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    records: List[tuple] = field(default_factory=list)
+
+
+def note_stage(rows: Optional[int] = None, watermark_hid: Optional[int] = None, source_hid: Optional[int] = None) -> None:
+    """Attach rows written / H_ID watermark / newest source H_ID to the innermost tracked stage."""
+    if not ETL_STAGES:
+        return
+    stage = ETL_STAGES[-1]
+    if rows is not None:
+        stage.rows = (stage.rows or 0) + int(rows)
+    if watermark_hid is not None:
+        stage.watermark_hid = int(watermark_hid)
+    if source_hid is not None:
+        stage.source_hid = int(source_hid)
+
+
+def save_etl_run(pg, run: EtlRun) -> None:
+    if not run.records:
+        return
+    try:
+        with pg.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO core.etl_runs (
+                    run_id, mode, stage, depth, started_at, duration_ms, row_count,
+                    fb_round_trips, fb_retries, watermark_hid, source_hid, lag_hids, status, error
+                )
+                VALUES %s
+                """,
+                run.records,
+            )
+        pg.commit()
+    except Exception as exc:
+        pg.rollback()
+        LOG.warning("Could not save etl_runs for %s: %s", run.mode, repr(exc))
+
+
+@contextmanager
+def track_stage(pg, name: str):
+    """
+    Record duration, Firebird round trips/retries (nested stages included) and the
+    note_stage() values of one stage. The outermost stage opens the EtlRun and saves
+    all of its rows when it exits, a failed run is rolled back first.
+    """
+    global ETL_RUN
+    if not ETL_RUNS_ENABLED:
+        yield
+        return
+    top = ETL_RUN is None
+    if top:
+        ETL_RUN = EtlRun(mode=name)
+    stage = EtlStage(name, datetime.now().astimezone(), time.perf_counter(), FB_ROUND_TRIPS, FB_RETRIES)
+    ETL_STAGES.append(stage)
+    status = "ok"
+    error = None
+    try:
+        yield
+    except Exception as exc:
+        status = "error"
+        error = repr(exc)[:2000]
+        raise
+    finally:
+        ETL_STAGES.pop()
+        lag = None
+        if stage.watermark_hid is not None and stage.source_hid is not None:
+            lag = max(stage.source_hid - stage.watermark_hid, 0)
+        ETL_RUN.records.append(
+            (
+                ETL_RUN.run_id,
+                ETL_RUN.mode,
+                name,
+                len(ETL_STAGES),
+                stage.started_at,
+                round((time.perf_counter() - stage.started) * 1000.0, 1),
+                stage.rows,
+                FB_ROUND_TRIPS - stage.fb_round_trips,
+                FB_RETRIES - stage.fb_retries,
+                stage.watermark_hid,
+                stage.source_hid,
+                lag,
+                status,
+                error,
+            )
+        )
+        if top:
+            run = ETL_RUN
+            ETL_RUN = None
+            if status != "ok" and not pg.closed:
+                pg.rollback()
+            if not pg.closed:
+                save_etl_run(pg, run)
+
+
+def etl_stage(fn):
+    """Track fn(pg, ...) as a stage named after the function."""
+    @functools.wraps(fn)
+    def wrapper(pg, *args, **kwargs):
+        with track_stage(pg, fn.__name__):
+            return fn(pg, *args, **kwargs)
+
+    return wrapper
+
+
 # ---------------------------
 # Firebird query helpers
 # ---------------------------
 
 def fb_select_all(sql: str, params=(), retries=3, pause=0.5):
-    global con_fb
+    global con_fb, FB_ROUND_TRIPS, FB_RETRIES
     for attempt in range(1, retries + 1):
         try:
             ensure_fb()
             cur = con_fb.cursor()
             try:
+                FB_ROUND_TRIPS += 1
                 cur.execute(sql, params)
                 return cur.fetchall()
             finally:
                 cur.close()
         except Exception as exc:
             LOG.warning("Firebird select failed try=%s/%s: %s", attempt, retries, repr(exc))
+            if attempt < retries:
+                FB_RETRIES += 1
             close_fb()
             time.sleep(pause * attempt)
     raise RuntimeError("Firebird select failed")
@@ -715,11 +1796,12 @@ def fetch_stock_lines(h_id: int, retries=5):
         LEFT JOIN STOK_KARTI sk ON sk.ADI = hs.URUN_KODU
         WHERE hs.H_ID = ?
     """
-    global con_fb
+    global con_fb, FB_ROUND_TRIPS, FB_RETRIES
     for attempt in range(1, retries + 1):
         try:
             ensure_fb()
             cur = con_fb.cursor()
+            FB_ROUND_TRIPS += 1
             cur.execute(q, (h_id,))
             while True:
                 rows = cur.fetchmany(1000)
@@ -731,6 +1813,8 @@ def fetch_stock_lines(h_id: int, retries=5):
             return
         except Exception as exc:
             LOG.warning("Stock line fetch failed H_ID=%s try=%s/%s: %s", h_id, attempt, retries, repr(exc))
+            if attempt < retries:
+                FB_RETRIES += 1
             close_fb()
             time.sleep(attempt * 0.5)
 
@@ -908,6 +1992,7 @@ def iter_windows(d1_str: str, d2_str: str, months: int) -> Iterable[Tuple[str, s
 # Full load
 # ---------------------------
 
+@etl_stage
 def full_load_bom(pg, start: str, end: str, months: int) -> None:
     LOG.info("Full load BOM %s -> %s", start, end)
     backup_path = backup_raw_bom_consumption(pg)
@@ -945,6 +2030,8 @@ def full_load_bom(pg, start: str, end: str, months: int) -> None:
             LOG.info("BOM window complete: %s -> %s rows=%d", ws, we, window_written)
 
         LOG.info("Full load BOM complete: %d rows", total)
+        note_stage(rows=total)
+        rebuild_weekly_consumption_sparse(pg)
     except Exception as exc:
         LOG.error("Full load BOM failed: %s", repr(exc))
         if backup_path:
@@ -956,6 +2043,7 @@ def full_load_bom(pg, start: str, end: str, months: int) -> None:
 
 
 
+@etl_stage
 def full_load_stock(pg, start: str, end: str, months: int) -> None:
     LOG.info("Full load stock %s -> %s", start, end)
     truncate_table(pg, "raw_stock_movements")
@@ -1004,9 +2092,12 @@ def full_load_stock(pg, start: str, end: str, months: int) -> None:
         LOG.info("Stock window complete: %s -> %s rows=%d", ws, we, window_written)
 
     LOG.info("Full load stock complete: %d rows", total)
+    note_stage(rows=total)
 
 
+@etl_stage
 def full_load_stock_master(pg) -> None:
+    global MAPPING_STOCK_CHECK_PENDING
     LOG.info("Full load stock_master")
     truncate_table(pg, "stock_master")
     rows = fetch_stock_master_rows()
@@ -1020,8 +2111,13 @@ def full_load_stock_master(pg) -> None:
     if batch:
         total += pg_insert_stock_master_batch(pg, batch)
     LOG.info("Full load stock_master complete: %d rows", total)
+    note_stage(rows=total)
+    rebuild_stock_supplier(pg)
+    mark_dashboard_full_pending(pg)
+    MAPPING_STOCK_CHECK_PENDING = True
 
 
+@etl_stage
 def rebuild_bom_unique_materials(pg) -> None:
     LOG.info("Rebuilding core.bom_unique_materials from raw_bom_consumption")
     with pg.cursor() as cur:
@@ -1098,9 +2194,11 @@ def get_max_stock_hid_pg(pg) -> int:
     return int(row[0]) if row and row[0] is not None else 0
 
 
+@etl_stage
 def incremental_bom(pg, last_hid: int) -> int:
     hids = fetch_bom_hids_since(last_hid)
     if not hids:
+        note_stage(rows=0, watermark_hid=last_hid, source_hid=last_hid)
         return last_hid
 
     LOG.info("BOM incremental (append-only) H_ID count=%d", len(hids))
@@ -1126,12 +2224,95 @@ def incremental_bom(pg, last_hid: int) -> int:
         batch.clear()
 
     LOG.info("BOM incremental rows=%d", total)
+    # lag stays above zero while failed H_IDs keep the watermark behind the newest source document
+    note_stage(rows=total, watermark_hid=max_hid, source_hid=hids[-1])
+    incremental_weekly_consumption_sparse(pg)
     return max_hid
 
 
+@etl_stage
+def incremental_weekly_consumption_sparse(pg) -> bool:
+    last_hid = get_core_state_hid(pg, "weekly_consumption_sparse")
+    if last_hid is None:
+        # no watermark yet: aggregate the whole raw table once
+        rebuild_weekly_consumption_sparse(pg)
+        return True
+
+    with pg.cursor() as cur:
+        cur.execute(
+            f"SELECT COALESCE(MAX(h_id), 0) FROM {RAW_SCHEMA}.raw_bom_consumption WHERE h_id > %s",
+            (last_hid,),
+        )
+        row = cur.fetchone()
+        max_hid = int(row[0]) if row and row[0] is not None else 0
+
+    if max_hid <= last_hid:
+        return False
+
+    with pg.cursor() as cur:
+        cur.execute(WEEKLY_SPARSE_UPSERT_SQL, (last_hid, max_hid))
+        upserted = cur.rowcount
+    # the upsert adds quantities: it must commit with the watermark or a retry double-counts
+    set_core_state_hid(pg, "weekly_consumption_sparse", max_hid)
+    LOG.info("weekly_consumption_sparse incremental rows=%d (h_id %d -> %d)", upserted, last_hid, max_hid)
+    score_forecast_history(pg)
+    return True
+
+
+@etl_stage
+def score_forecast_history(pg) -> int:
+    """
+    Fill actual_qty / abs_err of stored forecasts whose week closed: a week is
+    closed once consumption exists a full week after its start. Weeks without a
+    weekly_consumption_sparse row realized 0.
+    """
+    if not pg_table_exists(pg, "core", "forecast_history"):
+        return 0
+    with pg.cursor() as cur:
+        cur.execute("SELECT MAX(last_transaction_date)::date - 7 FROM core.weekly_consumption_sparse")
+        row = cur.fetchone()
+        last_closed = row[0] if row else None
+        if last_closed is None:
+            return 0
+        cur.execute(
+            """
+            UPDATE core.forecast_history h
+            SET actual_qty = w.qty,
+                abs_err = ABS(h.forecast_qty - w.qty),
+                scored_at = NOW()
+            FROM core.weekly_consumption_sparse w
+            WHERE h.scored_at IS NULL
+              AND h.week_start <= %s
+              AND w.bom_material_name = h.bom_material_name
+              AND w.week_start = h.week_start
+            """,
+            (last_closed,),
+        )
+        scored = cur.rowcount
+        cur.execute(
+            """
+            UPDATE core.forecast_history
+            SET actual_qty = 0,
+                abs_err = ABS(forecast_qty),
+                scored_at = NOW()
+            WHERE scored_at IS NULL
+              AND week_start <= %s
+            """,
+            (last_closed,),
+        )
+        scored += cur.rowcount
+    pg.commit()
+    note_stage(rows=scored)
+    if scored:
+        LOG.info("Forecast history scored rows=%d (weeks through %s)", scored, last_closed)
+    return scored
+
+
+@etl_stage
 def incremental_stock(pg, last_hid: int) -> int:
     hids = fetch_stock_changed_hids(last_hid)
     if not hids:
+        note_stage(rows=0, watermark_hid=last_hid, source_hid=last_hid)
         return last_hid
 
     LOG.info("Stock incremental (append-only) H_ID count=%d", len(hids))
@@ -1172,7 +2353,9 @@ def incremental_stock(pg, last_hid: int) -> int:
         batch.clear()
 
     LOG.info("Stock incremental rows=%d", total)
-    return get_max_stock_hid_pg(pg)
+    new_hid = get_max_stock_hid_pg(pg)
+    note_stage(rows=total, watermark_hid=new_hid, source_hid=hids[-1])
+    return new_hid
 
 
 def incremental_stock_master(pg) -> bool:
@@ -1180,10 +2363,24 @@ def incremental_stock_master(pg) -> bool:
     return False
 
 
+def fetch_open_order_fingerprint(pg) -> dict:
+    with pg.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT material_name, COUNT(*), SUM(quantity), MAX(h_id), MAX(transaction_date)
+            FROM {RAW_SCHEMA}.raw_open_order_movements
+            GROUP BY material_name
+            """
+        )
+        return {r[0]: tuple(r[1:]) for r in cur.fetchall() if r and r[0]}
+
+
+@etl_stage
 def refresh_open_orders(pg) -> int:
     if not pg_table_exists(pg, RAW_SCHEMA, "raw_open_order_movements"):
         LOG.warning("Skipping open order refresh; raw_open_order_movements missing")
         return 0
+    before = fetch_open_order_fingerprint(pg)
     truncate_table(pg, "raw_open_order_movements")
     batch = []
     total = 0
@@ -1196,9 +2393,17 @@ def refresh_open_orders(pg) -> int:
         total += pg_insert_open_order_batch(pg, batch)
         batch.clear()
     LOG.info("Open order refresh rows=%d", total)
+    note_stage(rows=total)
+    after = fetch_open_order_fingerprint(pg)
+    changed = [name for name in set(before) | set(after) if before.get(name) != after.get(name)]
+    if changed:
+        LOG.info("Open order refresh changed stock_adi count=%d", len(changed))
+        mark_dashboard_dirty_by_stock(pg, changed)
+    notify_views(pg, "open_orders")
     return total
 
 
+@etl_stage
 def incremental_bom_unique_materials(pg) -> bool:
     if not pg_table_exists(pg, "core", "bom_unique_materials"):
         LOG.warning("Skipping bom_unique_materials incremental; core table missing")
@@ -1228,27 +2433,38 @@ def incremental_bom_unique_materials(pg) -> bool:
     with pg.cursor() as cur:
         cur.execute(
             f"""
-            INSERT INTO core.bom_unique_materials AS t
-                (material_name, material_color, item_no, unit_of_measure, material_category)
-            SELECT DISTINCT
-                material_name,
-                material_color,
-                item_no,
-                unit_of_measure,
-                material_category
-            FROM {RAW_SCHEMA}.raw_bom_consumption
-            WHERE h_id > %s
-              AND material_name IS NOT NULL
-              AND material_name <> ''
-            ON CONFLICT (material_name) DO NOTHING
+            WITH inserted AS (
+                INSERT INTO core.bom_unique_materials AS t
+                    (material_name, material_color, item_no, unit_of_measure, material_category)
+                SELECT DISTINCT
+                    material_name,
+                    material_color,
+                    item_no,
+                    unit_of_measure,
+                    material_category
+                FROM {RAW_SCHEMA}.raw_bom_consumption
+                WHERE h_id > %s
+                  AND material_name IS NOT NULL
+                  AND material_name <> ''
+                ON CONFLICT (material_name) DO NOTHING
+                RETURNING material_name
+            )
+            INSERT INTO core.mapping_dirty_materials (bom_material_name)
+            SELECT DISTINCT material_name
+            FROM inserted
+            ON CONFLICT (bom_material_name) DO NOTHING
             """,
             (last_hid,),
         )
+        if cur.rowcount > 0:
+            LOG.info("bom_unique_materials new materials queued for mapping=%d", cur.rowcount)
     pg.commit()
+    mark_dashboard_dirty_by_bom_hid(pg, last_hid)
     set_core_state_hid(pg, "bom_unique_materials", max_hid)
     return True
 
 
+@etl_stage
 def incremental_raw_current_stock(pg) -> bool:
     if not pg_table_exists(pg, "core", "raw_current_stock"):
         LOG.warning("Skipping raw_current_stock incremental; core table missing")
@@ -1330,6 +2546,52 @@ def incremental_raw_current_stock(pg) -> bool:
     return True
 
 
+def rebuild_current_stock_by_variant_for(pg, stock_names: List[str]) -> None:
+    with pg.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM core.current_stock_by_variant
+            WHERE stock_adi = ANY(%s)
+            """,
+            (stock_names,),
+        )
+        cur.execute(
+            """
+            INSERT INTO core.current_stock_by_variant
+            SELECT
+                b.bom_material_name,
+                b.bom_uom,
+                b.bom_type,
+                r.stock_adi,
+                r.stock_uom,
+                r.warehouse,
+                CASE
+                    WHEN b.bom_type LIKE 'KUMA%%'
+                     AND b.bom_uom  = 'Mt2'
+                     AND (r.stock_uom ILIKE '%%mt%%' AND r.stock_uom NOT ILIKE '%%mt2%%')
+                    THEN
+                        r.current_stock
+                        * (
+                            NULLIF(
+                                REGEXP_REPLACE(b.ek_2, '[^0-9\.]', '', 'g'),
+                                ''
+                            )::NUMERIC
+                          / 100.0
+                          )
+                    ELSE
+                        r.current_stock
+                END AS current_stock
+            FROM core.bom_to_stock_map b
+            JOIN core.raw_current_stock r
+                  ON b.stock_adi = r.stock_adi
+            WHERE r.stock_adi = ANY(%s)
+            """,
+            (stock_names,),
+        )
+    pg.commit()
+
+
+@etl_stage
 def incremental_current_stock_by_variant(pg) -> bool:
     if not pg_table_exists(pg, "core", "current_stock_by_variant"):
         LOG.warning("Skipping current_stock_by_variant incremental; core table missing")
@@ -1383,49 +2645,255 @@ def incremental_current_stock_by_variant(pg) -> bool:
 
     LOG.info("current_stock_by_variant incremental stock_adi count=%d", len(stock_names))
 
+    rebuild_current_stock_by_variant_for(pg, stock_names)
+    mark_dashboard_dirty_by_stock(pg, stock_names)
+    set_core_state_hid(pg, "current_stock_by_variant", max_hid)
+    return True
+
+
+# seat count rows (Depo Giriş in seat warehouses) loaded after the watermark
+SEAT_NEW_ROWS_SQL = f"""
+    SELECT
+        sm.company_code     AS warehouse,
+        sm.transaction_date AS trx_date,
+        sm.material_name    AS stock_adi,
+        sm.unit_of_measure  AS stock_uom,
+        sm.quantity
+    FROM {RAW_SCHEMA}.raw_stock_movements sm
+    JOIN core.seat_warehouses sw
+      ON sw.warehouse = sm.company_code
+    WHERE sm.h_id > %s
+      AND sm.document_type = 'Depo Giriş'
+      AND sm.transaction_date IS NOT NULL
+"""
+
+
+def seat_global_count_date(pg) -> Optional[date]:
+    with pg.cursor() as cur:
+        cur.execute("SELECT MAX(count_end_date) FROM core.current_stock_seat_warehouses")
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+@etl_stage
+def incremental_seat_events(pg) -> bool:
+    """
+    Extend seat count events with rows loaded since the last run.
+    Event ids continue from core.seat_event_state with the same 7-day gap rule as
+    core_monthly_seat.sql. Backdated rows (before a warehouse's last count day)
+    fall back to the full monthly SQL.
+    """
+    if SEAT_MODE != "incremental":
+        return False
+    if not pg_table_exists(pg, "core", "seat_count_events") or not pg_table_exists(pg, "core", "current_stock_seat_warehouses"):
+        LOG.info("Seat tables missing; running full seat refresh")
+        run_monthly_seat(pg)
+        return True
+
+    last_hid = get_core_state_hid(pg, "seat_count_events")
+    if last_hid is None:
+        LOG.info("No seat watermark yet; running full seat refresh")
+        run_monthly_seat(pg)
+        return True
+
+    with pg.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT COALESCE(MAX(sm.h_id), 0)
+            FROM {RAW_SCHEMA}.raw_stock_movements sm
+            JOIN core.seat_warehouses sw
+              ON sw.warehouse = sm.company_code
+            WHERE sm.h_id > %s
+            """,
+            (last_hid,),
+        )
+        max_hid = int(cur.fetchone()[0])
+    if max_hid <= last_hid:
+        return False
+
+    with pg.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT COUNT(*)
+            FROM ({SEAT_NEW_ROWS_SQL}) n
+            JOIN core.seat_event_state s
+              ON s.warehouse = n.warehouse
+            WHERE n.trx_date < s.last_trx_date
+            """,
+            (last_hid,),
+        )
+        backdated = int(cur.fetchone()[0])
+    if backdated:
+        LOG.info("Seat incremental found %d backdated count rows; running full seat refresh", backdated)
+        run_monthly_seat(pg)
+        return True
+
+    before = seat_global_count_date(pg)
     with pg.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS seat_new_events")
+        cur.execute(
+            f"""
+            CREATE TEMP TABLE seat_new_events AS
+            WITH new_rows AS (
+                {SEAT_NEW_ROWS_SQL}
+            ),
+            new_days AS (
+                SELECT DISTINCT warehouse, trx_date
+                FROM new_rows
+            ),
+            marked AS (
+                SELECT
+                    d.warehouse,
+                    d.trx_date,
+                    COALESCE(
+                        LAG(d.trx_date) OVER (PARTITION BY d.warehouse ORDER BY d.trx_date),
+                        s.last_trx_date
+                    ) AS prev_date,
+                    COALESCE(s.last_event_id, 0) AS base_event_id
+                FROM new_days d
+                LEFT JOIN core.seat_event_state s
+                  ON s.warehouse = d.warehouse
+            ),
+            evented AS (
+                SELECT
+                    warehouse,
+                    trx_date,
+                    base_event_id + SUM(
+                        CASE
+                            WHEN prev_date IS NULL THEN 1
+                            WHEN trx_date - prev_date > 7 THEN 1
+                            ELSE 0
+                        END
+                    ) OVER (PARTITION BY warehouse ORDER BY trx_date) AS event_id
+                FROM marked
+            )
+            SELECT
+                n.warehouse,
+                n.trx_date,
+                n.stock_adi,
+                n.stock_uom,
+                n.quantity,
+                e.event_id
+            FROM new_rows n
+            JOIN evented e
+              ON e.warehouse = n.warehouse
+             AND e.trx_date  = n.trx_date
+            """,
+            (last_hid,),
+        )
+        cur.execute("SELECT DISTINCT warehouse FROM seat_new_events")
+        warehouses = [r[0] for r in cur.fetchall()]
+        if not warehouses:
+            cur.execute("DROP TABLE seat_new_events")
+            set_core_state_hid(pg, "seat_count_events", max_hid)
+            return False
+
+        # stock names counted in the previous event, so stock that is no longer counted drops to zero
         cur.execute(
             """
-            DELETE FROM core.current_stock_by_variant
-            WHERE stock_adi = ANY(%s)
+            SELECT DISTINCT stock_adi
+            FROM core.current_stock_seat_warehouses
+            WHERE warehouse = ANY(%s)
             """,
-            (stock_names,),
+            (warehouses,),
         )
+        stock_names = {r[0] for r in cur.fetchall() if r[0]}
+
         cur.execute(
             """
-            INSERT INTO core.current_stock_by_variant
+            INSERT INTO core.seat_count_events (warehouse, trx_date, stock_adi, stock_uom, quantity, event_id)
+            SELECT warehouse, trx_date, stock_adi, stock_uom, quantity, event_id
+            FROM seat_new_events
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO core.seat_event_state (warehouse, last_trx_date, last_event_id, updated_at)
+            SELECT warehouse, MAX(trx_date), MAX(event_id), NOW()
+            FROM seat_new_events
+            GROUP BY warehouse
+            ON CONFLICT (warehouse) DO UPDATE
+            SET last_trx_date = EXCLUDED.last_trx_date,
+                last_event_id = EXCLUDED.last_event_id,
+                updated_at = NOW()
+            """
+        )
+        cur.execute("DELETE FROM core.seat_last_event WHERE warehouse = ANY(%s)", (warehouses,))
+        cur.execute(
+            """
+            INSERT INTO core.seat_last_event (warehouse, last_event_id)
+            SELECT warehouse, last_event_id
+            FROM core.seat_event_state
+            WHERE warehouse = ANY(%s)
+            """,
+            (warehouses,),
+        )
+        cur.execute("DELETE FROM core.current_stock_seat_warehouses WHERE warehouse = ANY(%s)", (warehouses,))
+        cur.execute(
+            """
+            INSERT INTO core.current_stock_seat_warehouses
+                (stock_adi, warehouse, stock_uom, current_stock, count_end_date, count_start_date)
             SELECT
-                b.bom_material_name,
-                b.bom_uom,
-                b.bom_type,
-                r.stock_adi,
-                r.stock_uom,
-                r.warehouse,
-                CASE
-                    WHEN b.bom_type LIKE 'KUMA%%'
-                     AND b.bom_uom  = 'Mt2'
-                     AND (r.stock_uom ILIKE '%%mt%%' AND r.stock_uom NOT ILIKE '%%mt2%%')
-                    THEN
-                        r.current_stock
-                        * (
-                            NULLIF(
-                                REGEXP_REPLACE(b.ek_2, '[^0-9\.]', '', 'g'),
-                                ''
-                            )::NUMERIC
-                          / 100.0
-                          )
-                    ELSE
-                        r.current_stock
-                END AS current_stock
-            FROM core.bom_to_stock_map b
-            JOIN core.raw_current_stock r
-                  ON b.stock_adi = r.stock_adi
-            WHERE r.stock_adi = ANY(%s)
+                e.stock_adi,
+                e.warehouse,
+                e.stock_uom,
+                SUM(e.quantity),
+                MAX(e.trx_date),
+                MIN(e.trx_date)
+            FROM core.seat_count_events e
+            JOIN core.seat_event_state st
+              ON st.warehouse = e.warehouse
+             AND st.last_event_id = e.event_id
+            WHERE e.warehouse = ANY(%s)
+            GROUP BY e.stock_adi, e.warehouse, e.stock_uom
             """,
-            (stock_names,),
+            (warehouses,),
         )
-    pg.commit()
-    set_core_state_hid(pg, "current_stock_by_variant", max_hid)
+        cur.execute("DELETE FROM core.raw_current_stock WHERE warehouse = ANY(%s)", (warehouses,))
+        cur.execute(
+            """
+            INSERT INTO core.raw_current_stock (stock_adi, warehouse, stock_uom, current_stock)
+            SELECT stock_adi, warehouse, stock_uom, current_stock
+            FROM core.current_stock_seat_warehouses
+            WHERE warehouse = ANY(%s)
+            RETURNING stock_adi
+            """,
+            (warehouses,),
+        )
+        stock_names.update(r[0] for r in cur.fetchall() if r[0])
+        cur.execute("DROP TABLE seat_new_events")
+        # events, stock tables and watermark commit together: a retry would re-insert same-day rows
+        set_core_state_hid(pg, "seat_count_events", max_hid)
+
+    LOG.info("Seat incremental warehouses=%s stock_adi count=%d", ", ".join(warehouses), len(stock_names))
+    if stock_names and pg_table_exists(pg, "core", "current_stock_by_variant"):
+        rebuild_current_stock_by_variant_for(pg, sorted(stock_names))
+        mark_dashboard_dirty_by_stock(pg, sorted(stock_names))
+    if seat_global_count_date(pg) != before:
+        # W22 outflows and seat consumption are measured from the latest count date for every material
+        mark_dashboard_full_pending(pg)
+    return True
+
+
+@etl_stage
+def incremental_mapping(pg, stock_changed: bool = False) -> bool:
+    """Re-match new BOM materials and those touched by stock_master key changes."""
+    global MAPPING_STOCK_CHECK_PENDING
+    if not CORE_MAPPING_INCREMENTAL_SQL:
+        return False
+    if not pg_table_exists(pg, "core", "bom_to_stock_map"):
+        LOG.warning("Skipping mapping incremental; bom_to_stock_map missing")
+        return False
+
+    with pg.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM core.mapping_dirty_materials")
+        queued = int(cur.fetchone()[0])
+    if queued == 0 and not (stock_changed or MAPPING_STOCK_CHECK_PENDING):
+        return False
+
+    LOG.info("Running mapping incremental (queued materials=%d): %s", queued, CORE_MAPPING_INCREMENTAL_SQL)
+    execute_sql_file(pg, CORE_MAPPING_INCREMENTAL_SQL)
+    MAPPING_STOCK_CHECK_PENDING = False
     return True
 
 
@@ -1433,6 +2901,7 @@ def incremental_current_stock_by_variant(pg) -> bool:
 # Main loop
 # ---------------------------
 
+@etl_stage
 def run_full(pg, include_monthly_refresh: bool = True) -> None:
     with use_fb_dsn(FB_DSN_FULL):
         full_load_bom(pg, FULL_START, FULL_END, FULL_WINDOW_MONTHS)
@@ -1449,8 +2918,10 @@ def run_full(pg, include_monthly_refresh: bool = True) -> None:
     if CORE_MAPPING_SQL:
         LOG.info("Running mapping refresh: %s", CORE_MAPPING_SQL)
         execute_sql_file(pg, CORE_MAPPING_SQL)
+        mark_dashboard_full_pending(pg)
 
 
+@etl_stage
 def run_full_stock_only(pg) -> None:
     with use_fb_dsn(FB_DSN_FULL):
         full_load_stock(pg, FULL_START, FULL_END, FULL_WINDOW_MONTHS)
@@ -1465,10 +2936,12 @@ def run_full_stock_only(pg) -> None:
     if CORE_MAPPING_SQL and pg_table_exists(pg, "core", "bom_unique_materials"):
         LOG.info("Running mapping refresh: %s", CORE_MAPPING_SQL)
         execute_sql_file(pg, CORE_MAPPING_SQL)
+        mark_dashboard_full_pending(pg)
     elif CORE_MAPPING_SQL:
         LOG.warning("Skipping mapping refresh; core.bom_unique_materials missing")
 
 
+@etl_stage
 def run_incremental(pg, run_refresh_jobs: bool = True) -> None:
     global LAST_CORE_RUN, LAST_DASHBOARD_RUN, LAST_OPEN_ORDER_RUN
     bom_last_hid = get_max_bom_hid_pg(pg)
@@ -1476,17 +2949,23 @@ def run_incremental(pg, run_refresh_jobs: bool = True) -> None:
 
     bom_new_hid = incremental_bom(pg, bom_last_hid)
     stock_new_hid = incremental_stock(pg, stock_last_hid)
-    _ = stock_new_hid
     master_changed = incremental_stock_master(pg)
 
     if (bom_new_hid != bom_last_hid) or master_changed:
         if CORE_MAPPING_SQL:
             LOG.info("Running mapping refresh: %s", CORE_MAPPING_SQL)
             execute_sql_file(pg, CORE_MAPPING_SQL)
+            mark_dashboard_full_pending(pg)
 
     incremental_bom_unique_materials(pg)
+    if not CORE_MAPPING_SQL:
+        incremental_mapping(pg, stock_changed=master_changed)
     incremental_raw_current_stock(pg)
     incremental_current_stock_by_variant(pg)
+    incremental_seat_events(pg)
+    if stock_new_hid != stock_last_hid:
+        # new receipts change received/remaining quantities on the open-order view
+        notify_views(pg, "open_orders")
 
     if run_refresh_jobs and OPEN_ORDER_SECONDS > 0:
         now = datetime.now()
@@ -1504,39 +2983,256 @@ def run_incremental(pg, run_refresh_jobs: bool = True) -> None:
     if run_refresh_jobs and CORE_DASHBOARD_SQL and CORE_DASHBOARD_SECONDS > 0:
         now = datetime.now()
         if LAST_DASHBOARD_RUN is None or (now - LAST_DASHBOARD_RUN).total_seconds() >= CORE_DASHBOARD_SECONDS:
-            LOG.info("Running dashboard refresh: %s", CORE_DASHBOARD_SQL)
-            execute_sql_file(pg, CORE_DASHBOARD_SQL)
+            run_dashboard_refresh(pg)
             LAST_DASHBOARD_RUN = now
 
 
+def dashboard_tables_ready(pg) -> bool:
+    return all(
+        pg_table_exists(pg, "core", table)
+        for table in (
+            "dashboard_material_variants",
+            "dashboard_material_overview",
+            "dashboard_material_flow_observation",
+        )
+    )
+
+
+def get_stage_generation(pg, name: str) -> Optional[int]:
+    with pg.cursor() as cur:
+        cur.execute("SELECT generation FROM core.stage_generation WHERE name = %s", (name,))
+        row = cur.fetchone()
+    return int(row[0]) if row else None
+
+
+def set_stage_generation(pg, name: str, generation: int) -> None:
+    with pg.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO core.stage_generation (name, generation, updated_at)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (name) DO UPDATE
+            SET generation = EXCLUDED.generation,
+                updated_at = NOW()
+            """,
+            (name, generation),
+        )
+    pg.commit()
+
+
+def bump_stage_generation(pg, name: str) -> None:
+    with pg.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO core.stage_generation (name, generation, updated_at)
+            VALUES (%s, 1, NOW())
+            ON CONFLICT (name) DO UPDATE
+            SET generation = core.stage_generation.generation + 1,
+                updated_at = NOW()
+            """,
+            (name,),
+        )
+    pg.commit()
+
+
+def mark_dashboard_full_pending(pg) -> None:
+    """Inputs of every dashboard row changed (mapping, stock master, seat counts, forecast)."""
+    bump_stage_generation(pg, "dashboard_inputs")
+
+
+def dashboard_full_pending(pg) -> bool:
+    built = get_stage_generation(pg, "dashboard_build")
+    if built is None:
+        return True
+    return (get_stage_generation(pg, "dashboard_inputs") or 0) > built
+
+
+def prepare_dashboard_scope(pg, full: bool) -> int:
+    with pg.cursor() as cur:
+        cur.execute("TRUNCATE TABLE core.dashboard_build_scope")
+        if full:
+            cur.execute(
+                """
+                INSERT INTO core.dashboard_build_scope (bom_material_name)
+                SELECT material_name
+                FROM core.bom_unique_materials
+                """
+            )
+        else:
+            cur.execute(
+                """
+                INSERT INTO core.dashboard_build_scope (bom_material_name)
+                SELECT bom_material_name
+                FROM core.dashboard_dirty_materials
+                """
+            )
+        total = cur.rowcount
+        cur.execute("ANALYZE core.dashboard_build_scope")
+    pg.commit()
+    return total
+
+
+@etl_stage
+def run_dashboard_refresh(pg, full: bool = False) -> bool:
+    """
+    Build the dashboard once per trigger with core_dashboard_build.sql.
+    A full build (swap) runs when forced or when the dashboard_inputs generation moved
+    past the last build. Otherwise only queued materials are rebuilt (merge), and
+    nothing runs when the queue is empty.
+    """
+    if not CORE_DASHBOARD_SQL:
+        return False
+    inputs = get_stage_generation(pg, "dashboard_inputs") or 0
+    full = (
+        full
+        or dashboard_full_pending(pg)
+        or not dashboard_tables_ready(pg)
+        or not CORE_DASHBOARD_MERGE_SQL
+    )
+    if not full:
+        with pg.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM core.dashboard_dirty_materials")
+            dirty = int(cur.fetchone()[0])
+        if dirty == 0:
+            LOG.info("Dashboard build skipped: inputs generation %d already built, no queued materials", inputs)
+            return False
+        # DASHBOARD_MODE=full rebuilds everything whenever anything is queued
+        full = DASHBOARD_MODE == "full"
+
+    scope = prepare_dashboard_scope(pg, full)
+    note_stage(rows=scope)
+    LOG.info(
+        "Running %s dashboard build (materials=%d, inputs generation=%d): %s",
+        "full" if full else "incremental",
+        scope,
+        inputs,
+        CORE_DASHBOARD_SQL,
+    )
+    execute_sql_file(pg, CORE_DASHBOARD_SQL)
+    # on the stage table, so the finalizer publishes finished coverage rows
+    project_stockout(pg)
+    if full:
+        execute_sql_file(pg, CORE_DASHBOARD_SWAP_SQL)
+        set_stage_generation(pg, "dashboard_build", inputs)
+    else:
+        execute_sql_file(pg, CORE_DASHBOARD_MERGE_SQL)
+    notify_views(pg, "materials")
+    return True
+
+
+@etl_stage
+def project_stockout(pg) -> int:
+    """
+    Projected weekly balance (current_stock + open_order_in_transit - cumulative
+    core.final_forecast) of the built materials in core.dashboard_material_overview_new,
+    before the swap / merge publishes them, as one material x week matrix. The first week whose cumulative demand exceeds the
+    balance is projected_stockout_week. weeks_of_coverage is fractional inside the
+    horizon and extrapolated at the mean weekly forecast beyond it, NULL without demand.
+    In-transit quantities have no arrival date and count as available now.
+    """
+    if not pg_table_exists(pg, "core", "final_forecast"):
+        return 0
+    import numpy as np
+
+    with pg.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                o.bom_material_name,
+                COALESCE(o.current_stock, 0) + COALESCE(o.open_order_in_transit, 0),
+                ARRAY_AGG(f.forecast_qty::float ORDER BY f.week_start) FILTER (WHERE f.week_start IS NOT NULL),
+                ARRAY_AGG(f.week_start ORDER BY f.week_start) FILTER (WHERE f.week_start IS NOT NULL)
+            FROM core.dashboard_material_overview_new o
+            LEFT JOIN core.final_forecast f
+              ON f.bom_material_name = o.bom_material_name
+            GROUP BY o.bom_material_name, o.current_stock, o.open_order_in_transit
+            """
+        )
+        rows = [r for r in cur.fetchall() if r[2]]
+    if not rows:
+        pg.commit()
+        note_stage(rows=0)
+        return 0
+
+    horizon = max(len(r[2]) for r in rows)
+    demand = np.zeros((len(rows), horizon))
+    for i, r in enumerate(rows):
+        demand[i, : len(r[2])] = [q or 0.0 for q in r[2]]
+    demand = np.maximum(demand, 0.0)
+    available = np.array([float(r[1]) for r in rows])
+
+    cum = np.cumsum(demand, axis=1)
+    short = cum > available[:, None]
+    out = short.any(axis=1)
+    idx = np.arange(len(rows))
+    first = np.argmax(short, axis=1)
+    before = np.where(first > 0, cum[idx, np.maximum(first - 1, 0)], 0.0)
+    week_demand = demand[idx, first]
+    partial = np.clip(np.divide(available - before, week_demand, out=np.zeros(len(rows)), where=week_demand > 0), 0.0, 1.0)
+    rate = cum[:, -1] / horizon
+    extrapolated = np.divide(available, rate, out=np.full(len(rows), np.nan), where=rate > 0)
+    coverage = np.where(out, first + partial, extrapolated)
+
+    values = [
+        (
+            r[0],
+            None if np.isnan(coverage[i]) else round(float(coverage[i]), 2),
+            r[3][first[i]] if out[i] else None,
+        )
+        for i, r in enumerate(rows)
+    ]
+    with pg.cursor() as cur:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            UPDATE core.dashboard_material_overview_new o
+            SET weeks_of_coverage = v.weeks_of_coverage,
+                projected_stockout_week = v.projected_stockout_week
+            FROM (VALUES %s) AS v(bom_material_name, weeks_of_coverage, projected_stockout_week)
+            WHERE o.bom_material_name = v.bom_material_name
+            """,
+            values,
+            template="(%s, %s::numeric, %s::date)",
+            page_size=1000,
+        )
+    pg.commit()
+    note_stage(rows=len(values))
+    LOG.info("Stock-out projection: materials=%d projected out within %d weeks=%d", len(values), horizon, int(out.sum()))
+    return len(values)
+
+
+@etl_stage
 def run_weekly(pg) -> None:
     global LAST_WEEKLY_RUN
     LOG.info("Weekly refresh starting")
-    write_weekly_marker()
+    marker = read_weekly_marker()
+    run_id = marker.get("forecast_run_id") if marker.get("stage") == "forecast" else None
     try:
-        with use_fb_dsn(FB_DSN_FULL):
-            full_load_bom(pg, FULL_START, FULL_END, FULL_WINDOW_MONTHS)
-        with use_fb_dsn(FB_DSN_LIVE):
-            last_hid = get_max_bom_hid_pg(pg)
-            LOG.info("BOM live incremental after full load (last_hid=%d)", last_hid)
-            incremental_bom(pg, last_hid)
-            full_load_stock_master(pg)
-        rebuild_bom_unique_materials(pg)
-        if CORE_WEEKLY_PRE_SQL:
-            LOG.info("Running weekly pre-forecast SQL: %s", CORE_WEEKLY_PRE_SQL)
-            execute_sql_file(pg, CORE_WEEKLY_PRE_SQL)
-
-        if FORECAST_COMMAND:
-            LOG.info("Running forecast command")
-            result = subprocess.run(FORECAST_COMMAND, shell=True)
-            if result.returncode != 0:
-                raise RuntimeError(f"Forecast command failed with code {result.returncode}")
+        if run_id:
+            # loads and pre-forecast SQL finished before the crash, only the forecast resumes
+            LOG.warning("Weekly marker at forecast stage; resuming forecast run %s", run_id)
         else:
-            LOG.warning("FORECAST_COMMAND not set; skipping forecast run")
-
-        if CORE_WEEKLY_POST_SQL:
-            LOG.info("Running weekly post-forecast SQL: %s", CORE_WEEKLY_POST_SQL)
-            execute_sql_file(pg, CORE_WEEKLY_POST_SQL)
+            write_weekly_marker(stage="load")
+            for table in RAW_PARTITIONED_COLUMNS:
+                if raw_table_is_partitioned(pg, table):
+                    ensure_raw_partitions(pg, table)
+            pg.commit()
+            with use_fb_dsn(FB_DSN_FULL):
+                full_load_bom(pg, FULL_START, FULL_END, FULL_WINDOW_MONTHS)
+            with use_fb_dsn(FB_DSN_LIVE):
+                last_hid = get_max_bom_hid_pg(pg)
+                LOG.info("BOM live incremental after full load (last_hid=%d)", last_hid)
+                incremental_bom(pg, last_hid)
+                full_load_stock_master(pg)
+            rebuild_bom_unique_materials(pg)
+            if CORE_WEEKLY_PRE_SQL:
+                LOG.info("Running weekly pre-forecast SQL: %s", CORE_WEEKLY_PRE_SQL)
+                execute_sql_file(pg, CORE_WEEKLY_PRE_SQL)
+            if FORECAST_CHECKPOINT:
+                run_id = f"weekly-{datetime.now():%Y%m%dT%H%M%S}"
+                write_weekly_marker(stage="forecast", forecast_run_id=run_id)
+        run_forecast(pg, run_id)
+        run_post_forecast(pg)
     except Exception:
         LOG.error("Weekly refresh failed; leaving marker for retry")
         raise
@@ -1545,25 +3241,79 @@ def run_weekly(pg) -> None:
     LOG.info("Weekly refresh complete")
 
 
+@etl_stage
 def run_weekly_forecast_pipeline(pg) -> None:
     global LAST_WEEKLY_RUN
     if CORE_WEEKLY_PRE_SQL:
         LOG.info("Running weekly pre-forecast SQL: %s", CORE_WEEKLY_PRE_SQL)
         execute_sql_file(pg, CORE_WEEKLY_PRE_SQL)
+    run_forecast(pg)
+    run_post_forecast(pg)
 
-    if FORECAST_COMMAND:
+    LAST_WEEKLY_RUN = datetime.now()
+
+
+@etl_stage
+def run_forecast(pg, run_id: Optional[str] = None) -> None:
+    """
+    Run the forecast on the ETL connection (FORECAST_MODE=inprocess), as shards
+    of the core.forecast_jobs queue (distributed, see forecast_queue.py) or as
+    FORECAST_COMMAND in a separate interpreter (subprocess, for isolation).
+    With run_id the in-process / distributed run is checkpointed under it and an
+    unfinished run with that id is resumed.
+    """
+    if FORECAST_MODE in ("inprocess", "distributed"):
+        # pandas/statsmodels are only loaded on the weekly run
+        import forecast_backtest
+        import run_forecast as forecast_runner
+
+        if FORECAST_MODE == "distributed":
+            import forecast_queue
+
+            LOG.info("Running distributed forecast (local workers=%d)", FORECAST_LOCAL_WORKERS)
+            result = forecast_queue.run_coordinator(
+                pg,
+                **forecast_runner.forecast_options(),
+                local_workers=FORECAST_LOCAL_WORKERS,
+                run_id=run_id,
+            )
+        else:
+            LOG.info("Running forecast in-process (run_id=%s)", run_id)
+            result = forecast_backtest.main(conn_str="", conn=pg, run_id=run_id, **forecast_runner.forecast_options())
+        LOG.info(
+            "Forecast complete: materials=%d inactive=%d forecast_rows=%d timings=%s",
+            result["materials"],
+            result["inactive"],
+            result["forecast_rows"],
+            result["timings"],
+        )
+        LOG.info(
+            "Forecast demand classes=%s model fits run=%d avoided=%d (ETS avoided=%d, halving avoided=%d)",
+            result["demand_classes"],
+            result["fits"],
+            result["fits_avoided"],
+            result["ets_fits_avoided"],
+            result["halving_fits_avoided"],
+        )
+        note_stage(rows=result["forecast_rows"])
+    elif FORECAST_MODE == "subprocess" and FORECAST_COMMAND:
         LOG.info("Running forecast command")
         result = subprocess.run(FORECAST_COMMAND, shell=True)
         if result.returncode != 0:
             raise RuntimeError(f"Forecast command failed with code {result.returncode}")
     else:
-        LOG.warning("FORECAST_COMMAND not set; skipping forecast run")
+        LOG.warning("Forecast disabled (FORECAST_MODE=%s, FORECAST_COMMAND=%r); skipping forecast run", FORECAST_MODE, FORECAST_COMMAND)
+        return
+    notify_views(pg, "forecast")
 
+
+def run_post_forecast(pg) -> None:
     if CORE_WEEKLY_POST_SQL:
         LOG.info("Running weekly post-forecast SQL: %s", CORE_WEEKLY_POST_SQL)
         execute_sql_file(pg, CORE_WEEKLY_POST_SQL)
-
-    LAST_WEEKLY_RUN = datetime.now()
+    # new forecasts change forecast_12w and safety_status of every material
+    mark_dashboard_full_pending(pg)
+    run_dashboard_refresh(pg)
 
 
 def run_post_weekly_refreshes(pg) -> None:
@@ -1574,11 +3324,11 @@ def run_post_weekly_refreshes(pg) -> None:
         LOG.info("Running core refresh: %s", CORE_5MIN_SQL)
         execute_sql_file(pg, CORE_5MIN_SQL)
 
-    if CORE_DASHBOARD_SQL:
-        LOG.info("Running dashboard refresh: %s", CORE_DASHBOARD_SQL)
-        execute_sql_file(pg, CORE_DASHBOARD_SQL)
+    # only open-order changes queued since the post-forecast build are merged here
+    run_dashboard_refresh(pg)
 
 
+@etl_stage
 def run_bootstrap(pg) -> None:
     LOG.info("Bootstrap starting")
     run_full(pg, include_monthly_refresh=False)
@@ -1592,6 +3342,7 @@ def run_bootstrap(pg) -> None:
     LOG.info("Bootstrap complete")
 
 
+@etl_stage
 def run_bootstrap_continue(pg) -> None:
     """
     Continue bootstrap from live catch-up stage after a completed full load.
@@ -1607,6 +3358,7 @@ def run_bootstrap_continue(pg) -> None:
     LOG.info("Bootstrap continue complete")
 
 
+@etl_stage
 def run_bootstrap_stock_only(pg) -> None:
     LOG.info("Bootstrap (stock-only) starting")
     run_full_stock_only(pg)
@@ -1615,6 +3367,7 @@ def run_bootstrap_stock_only(pg) -> None:
     LOG.info("Bootstrap (stock-only) complete")
 
 
+@etl_stage
 def run_complete_with_live_incremental(pg) -> None:
     """
     Complete full-load flow using live incremental catch-up only (no delete/reload),
@@ -1633,13 +3386,18 @@ def run_complete_with_live_incremental(pg) -> None:
     LOG.info("Live completion complete")
 
 
+@etl_stage
 def run_monthly_seat(pg) -> None:
     global LAST_MONTHLY_RUN
     if not MONTHLY_SEAT_SQL:
         LOG.warning("MONTHLY_SEAT_SQL not set; skipping monthly seat refresh")
         return
     LOG.info("Monthly seat refresh starting: %s", MONTHLY_SEAT_SQL)
+    max_hid = get_max_stock_hid_pg(pg)
     execute_sql_file(pg, MONTHLY_SEAT_SQL)
+    set_core_state_hid(pg, "seat_count_events", max_hid)
+    # new seat counts move count_end_date and the seat stock of every variant
+    mark_dashboard_full_pending(pg)
     LAST_MONTHLY_RUN = datetime.now()
     LOG.info("Monthly seat refresh complete")
 
@@ -1656,11 +3414,18 @@ def main() -> None:
     parser.add_argument("--bootstrap-continue", action="store_true", help="continue bootstrap after full load using live catch-up")
     parser.add_argument("--bootstrap-stock-only", action="store_true", help="bootstrap without raw_bom_consumption")
     parser.add_argument("--complete-live", action="store_true", help="run live incremental catch-up, then monthly+weekly")
+    parser.add_argument("--partition-raw", action="store_true", help="migrate raw movement tables to transaction_date partitions and exit")
     args = parser.parse_args()
 
     pg = connect_pg()
     ensure_pg_schema(pg)
 
+    if args.partition_raw:
+        for table in RAW_PARTITIONED_COLUMNS:
+            partition_raw_table(pg, table)
+        pg.close()
+        return
+
     if args.full:
         run_full(pg)
         pg.close()
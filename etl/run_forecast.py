@@ -11,11 +11,19 @@ def build_conn_str() -> str:
     return f"dbname={db} user={user} password={password} host={host} port={port}"
 
 
+def forecast_options() -> dict:
+    return {
+        "out_material": os.getenv("FORECAST_OUT_MATERIAL", "material_level_backtest.csv"),
+        "out_category": os.getenv("FORECAST_OUT_CATEGORY", "category_unit_backtest.csv"),
+        "out_overall": os.getenv("FORECAST_OUT_OVERALL", "overall_backtest.csv"),
+        "prune_models": os.getenv("FORECAST_PRUNE_MODELS", "true").lower() in ("1", "true", "yes"),
+        "selection": os.getenv("FORECAST_SELECTION", "full").lower(),
+        "horizons": [int(h) for h in os.getenv("FORECAST_HORIZONS", "4,8").split(",") if h.strip()],
+    }
+
+
 if __name__ == "__main__":
     conn_str = build_conn_str()
-    main(
-        conn_str=conn_str,
-        out_material=os.getenv("FORECAST_OUT_MATERIAL", "material_level_backtest.csv"),
-        out_category=os.getenv("FORECAST_OUT_CATEGORY", "category_unit_backtest.csv"),
-        out_overall=os.getenv("FORECAST_OUT_OVERALL", "overall_backtest.csv"),
-    )
+    # FORECAST_RUN_ID checkpoints the run, re-running with the same id resumes it
+    result = main(conn_str=conn_str, run_id=os.getenv("FORECAST_RUN_ID") or None, **forecast_options())
+    print(result)
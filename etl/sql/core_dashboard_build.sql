@@ -0,0 +1,357 @@
+-- Dashboard build (canonical)
+-- Builds the dashboard stage tables (*_new) for the materials in core.dashboard_build_scope.
+-- raw_sync.run_dashboard_refresh fills the scope (every BOM material for a full build,
+-- the queued core.dashboard_dirty_materials otherwise) and then runs a finalizer:
+--   core_dashboard_swap.sql  renames the stage tables over the live ones (full build)
+--   core_dashboard_merge.sql replaces the scoped rows in the live tables (incremental)
+-- Open-order quantities come from the shared views core.open_order_in_transit / core.open_order_lines.
+-- Steps are annotated for the SQL job runner (raw_sync.execute_sql_file):
+--   @step <name>, @reads/@writes <tables>, @barrier = run alone after every earlier step.
+
+
+-- @step variants
+-- @reads core.dashboard_build_scope, raw.stock_master, core.open_order_in_transit, core.bom_unique_materials, core.raw_current_stock
+-- @writes core.dashboard_material_variants_new
+-- MATERIAL DASHBOARD VARIANTS: 2 Options, first is mainstream
+
+DROP TABLE IF EXISTS core.dashboard_material_variants_new;
+
+CREATE TABLE core.dashboard_material_variants_new AS
+WITH allowed_warehouses AS (
+    SELECT unnest(ARRAY[
+        'WAREHOUSE22',
+        'JALUZİ KOLTUK DEPO',
+        'KATLAMALI KOLTUK DEPO',
+        'STOR KOLTUK DEPO'
+    ]) AS warehouse
+),
+
+variants AS (
+
+    SELECT
+        b.material_name AS bom_material_name,
+        s.adi           AS stock_adi
+    FROM core.bom_unique_materials b
+    JOIN core.dashboard_build_scope sc
+      ON sc.bom_material_name = b.material_name
+    JOIN raw.stock_master s
+      ON s.ek_1 = b.material_color
+     AND (
+            /* 1️⃣ KUMAŞ → item_no'ya bakma */
+            b.material_category = 'KUMAŞ'
+
+            /* 2️⃣ KUMAŞ DIŞI → item_no doluysa net eşleşme */
+         OR (
+                b.material_category <> 'KUMAŞ'
+            AND b.item_no IS NOT NULL
+            AND b.item_no <> ''
+            AND s.turu3 = b.item_no
+         )
+
+            /* 3️⃣ KUMAŞ DIŞI → item_no boşsa renge göre */
+         OR (
+                b.material_category <> 'KUMAŞ'
+            AND (b.item_no IS NULL OR b.item_no = '')
+         )
+        )
+)
+SELECT
+    v.bom_material_name,
+    v.stock_adi,
+    cs.warehouse,
+    cs.current_stock,
+    cs.stock_uom,
+    CASE
+        WHEN cs.warehouse = 'WAREHOUSE22'
+        THEN COALESCE(o.in_transit_qty, 0)
+        ELSE NULL
+    END AS open_order_in_transit
+FROM variants v
+JOIN core.raw_current_stock cs
+      ON cs.stock_adi = v.stock_adi
+JOIN allowed_warehouses aw
+      ON aw.warehouse = cs.warehouse
+LEFT JOIN core.open_order_in_transit o
+      ON o.stock_adi = v.stock_adi
+     AND o.unit_norm = core.unit_norm(cs.stock_uom)
+ORDER BY
+    v.bom_material_name,
+    cs.warehouse,
+    v.stock_adi;
+
+-- @step material_supplier
+-- @reads core.dashboard_material_variants_new, core.stock_supplier
+-- @writes core.material_supplier_new
+-- MATERIAL SUPPLIERS: bom_material_name -> supplier via the variants' stock cards
+
+DROP TABLE IF EXISTS core.material_supplier_new;
+
+CREATE TABLE core.material_supplier_new AS
+SELECT DISTINCT
+    v.bom_material_name,
+    ss.supplier
+FROM core.dashboard_material_variants_new v
+JOIN core.stock_supplier ss
+      ON ss.stock_adi = v.stock_adi;
+
+CREATE INDEX ON core.material_supplier_new (bom_material_name, supplier);
+CREATE INDEX ON core.material_supplier_new (supplier, bom_material_name);
+
+-- @step w22_stock
+-- @reads core.dashboard_build_scope, core.current_stock_by_variant
+-- @writes core.dashboard_w22_stock_new
+-- W22 STOCK per BOM material (current_stock_by_variant, independent of the variants build)
+
+DROP TABLE IF EXISTS core.dashboard_w22_stock_new;
+
+CREATE TABLE core.dashboard_w22_stock_new AS
+SELECT
+    c.bom_material_name,
+    SUM(c.current_stock) AS w22_stock
+FROM core.current_stock_by_variant c
+JOIN core.dashboard_build_scope sc
+      ON sc.bom_material_name = c.bom_material_name
+WHERE c.warehouse = 'WAREHOUSE22'
+GROUP BY c.bom_material_name;
+
+CREATE INDEX ON core.dashboard_w22_stock_new (bom_material_name);
+
+
+-- @step fabric_stock
+-- @reads core.dashboard_material_variants_new, raw.stock_master
+-- @writes core.dashboard_fabric_stock_new
+-- FABRIC STOCK in m2 (ek_2 = width in cm) + missing width flag
+-- + W22 open-order in-transit, raw and in m2 like the stock
+
+DROP TABLE IF EXISTS core.dashboard_fabric_stock_new;
+
+CREATE TABLE core.dashboard_fabric_stock_new AS
+SELECT
+    v.bom_material_name,
+    SUM(
+        CASE
+            WHEN v.stock_uom ILIKE '%%mt%%'
+             AND v.stock_uom NOT ILIKE '%%mt2%%'
+            THEN
+                CASE
+                    WHEN sm.ek_2 IS NOT NULL
+                     AND NULLIF(REGEXP_REPLACE(sm.ek_2, '[^0-9\.]', '', 'g'), '') IS NOT NULL
+                    THEN v.current_stock * (
+                        NULLIF(REGEXP_REPLACE(sm.ek_2, '[^0-9\.]', '', 'g'), '')::NUMERIC
+                        / 100.0
+                    )
+                    ELSE NULL
+                END
+            ELSE v.current_stock
+        END
+    ) AS fabric_stock_m2,
+    SUM(
+        CASE
+            WHEN v.stock_uom ILIKE '%%mt%%'
+             AND v.stock_uom NOT ILIKE '%%mt2%%'
+            THEN
+                CASE
+                    WHEN sm.ek_2 IS NOT NULL
+                     AND NULLIF(REGEXP_REPLACE(sm.ek_2, '[^0-9\.]', '', 'g'), '') IS NOT NULL
+                    THEN v.open_order_in_transit * (
+                        NULLIF(REGEXP_REPLACE(sm.ek_2, '[^0-9\.]', '', 'g'), '')::NUMERIC
+                        / 100.0
+                    )
+                    ELSE NULL
+                END
+            ELSE v.open_order_in_transit
+        END
+    ) AS fabric_in_transit_m2,
+    SUM(v.open_order_in_transit) AS w22_in_transit,
+    COALESCE(
+        BOOL_OR(
+            v.stock_uom ILIKE '%%mt%%'
+            AND v.stock_uom NOT ILIKE '%%mt2%%'
+            AND (
+                    sm.ek_2 IS NULL
+                 OR NULLIF(REGEXP_REPLACE(sm.ek_2, '[^0-9\.]', '', 'g'), '') IS NULL
+            )
+        ),
+        FALSE
+    ) AS missing_ek2
+FROM core.dashboard_material_variants_new v
+LEFT JOIN raw.stock_master sm
+  ON sm.adi = v.stock_adi
+WHERE v.warehouse = 'WAREHOUSE22'
+GROUP BY v.bom_material_name;
+
+CREATE INDEX ON core.dashboard_fabric_stock_new (bom_material_name);
+
+
+-- @step overview
+-- @reads core.dashboard_build_scope, core.bom_unique_materials, core.bom_to_stock_map, core.final_forecast_summary, core.dashboard_w22_stock_new, core.dashboard_fabric_stock_new
+-- @writes core.dashboard_material_overview_new
+-- safety_status: stock below the P50 12-week demand is CRITICAL, below P95 MEDIUM
+-- (point forecast_12w and x1.3 while final_forecast_summary has no quantiles yet)
+-- weeks_of_coverage / projected_stockout_week are filled by raw_sync.project_stockout before the finalizer
+
+DROP TABLE IF EXISTS core.dashboard_material_overview_new;
+
+CREATE TABLE core.dashboard_material_overview_new AS
+WITH mapped AS (
+    SELECT DISTINCT m.bom_material_name
+    FROM core.bom_to_stock_map m
+    JOIN core.dashboard_build_scope sc
+      ON sc.bom_material_name = m.bom_material_name
+)
+SELECT
+    b.material_name AS bom_material_name,
+    b.unit_of_measure,
+    b.material_category,
+    f.chosen_method,
+    f.forecast_12w,
+    COALESCE(
+        CASE
+            WHEN b.material_category = 'KUMAŞ' THEN COALESCE(fs.fabric_stock_m2, w.w22_stock)
+            ELSE w.w22_stock
+        END,
+        0
+    ) AS current_stock,
+    COALESCE(
+        CASE
+            WHEN b.material_category = 'KUMAŞ' THEN fs.fabric_in_transit_m2
+            ELSE fs.w22_in_transit
+        END,
+        0
+    ) AS open_order_in_transit,
+    NULL::NUMERIC AS weeks_of_coverage,
+    NULL::DATE AS projected_stockout_week,
+    CASE
+        WHEN b.material_category = 'KUMAŞ' AND fs.missing_ek2 THEN 'EN_BILGISI_EKSIK'
+        WHEN COALESCE(
+            CASE
+                WHEN b.material_category = 'KUMAŞ' THEN COALESCE(fs.fabric_stock_m2, w.w22_stock)
+                ELSE w.w22_stock
+            END,
+            0
+        ) < COALESCE(f.forecast_p50_12w, f.forecast_12w) THEN 'CRITICAL'
+        WHEN COALESCE(
+            CASE
+                WHEN b.material_category = 'KUMAŞ' THEN COALESCE(fs.fabric_stock_m2, w.w22_stock)
+                ELSE w.w22_stock
+            END,
+            0
+        ) < COALESCE(f.forecast_p95_12w, f.forecast_12w * 1.3) THEN 'MEDIUM'
+        ELSE 'SAFE'
+    END AS safety_status
+FROM core.bom_unique_materials b
+JOIN mapped m
+      ON m.bom_material_name = b.material_name
+LEFT JOIN core.final_forecast_summary f
+      ON f.bom_material_name = b.material_name
+LEFT JOIN core.dashboard_w22_stock_new w
+      ON w.bom_material_name = b.material_name
+LEFT JOIN core.dashboard_fabric_stock_new fs
+      ON fs.bom_material_name = b.material_name;
+
+CREATE INDEX ON core.dashboard_material_overview_new (weeks_of_coverage);
+
+-- @step flow_observation
+-- @reads core.dashboard_build_scope, core.dashboard_material_variants_new, core.current_stock_seat_warehouses, raw.raw_stock_movements, raw.raw_bom_consumption
+-- @writes core.dashboard_material_flow_observation_new
+
+DROP TABLE IF EXISTS core.dashboard_material_flow_observation_new;
+
+CREATE TABLE core.dashboard_material_flow_observation_new AS
+WITH
+/* ---------------------------------------------------
+   1) Şirket genelinde son koltuk depo sayımı
+--------------------------------------------------- */
+global_last_seat_count AS (
+    SELECT MAX(count_end_date) AS last_count_date
+    FROM core.current_stock_seat_warehouses
+),
+
+/* ---------------------------------------------------
+   2) WAREHOUSE22 çıkışları (dashboard’daki varyantlar için)
+--------------------------------------------------- */
+w22_outflows AS (
+    SELECT
+        sm.material_name      AS stock_adi,
+        sm.unit_of_measure    AS w22_out_uom,
+        SUM(sm.quantity)      AS w22_out_qty
+    FROM raw.raw_stock_movements sm
+    WHERE sm.company_code = 'WAREHOUSE22'
+      AND sm.document_type = 'Depo Çıkış'
+      -- scalar subquery (not a join) so transaction_date partitions are pruned at run time
+      AND sm.transaction_date > (SELECT last_count_date FROM global_last_seat_count)
+      AND EXISTS (
+          SELECT 1
+          FROM core.dashboard_material_variants_new v
+          WHERE v.stock_adi = sm.material_name
+      )
+    GROUP BY
+        sm.material_name,
+        sm.unit_of_measure
+),
+
+/* ---------------------------------------------------
+   3) BOM tüketimi (seçilen BOM’lar için)
+--------------------------------------------------- */
+seat_bom_consumption AS (
+    SELECT
+        b.material_name       AS bom_material_name,
+        b.unit_of_measure     AS seat_consumed_uom,
+        SUM(b.quantity)       AS seat_consumed_qty
+    FROM raw.raw_bom_consumption b
+    JOIN core.dashboard_build_scope sc
+      ON sc.bom_material_name = b.material_name
+    WHERE b.transaction_date > (SELECT last_count_date FROM global_last_seat_count)
+    GROUP BY
+        b.material_name,
+        b.unit_of_measure
+)
+
+/* ---------------------------------------------------
+   4) FINAL SNAPSHOT (ilk yapı korunur)
+--------------------------------------------------- */
+SELECT
+    v.bom_material_name,
+    v.stock_adi,
+    v.warehouse,
+    v.stock_uom,
+    v.current_stock,
+
+    /* W22 çıkış akışı */
+    w.w22_out_qty,
+    w.w22_out_uom,
+
+    /* BOM tüketimi */
+    c.seat_consumed_qty,
+    c.seat_consumed_uom,
+
+    g.last_count_date AS count_end_date
+
+FROM core.dashboard_material_variants_new v
+CROSS JOIN global_last_seat_count g
+
+LEFT JOIN w22_outflows w
+  ON w.stock_adi = v.stock_adi
+
+LEFT JOIN seat_bom_consumption c
+  ON c.bom_material_name = v.bom_material_name
+
+WHERE v.warehouse = 'WAREHOUSE22';
+
+-- Index names are left to Postgres: fixed *_new names would still belong to the
+-- live table after the previous swap.
+
+-- @step flow_idx_bom
+-- @reads core.dashboard_material_flow_observation_new
+CREATE INDEX
+ON core.dashboard_material_flow_observation_new (bom_material_name);
+
+-- @step flow_idx_stock
+-- @reads core.dashboard_material_flow_observation_new
+CREATE INDEX
+ON core.dashboard_material_flow_observation_new (stock_adi);
+
+-- @step flow_idx_wh
+-- @reads core.dashboard_material_flow_observation_new
+CREATE INDEX
+ON core.dashboard_material_flow_observation_new (warehouse);
@@ -0,0 +1,115 @@
+-- Dashboard finalizer for an incremental build (core_dashboard_build.sql over the dirty materials)
+-- Replaces the scoped rows of the live dashboard tables in one transaction.
+
+
+-- MATERIAL DASHBOARD VARIANTS
+
+DELETE FROM core.dashboard_material_variants v
+USING core.dashboard_build_scope sc
+WHERE v.bom_material_name = sc.bom_material_name;
+
+INSERT INTO core.dashboard_material_variants (
+    bom_material_name,
+    stock_adi,
+    warehouse,
+    current_stock,
+    stock_uom,
+    open_order_in_transit
+)
+SELECT
+    bom_material_name,
+    stock_adi,
+    warehouse,
+    current_stock,
+    stock_uom,
+    open_order_in_transit
+FROM core.dashboard_material_variants_new;
+
+
+-- MATERIAL SUPPLIERS
+
+DELETE FROM core.material_supplier ms
+USING core.dashboard_build_scope sc
+WHERE ms.bom_material_name = sc.bom_material_name;
+
+INSERT INTO core.material_supplier (bom_material_name, supplier)
+SELECT bom_material_name, supplier
+FROM core.material_supplier_new;
+
+
+-- MATERIAL OVERVIEW
+
+DELETE FROM core.dashboard_material_overview o
+USING core.dashboard_build_scope sc
+WHERE o.bom_material_name = sc.bom_material_name;
+
+INSERT INTO core.dashboard_material_overview (
+    bom_material_name,
+    unit_of_measure,
+    material_category,
+    chosen_method,
+    forecast_12w,
+    current_stock,
+    open_order_in_transit,
+    weeks_of_coverage,
+    projected_stockout_week,
+    safety_status
+)
+SELECT
+    bom_material_name,
+    unit_of_measure,
+    material_category,
+    chosen_method,
+    forecast_12w,
+    current_stock,
+    open_order_in_transit,
+    weeks_of_coverage,
+    projected_stockout_week,
+    safety_status
+FROM core.dashboard_material_overview_new;
+
+
+-- MATERIAL FLOW OBSERVATION
+
+DELETE FROM core.dashboard_material_flow_observation f
+USING core.dashboard_build_scope sc
+WHERE f.bom_material_name = sc.bom_material_name;
+
+INSERT INTO core.dashboard_material_flow_observation (
+    bom_material_name,
+    stock_adi,
+    warehouse,
+    stock_uom,
+    current_stock,
+    w22_out_qty,
+    w22_out_uom,
+    seat_consumed_qty,
+    seat_consumed_uom,
+    count_end_date
+)
+SELECT
+    bom_material_name,
+    stock_adi,
+    warehouse,
+    stock_uom,
+    current_stock,
+    w22_out_qty,
+    w22_out_uom,
+    seat_consumed_qty,
+    seat_consumed_uom,
+    count_end_date
+FROM core.dashboard_material_flow_observation_new;
+
+
+-- CLEANUP
+
+DELETE FROM core.dashboard_dirty_materials d
+USING core.dashboard_build_scope sc
+WHERE d.bom_material_name = sc.bom_material_name;
+
+DROP TABLE IF EXISTS core.dashboard_material_variants_new;
+DROP TABLE IF EXISTS core.material_supplier_new;
+DROP TABLE IF EXISTS core.dashboard_material_overview_new;
+DROP TABLE IF EXISTS core.dashboard_material_flow_observation_new;
+DROP TABLE IF EXISTS core.dashboard_w22_stock_new;
+DROP TABLE IF EXISTS core.dashboard_fabric_stock_new;
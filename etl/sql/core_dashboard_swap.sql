@@ -0,0 +1,38 @@
+-- Dashboard finalizer for a full build (core_dashboard_build.sql with every material in scope)
+-- Renames the stage tables over the live ones and clears the dirty queue.
+
+DO $$
+BEGIN
+    EXECUTE 'DROP TABLE IF EXISTS core.dashboard_material_overview_old';
+    EXECUTE 'DROP TABLE IF EXISTS core.dashboard_material_variants_old';
+    EXECUTE 'DROP TABLE IF EXISTS core.dashboard_material_flow_observation_old';
+    EXECUTE 'DROP TABLE IF EXISTS core.material_supplier_old';
+
+    IF to_regclass('core.dashboard_material_overview') IS NOT NULL THEN
+        EXECUTE 'ALTER TABLE core.dashboard_material_overview RENAME TO dashboard_material_overview_old';
+    END IF;
+    IF to_regclass('core.dashboard_material_variants') IS NOT NULL THEN
+        EXECUTE 'ALTER TABLE core.dashboard_material_variants RENAME TO dashboard_material_variants_old';
+    END IF;
+    IF to_regclass('core.dashboard_material_flow_observation') IS NOT NULL THEN
+        EXECUTE 'ALTER TABLE core.dashboard_material_flow_observation RENAME TO dashboard_material_flow_observation_old';
+    END IF;
+    IF to_regclass('core.material_supplier') IS NOT NULL THEN
+        EXECUTE 'ALTER TABLE core.material_supplier RENAME TO material_supplier_old';
+    END IF;
+
+    EXECUTE 'ALTER TABLE core.dashboard_material_overview_new RENAME TO dashboard_material_overview';
+    EXECUTE 'ALTER TABLE core.dashboard_material_variants_new RENAME TO dashboard_material_variants';
+    EXECUTE 'ALTER TABLE core.dashboard_material_flow_observation_new RENAME TO dashboard_material_flow_observation';
+    EXECUTE 'ALTER TABLE core.material_supplier_new RENAME TO material_supplier';
+
+    EXECUTE 'DROP TABLE IF EXISTS core.dashboard_material_overview_old';
+    EXECUTE 'DROP TABLE IF EXISTS core.dashboard_material_variants_old';
+    EXECUTE 'DROP TABLE IF EXISTS core.dashboard_material_flow_observation_old';
+    EXECUTE 'DROP TABLE IF EXISTS core.material_supplier_old';
+END $$;
+
+DROP TABLE IF EXISTS core.dashboard_w22_stock_new;
+DROP TABLE IF EXISTS core.dashboard_fabric_stock_new;
+
+TRUNCATE TABLE core.dashboard_dirty_materials;
@@ -0,0 +1,326 @@
+-- Mapping incremental refresh
+-- Re-matches only the BOM materials queued in core.mapping_dirty_materials
+-- (new materials) and those touched by stock_master key changes since the last
+-- snapshot in core.stock_master_match_keys. Match rules mirror core_weekly_pre_forecast.sql,
+-- which stays the full rebuild.
+
+
+-- NEW MATERIAL COLORS
+
+UPDATE core.bom_unique_materials b
+SET material_color = extract_color(b.material_name)
+FROM core.mapping_dirty_materials d
+WHERE d.bom_material_name = b.material_name
+  AND b.material_color IS NULL;
+
+
+------------------------------------------------------------
+-- 1) DEĞİŞEN STOK KARTLARI (eski + yeni anahtarlar)
+------------------------------------------------------------
+
+DROP TABLE IF EXISTS core.mapping_changed_stock;
+
+CREATE TABLE core.mapping_changed_stock AS
+WITH current_keys AS (
+    SELECT DISTINCT adi, ek_1, ek_2::text AS ek_2, turu3
+    FROM raw.stock_master
+    WHERE adi IS NOT NULL
+)
+(
+    SELECT adi, ek_1, ek_2, turu3 FROM current_keys
+    EXCEPT
+    SELECT adi, ek_1, ek_2, turu3 FROM core.stock_master_match_keys
+)
+UNION
+(
+    SELECT adi, ek_1, ek_2, turu3 FROM core.stock_master_match_keys
+    EXCEPT
+    SELECT adi, ek_1, ek_2, turu3 FROM current_keys
+);
+
+
+------------------------------------------------------------
+-- 2) SCOPE: yeniden eşlenecek BOM malzemeleri
+------------------------------------------------------------
+
+DROP TABLE IF EXISTS core.mapping_scope;
+
+CREATE TABLE core.mapping_scope AS
+SELECT bom_material_name
+FROM core.mapping_dirty_materials
+
+UNION
+
+-- mevcut eşleşmesi değişen stok kartına bağlı olanlar
+SELECT m.bom_material_name
+FROM core.bom_to_stock_map m
+JOIN core.mapping_changed_stock c
+  ON c.adi = m.stock_adi
+
+UNION
+
+-- NON-FABRIC VARIANTS: L1 stok kartıyla aynı ek_1/ek_2/turu3
+SELECT m.bom_material_name
+FROM core.bom_to_stock_map m
+JOIN core.mapping_changed_stock c
+  ON c.ek_1 = m.ek_1
+ AND c.ek_2 = m.ek_2
+ AND c.turu3 = m.turu3
+WHERE m.match_level = 1
+
+UNION
+
+-- L1 (adi = material_name), L2 (renk + item_no), L3 (ek_1 = material_name)
+-- ve dashboard varyantları (ek_1 = renk)
+SELECT b.material_name
+FROM core.bom_unique_materials b
+JOIN core.mapping_changed_stock c
+  ON c.adi = b.material_name
+  OR c.ek_1 = b.material_name
+  OR c.ek_1 = b.material_color;
+
+CREATE UNIQUE INDEX ON core.mapping_scope (bom_material_name);
+
+ANALYZE core.mapping_scope;
+
+
+------------------------------------------------------------
+-- 3) SCOPE'TAKİ ESKİ EŞLEŞMELERİ SİL
+------------------------------------------------------------
+
+DELETE FROM core.match_fabric_lvl1 m USING core.mapping_scope sc WHERE m.bom_material_name = sc.bom_material_name;
+DELETE FROM core.match_fabric_lvl2 m USING core.mapping_scope sc WHERE m.bom_material_name = sc.bom_material_name;
+DELETE FROM core.match_fabric_lvl3 m USING core.mapping_scope sc WHERE m.bom_material_name = sc.bom_material_name;
+DELETE FROM core.match_nonfabric_lvl1 m USING core.mapping_scope sc WHERE m.bom_material_name = sc.bom_material_name;
+DELETE FROM core.match_nonfabric_variants m USING core.mapping_scope sc WHERE m.bom_material_name = sc.bom_material_name;
+DELETE FROM core.bom_to_stock_map m USING core.mapping_scope sc WHERE m.bom_material_name = sc.bom_material_name;
+
+
+------------------------------------------------------------
+-- 4) MATCH TABLOLARI (sadece scope)
+------------------------------------------------------------
+
+INSERT INTO core.match_fabric_lvl1
+SELECT
+    b.material_name,
+    b.material_color,
+    b.item_no,
+    b.unit_of_measure,
+    'KUMAŞ' AS bom_type,
+    s.adi,
+    s.ek_1,
+    s.ek_2::text,
+    s.turu3,
+    1 AS match_level
+FROM core.bom_unique_materials b
+JOIN core.mapping_scope sc
+      ON sc.bom_material_name = b.material_name
+JOIN raw.stock_master s
+      ON s.adi = b.material_name
+WHERE b.material_category LIKE 'KUMA%'
+  AND b.material_name IS NOT NULL
+  AND b.material_name <> ''
+  AND b.item_no <> '';
+
+INSERT INTO core.match_fabric_lvl2
+SELECT
+    b.material_name,
+    b.material_color,
+    b.item_no,
+    b.unit_of_measure,
+    'KUMAŞ' AS bom_type,
+    s.adi,
+    s.ek_1,
+    s.ek_2::text,
+    s.turu3,
+    2 AS match_level
+FROM core.bom_unique_materials b
+JOIN core.mapping_scope sc
+      ON sc.bom_material_name = b.material_name
+JOIN raw.stock_master s
+        ON s.ek_1 = b.material_color
+       AND s.turu3 = b.item_no
+WHERE b.material_category LIKE 'KUMA%'
+  AND b.material_name IS NOT NULL
+  AND b.material_name <> ''
+  AND b.item_no <> ''
+  AND NOT EXISTS (
+        SELECT 1
+        FROM raw.stock_master s2
+        WHERE s2.adi = b.material_name
+  )
+  AND NOT EXISTS (
+        SELECT 1
+        FROM core.match_fabric_lvl1 m
+        WHERE m.bom_material_name = b.material_name
+          AND m.stock_adi = s.adi
+  );
+
+INSERT INTO core.match_fabric_lvl3
+SELECT
+    b.material_name,
+    b.material_color,
+    b.item_no,
+    b.unit_of_measure,
+    'KUMAŞ' AS bom_type,
+    s.adi,
+    s.ek_1,
+    s.ek_2::text,
+    s.turu3,
+    3 AS match_level
+FROM core.bom_unique_materials b
+JOIN core.mapping_scope sc
+      ON sc.bom_material_name = b.material_name
+JOIN raw.stock_master s
+      ON s.ek_1 = b.material_name
+WHERE b.material_category LIKE 'KUMA%'
+  AND b.material_name IS NOT NULL
+  AND b.material_name <> ''
+  AND (b.item_no IS NULL OR b.item_no = '')
+  AND NOT EXISTS (
+        SELECT 1
+        FROM (
+            SELECT bom_material_name, stock_adi
+            FROM core.match_fabric_lvl1
+            UNION ALL
+            SELECT bom_material_name, stock_adi
+            FROM core.match_fabric_lvl2
+        ) x
+        WHERE x.bom_material_name = b.material_name
+          AND x.stock_adi        = s.adi
+  );
+
+INSERT INTO core.match_nonfabric_lvl1
+SELECT
+    b.material_name,
+    b.material_color,
+    b.item_no,
+    b.unit_of_measure,
+    b.material_category AS bom_type,
+    s.adi,
+    s.ek_1,
+    s.ek_2::text,
+    s.turu3,
+    1 AS match_level
+FROM core.bom_unique_materials b
+JOIN core.mapping_scope sc
+      ON sc.bom_material_name = b.material_name
+JOIN raw.stock_master s
+      ON s.adi = b.material_name
+WHERE b.material_name IS NOT NULL
+  AND b.material_name <> ''
+  AND b.material_category NOT LIKE 'KUMA%';
+
+INSERT INTO core.match_nonfabric_variants
+SELECT
+    p.bom_material_name,
+    p.bom_material_color,
+    p.bom_item_no,
+    p.bom_uom,
+    p.bom_type,
+    s2.adi AS stock_adi,
+    s2.ek_1,
+    s2.ek_2::text,
+    s2.turu3,
+    2 AS match_level
+FROM core.match_nonfabric_lvl1 p
+JOIN core.mapping_scope sc
+      ON sc.bom_material_name = p.bom_material_name
+JOIN raw.stock_master s1
+      ON s1.adi = p.stock_adi
+JOIN raw.stock_master s2
+      ON s2.ek_1 = s1.ek_1
+     AND s2.ek_2 = s1.ek_2
+     AND s2.turu3 = s1.turu3
+     AND s1.turu3 <> ''  -- turu3 boş olanları dahil etme
+WHERE NOT EXISTS (
+        SELECT 1
+        FROM core.match_nonfabric_lvl1 m
+        WHERE m.bom_material_name = p.bom_material_name
+          AND m.stock_adi         = s2.adi
+);
+
+
+------------------------------------------------------------
+-- 5) ANA MAPPING TABLOSU (sadece scope)
+------------------------------------------------------------
+
+INSERT INTO core.bom_to_stock_map
+SELECT x.*
+FROM (
+    SELECT * FROM core.match_fabric_lvl1
+    UNION ALL
+    SELECT * FROM core.match_fabric_lvl2
+    UNION ALL
+    SELECT * FROM core.match_fabric_lvl3
+    UNION ALL
+    SELECT * FROM core.match_nonfabric_lvl1
+    UNION ALL
+    SELECT * FROM core.match_nonfabric_variants
+) x
+JOIN core.mapping_scope sc
+  ON sc.bom_material_name = x.bom_material_name;
+
+
+------------------------------------------------------------
+-- 6) CURRENT STOCK BY VARIANT (sadece scope)
+------------------------------------------------------------
+
+DELETE FROM core.current_stock_by_variant c
+USING core.mapping_scope sc
+WHERE c.bom_material_name = sc.bom_material_name;
+
+INSERT INTO core.current_stock_by_variant
+SELECT
+    b.bom_material_name,
+    b.bom_uom,
+    b.bom_type,
+    r.stock_adi,
+    r.stock_uom,
+    r.warehouse,
+    CASE
+        WHEN b.bom_type LIKE 'KUMAŞ'
+         AND b.bom_uom  = 'Mt2'
+         AND (r.stock_uom ILIKE '%mt%' AND r.stock_uom NOT ILIKE '%mt2%')
+        THEN
+            r.current_stock
+            * (
+                NULLIF(
+                    REGEXP_REPLACE(b.ek_2, '[^0-9\.]', '', 'g'),
+                    ''
+                )::NUMERIC
+              / 100.0
+              )
+        ELSE
+            r.current_stock
+    END AS current_stock
+FROM core.bom_to_stock_map b
+JOIN core.mapping_scope sc
+      ON sc.bom_material_name = b.bom_material_name
+JOIN core.raw_current_stock r
+      ON b.stock_adi = r.stock_adi;
+
+
+------------------------------------------------------------
+-- 7) DASHBOARD KUYRUĞU + SNAPSHOT + TEMİZLİK
+------------------------------------------------------------
+
+INSERT INTO core.dashboard_dirty_materials (bom_material_name)
+SELECT bom_material_name
+FROM core.mapping_scope
+ON CONFLICT (bom_material_name) DO NOTHING;
+
+DELETE FROM core.stock_master_match_keys k
+WHERE k.adi IN (SELECT adi FROM core.mapping_changed_stock);
+
+INSERT INTO core.stock_master_match_keys (adi, ek_1, ek_2, turu3)
+SELECT DISTINCT s.adi, s.ek_1, s.ek_2::text, s.turu3
+FROM raw.stock_master s
+WHERE s.adi IN (SELECT adi FROM core.mapping_changed_stock);
+
+DELETE FROM core.mapping_dirty_materials d
+USING core.mapping_scope sc
+WHERE d.bom_material_name = sc.bom_material_name;
+
+DROP TABLE IF EXISTS core.mapping_scope;
+DROP TABLE IF EXISTS core.mapping_changed_stock;
@@ -63,6 +63,9 @@ JOIN evented e
  AND e.trx_date  = c.trx_date;
 
 
+CREATE INDEX ON core.seat_count_events (warehouse, event_id);
+
+
 DROP TABLE IF EXISTS core.seat_last_event;
 
 CREATE TABLE core.seat_last_event AS
@@ -89,6 +92,22 @@ GROUP BY
     e.stock_adi, e.warehouse, e.stock_uom;
 
 
+-- per-warehouse event state read by the incremental seat refresh (SEAT_MODE=incremental)
+CREATE TABLE IF NOT EXISTS core.seat_event_state (
+    warehouse      TEXT PRIMARY KEY,
+    last_trx_date  DATE NOT NULL,
+    last_event_id  BIGINT NOT NULL,
+    updated_at     TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+TRUNCATE core.seat_event_state;
+
+INSERT INTO core.seat_event_state (warehouse, last_trx_date, last_event_id)
+SELECT warehouse, MAX(trx_date), MAX(event_id)
+FROM core.seat_count_events
+GROUP BY warehouse;
+
+
 CREATE TABLE IF NOT EXISTS core.raw_current_stock (
     stock_adi TEXT,
     warehouse TEXT,
@@ -1,5 +1,5 @@
 -- Weekly refresh before forecast
--- Includes: full core rebuild + weekly_consumption (codex_info baseline)
+-- Includes: full core rebuild (codex_info baseline)
 
 CREATE SCHEMA IF NOT EXISTS core;
 
@@ -323,113 +323,21 @@ JOIN core.raw_current_stock r
       ON b.stock_adi = r.stock_adi;
 
 
-DROP TABLE IF EXISTS core.weekly_consumption;
+------------------------------------------------------------
+-- 7) MAPPING SNAPSHOT
+--   core_mapping_incremental.sql stock_master farkini bu andan itibaren alir
+------------------------------------------------------------
 
-CREATE TABLE core.weekly_consumption (
-    bom_material_name       text,
-    bom_material_category   text,
-    bom_item_no             text,
-    bom_unit_of_measure     text,
-    week_start              date,
-    qty                     numeric
-);
+TRUNCATE core.stock_master_match_keys;
+
+INSERT INTO core.stock_master_match_keys (adi, ek_1, ek_2, turu3)
+SELECT DISTINCT adi, ek_1, ek_2::text, turu3
+FROM raw.stock_master
+WHERE adi IS NOT NULL;
+
+TRUNCATE core.mapping_dirty_materials;
 
 
-INSERT INTO core.weekly_consumption (
-    bom_material_name,
-    bom_material_category,
-    bom_item_no,
-    bom_unit_of_measure,
-    week_start,
-    qty
-)
-WITH 
-max_dates AS (
-    SELECT
-        MAX(transaction_date)::date AS max_tx_date,
-        date_trunc('week', MAX(transaction_date))::date AS max_week_start
-    FROM raw.raw_bom_consumption
-),
-cutoff AS (
-    SELECT
-        CASE
-            WHEN max_tx_date >= (max_week_start + INTERVAL '4 days') THEN max_week_start
-            ELSE (max_week_start - INTERVAL '7 days')
-        END AS last_full_week_start
-    FROM max_dates
-),
--- 1) Her malzeme için kategori + item_no + uom mapping’i
-material_map AS (
-    SELECT 
-        material_name AS bom_material_name,
-        MIN(material_category) AS bom_material_category,
-        MIN(item_no) AS bom_item_no,
-        MIN(unit_of_measure) AS bom_unit_of_measure
-    FROM raw.raw_bom_consumption
-    GROUP BY material_name
-),
-
--- 2) Gerçek haftalık tüketim
-base AS (
-    SELECT
-        material_name AS bom_material_name,
-        date_trunc('week', transaction_date)::date AS week_start,
-        SUM(quantity) AS qty
-    FROM raw.raw_bom_consumption, cutoff
-    WHERE date_trunc('week', transaction_date)::date <= cutoff.last_full_week_start
-    GROUP BY material_name, date_trunc('week', transaction_date)::date
-),
-
--- 3) Tüm haftalar
-all_weeks AS (
-    SELECT DISTINCT date_trunc('week', transaction_date)::date AS week_start
-    FROM raw.raw_bom_consumption, cutoff
-    WHERE date_trunc('week', transaction_date)::date <= cutoff.last_full_week_start
-),
-
--- 4) Tüm materyaller (mapping ile)
-all_materials AS (
-    SELECT 
-        mm.bom_material_name,
-        mm.bom_material_category,
-        mm.bom_item_no,
-        mm.bom_unit_of_measure
-    FROM material_map mm
-),
-
--- 5) Full matrix (her malzeme × her hafta)
-full_matrix AS (
-    SELECT 
-        a.bom_material_name,
-        a.bom_material_category,
-        a.bom_item_no,
-        a.bom_unit_of_measure,
-        w.week_start
-    FROM all_materials a CROSS JOIN all_weeks w
-),
-
--- 6) Full matrix + gerçek değer join
-joined AS (
-    SELECT 
-        f.bom_material_name,
-        f.bom_material_category,
-        f.bom_item_no,
-        f.bom_unit_of_measure,
-        f.week_start,
-        COALESCE(b.qty, 0) AS qty
-    FROM full_matrix f
-    LEFT JOIN base b 
-        ON b.bom_material_name = f.bom_material_name
-       AND b.week_start       = f.week_start
-)
-
-SELECT * FROM joined;
-
-CREATE INDEX idx_weekly_material_week
-ON core.weekly_consumption (bom_material_name, week_start);
-
-CREATE INDEX idx_weekly_category
-ON core.weekly_consumption (bom_material_category);
-
-CREATE INDEX idx_weekly_itemno
-ON core.weekly_consumption (bom_item_no);
+-- WEEKLY CONSUMPTION
+-- core.weekly_consumption_sparse is maintained by raw_sync (incremental_bom / full_load_bom),
+-- core.weekly_consumption is a dense view over it and the forecast densifies in memory.
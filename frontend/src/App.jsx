@@ -8,6 +8,7 @@ import logo from "./assets/logo.png";
 
 const API_BASE = import.meta.env.VITE_API_BASE || "/api";
 const AUTO_REFRESH_MS = Number(import.meta.env.VITE_REFRESH_MS || 300000);
+const EVENT_VIEWS = ["materials", "open_orders", "forecast"];
 const CATEGORIES = [
   { label: "KUMAŞ", api: "KUMAŞ" },
   { label: "SLAT", api: "SLAT" },
@@ -295,6 +296,7 @@ function App() {
   const [statusFilter, setStatusFilter] = useState("");
   const [supplierFilter, setSupplierFilter] = useState("");
   const [itemNoFilter, setItemNoFilter] = useState("");
+  const [coverageFilter, setCoverageFilter] = useState("");
   const [pageSize, setPageSize] = useState(50);
   const [total, setTotal] = useState(0);
   const [selected, setSelected] = useState(null);
@@ -329,6 +331,7 @@ function App() {
   const [isSuppliersOpen, setIsSuppliersOpen] = useState(true);
   const [isFlowOpen, setIsFlowOpen] = useState(true);
   const [isGridReady, setIsGridReady] = useState(false);
+  const [eventTicks, setEventTicks] = useState({ materials: 0, open_orders: 0, forecast: 0 });
 
   const formatWape = (value) => {
     if (value === null || value === undefined || Number.isNaN(Number(value))) return "-";
@@ -341,7 +344,35 @@ function App() {
   };
 
   useEffect(() => {
-    let timerId = null;
+    const bump = (names) =>
+      setEventTicks((prev) => {
+        const next = { ...prev };
+        names.forEach((name) => {
+          next[name] = (next[name] || 0) + 1;
+        });
+        return next;
+      });
+    // Fallback for browsers without SSE: poll everything on the old interval.
+    if (typeof window.EventSource === "undefined") {
+      if (!Number.isFinite(AUTO_REFRESH_MS) || AUTO_REFRESH_MS <= 0) return undefined;
+      const timerId = window.setInterval(() => bump(EVENT_VIEWS), AUTO_REFRESH_MS);
+      return () => window.clearInterval(timerId);
+    }
+    const source = new EventSource(`${API_BASE}/events`);
+    EVENT_VIEWS.forEach((name) => {
+      source.addEventListener(name, () => bump([name]));
+    });
+    source.addEventListener("all", () => bump(EVENT_VIEWS));
+    // After a reconnect we may have missed notifications; refetch once.
+    let hasOpened = false;
+    source.addEventListener("open", () => {
+      if (hasOpened) bump(EVENT_VIEWS);
+      hasOpened = true;
+    });
+    return () => source.close();
+  }, []);
+
+  useEffect(() => {
     const fetchForecastMeta = async () => {
       const res = await fetch(`${API_BASE}/forecast-meta`);
       const data = await res.json();
@@ -349,15 +380,7 @@ function App() {
       setLastForecastDate(data.last_forecast_date || null);
     };
     fetchForecastMeta().catch(console.error);
-    if (Number.isFinite(AUTO_REFRESH_MS) && AUTO_REFRESH_MS > 0) {
-      timerId = window.setInterval(() => {
-        fetchForecastMeta().catch(console.error);
-      }, AUTO_REFRESH_MS);
-    }
-    return () => {
-      if (timerId) window.clearInterval(timerId);
-    };
-  }, []);
+  }, [eventTicks.forecast]);
 
   const gridApiRef = useRef(null);
 
@@ -369,7 +392,7 @@ function App() {
         const sortBy = activeSort.colId || "";
         const sortDir = activeSort.sort || "";
         const page = Math.floor(params.startRow / pageSize) + 1;
-        const url = `${API_BASE}/materials?category=${encodeURIComponent(apiCategory)}&page=${page}&page_size=${pageSize}&q=${encodeURIComponent(search)}&status=${encodeURIComponent(statusFilter || "")}&supplier=${encodeURIComponent(supplierFilter || "")}&item_no=${encodeURIComponent(itemNoFilter || "")}&sort_by=${encodeURIComponent(sortBy)}&sort_dir=${encodeURIComponent(sortDir)}`;
+        const url = `${API_BASE}/materials?category=${encodeURIComponent(apiCategory)}&page=${page}&page_size=${pageSize}&q=${encodeURIComponent(search)}&status=${encodeURIComponent(statusFilter || "")}&supplier=${encodeURIComponent(supplierFilter || "")}&item_no=${encodeURIComponent(itemNoFilter || "")}${coverageFilter ? `&max_coverage=${encodeURIComponent(coverageFilter)}` : ""}&sort_by=${encodeURIComponent(sortBy)}&sort_dir=${encodeURIComponent(sortDir)}`;
         try {
           const res = await fetch(url);
           const data = await res.json();
@@ -393,7 +416,7 @@ function App() {
         }
       },
     }),
-    [category, search, statusFilter, supplierFilter, itemNoFilter, pageSize]
+    [category, search, statusFilter, supplierFilter, itemNoFilter, coverageFilter, pageSize]
   );
 
   useEffect(() => {
@@ -407,17 +430,11 @@ function App() {
   }, [view, dataSource]);
 
   useEffect(() => {
-    if (view !== "dashboard" || !isGridReady) {
+    if (view !== "dashboard" || !isGridReady || eventTicks.materials === 0) {
       return;
     }
-    if (!Number.isFinite(AUTO_REFRESH_MS) || AUTO_REFRESH_MS <= 0) {
-      return;
-    }
-    const timerId = window.setInterval(() => {
-      gridApiRef.current?.refreshInfiniteCache();
-    }, AUTO_REFRESH_MS);
-    return () => window.clearInterval(timerId);
-  }, [view, isGridReady]);
+    gridApiRef.current?.refreshInfiniteCache();
+  }, [view, isGridReady, eventTicks.materials]);
 
   useEffect(() => {
     if (view !== "dashboard") {
@@ -429,67 +446,42 @@ function App() {
       setSupplierOptions(data.items || []);
     };
     fetchSuppliers().catch(console.error);
-  }, [view]);
+  }, [view, eventTicks.materials]);
 
   useEffect(() => {
     if (view !== "dashboard") {
       return;
     }
-    let timerId = null;
     const fetchDetail = async () => {
       if (!selected) {
         setVariants([]);
         setFlowRows([]);
+        setMaterialSuppliers([]);
         return;
       }
       setLoadingDetail(true);
       setLoadingFlow(true);
+      setLoadingSuppliers(true);
       try {
-        const variantPromise = fetch(`${API_BASE}/materials/${encodeURIComponent(selected)}/variants`).then((res) => res.json());
-
-        fetch(`${API_BASE}/materials/${encodeURIComponent(selected)}/flow-observation`)
-          .then((res) => res.json())
-          .then((flowData) => setFlowRows(flowData.items || []))
-          .finally(() => setLoadingFlow(false));
-
-        const variantData = await variantPromise;
-        setVariants(variantData.items || []);
+        const res = await fetch(`${API_BASE}/materials/details?name=${encodeURIComponent(selected)}`);
+        const data = await res.json();
+        const detail = (data.items || [])[0] || {};
+        setVariants(detail.variants || []);
+        setFlowRows(detail.flow_observation || []);
+        setMaterialSuppliers(detail.suppliers || []);
       } finally {
         setLoadingDetail(false);
+        setLoadingFlow(false);
+        setLoadingSuppliers(false);
       }
     };
     fetchDetail().catch(console.error);
-    if (Number.isFinite(AUTO_REFRESH_MS) && AUTO_REFRESH_MS > 0) {
-      timerId = window.setInterval(() => {
-        fetchDetail().catch(console.error);
-      }, AUTO_REFRESH_MS);
-    }
-    return () => {
-      if (timerId) window.clearInterval(timerId);
-    };
-  }, [view, selected]);
-
-  useEffect(() => {
-    if (view !== "dashboard") {
-      return;
-    }
-    if (!selected) {
-      setMaterialSuppliers([]);
-      return;
-    }
-    setLoadingSuppliers(true);
-    fetch(`${API_BASE}/materials/${encodeURIComponent(selected)}/suppliers`)
-      .then((res) => res.json())
-      .then((data) => setMaterialSuppliers(data.items || []))
-      .catch(console.error)
-      .finally(() => setLoadingSuppliers(false));
-  }, [view, selected]);
+  }, [view, selected, eventTicks.materials]);
 
   useEffect(() => {
     if (view !== "forecast") {
       return;
     }
-    let timerId = null;
     const fetchForecast = async () => {
       setLoadingForecast(true);
       try {
@@ -505,21 +497,12 @@ function App() {
       }
     };
     fetchForecast().catch(console.error);
-    if (Number.isFinite(AUTO_REFRESH_MS) && AUTO_REFRESH_MS > 0) {
-      timerId = window.setInterval(() => {
-        fetchForecast().catch(console.error);
-      }, AUTO_REFRESH_MS);
-    }
-    return () => {
-      if (timerId) window.clearInterval(timerId);
-    };
-  }, [view, forecastCategory, forecastPage, forecastPageSize]);
+  }, [view, forecastCategory, forecastPage, forecastPageSize, eventTicks.forecast]);
 
   useEffect(() => {
     if (view !== "open-orders") {
       return;
     }
-    let timerId = null;
     const fetchOpenOrders = async () => {
       setLoadingOpenOrders(true);
       try {
@@ -533,15 +516,7 @@ function App() {
       }
     };
     fetchOpenOrders().catch(console.error);
-    if (Number.isFinite(AUTO_REFRESH_MS) && AUTO_REFRESH_MS > 0) {
-      timerId = window.setInterval(() => {
-        fetchOpenOrders().catch(console.error);
-      }, AUTO_REFRESH_MS);
-    }
-    return () => {
-      if (timerId) window.clearInterval(timerId);
-    };
-  }, [view, openOrdersPage, openOrdersPageSize, openOrdersSearch, openOrdersHidSearch]);
+  }, [view, openOrdersPage, openOrdersPageSize, openOrdersSearch, openOrdersHidSearch, eventTicks.open_orders]);
 
   const columnDefs = useMemo(
     () => [
@@ -561,6 +536,9 @@ function App() {
       },
       { headerName: "Error Rate (1Y)", field: "wape", width: 110, valueFormatter: (p) => formatWape(p.value) },
       { headerName: "Stock", field: "current_stock", width: 100 },
+      { headerName: "In Transit", field: "open_order_in_transit", width: 100 },
+      { headerName: "Coverage (W)", field: "weeks_of_coverage", width: 120, valueFormatter: (p) => formatNumber(p.value) },
+      { headerName: "Stock-out", field: "projected_stockout_week", width: 120, valueFormatter: (p) => p.value || "-" },
       {
         headerName: "Status",
         field: "safety_status",
@@ -578,7 +556,7 @@ function App() {
     "status-row-en-bilgisi-eksik": (params) => params.data && params.data.safety_status === "EN_BILGISI_EKSIK",
   };
 
-  const handleExportMaterialsExcel = async () => {
+  const handleExportMaterials = (format) => {
     const api = gridApiRef.current;
     if (!api) return;
     const sortModel = api.getSortModel?.() || [];
@@ -589,25 +567,18 @@ function App() {
     if (statusFilter) params.set("status", statusFilter);
     if (supplierFilter) params.set("supplier", supplierFilter);
     if (itemNoFilter) params.set("item_no", itemNoFilter);
+    if (coverageFilter) params.set("max_coverage", coverageFilter);
     if (activeSort.colId) params.set("sort_by", activeSort.colId);
     if (activeSort.sort) params.set("sort_dir", activeSort.sort);
-    const res = await fetch(`${API_BASE}/materials-export?${params.toString()}`);
-    if (!res.ok) {
-      console.error("Export failed", res.status);
-      return;
-    }
-    const blob = await res.blob();
-    const url = window.URL.createObjectURL(blob);
-    const contentDisposition = res.headers.get("content-disposition") || "";
-    const match = contentDisposition.match(/filename="([^"]+)"/i);
-    const filename = match ? match[1] : "material_list.xlsx";
+    params.set("format", format);
+    // Navigate to the export so the browser streams it to disk instead of
+    // buffering the whole file in a Blob; the server sets the filename.
     const link = document.createElement("a");
-    link.href = url;
-    link.download = filename;
+    link.href = `${API_BASE}/materials-export?${params.toString()}`;
+    link.download = "";
     document.body.appendChild(link);
     link.click();
     link.remove();
-    window.URL.revokeObjectURL(url);
   };
 
   const forecastTotalPages = Math.max(Math.ceil(forecastTotal / forecastPageSize), 1);
@@ -689,6 +660,12 @@ function App() {
                 <option value="SAFE">SAFE</option>
                 <option value="EN_BILGISI_EKSIK">MISSING WIDTH INFO</option>
               </select>
+              <select value={coverageFilter} onChange={(e) => setCoverageFilter(e.target.value)}>
+                <option value="">Coverage (All)</option>
+                <option value="4">Runs out within 4 weeks</option>
+                <option value="8">Runs out within 8 weeks</option>
+                <option value="12">Runs out within 12 weeks</option>
+              </select>
               <input
                 list="supplier-options"
                 value={supplierFilter}
@@ -718,9 +695,12 @@ function App() {
                     <InfoTip title="Malzeme Listesi">
                       {INFO.materialList}
                     </InfoTip>
-                    <button className="toggle-btn" onClick={handleExportMaterialsExcel}>
+                    <button className="toggle-btn" onClick={() => handleExportMaterials("xlsx")}>
                       Export Excel
                     </button>
+                    <button className="toggle-btn" onClick={() => handleExportMaterials("csv")}>
+                      Export CSV
+                    </button>
                     <button className="toggle-btn" onClick={() => setIsOverviewOpen((v) => !v)}>
                       {isOverviewOpen ? "Hide" : "Show"}
                     </button>
@@ -36,7 +36,8 @@ if not "%ERRORLEVEL%"=="0" (
 )
 
 >> "%LOG_FILE%" echo [%date% %time%] INFO Postgres reachable. Launching backend and ETL.
-start "" /b /d c:\tkis_stockwise\backend "%PYTHON_EXE%" -m uvicorn main:app --host 127.0.0.1 --port 8000 > c:\tkis_stockwise\logs\uvicorn.log 2>&1
+rem main.py starts uvicorn on a selector event loop (required by the async psycopg pool on Windows)
+start "" /b /d c:\tkis_stockwise\backend "%PYTHON_EXE%" main.py > c:\tkis_stockwise\logs\uvicorn.log 2>&1
 start "" /b /d c:\tkis_stockwise\etl "%PYTHON_EXE%" raw_sync.py > c:\tkis_stockwise\logs\raw_sync.log 2>&1
 
 endlocal
@@ -8,12 +8,13 @@ import sys
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--pre", action="store_true", help="run core weekly pre-forecast SQL")
-    parser.add_argument("--post", action="store_true", help="run core weekly post-forecast SQL")
-    parser.add_argument("--dashboard", action="store_true", help="run dashboard refresh SQL")
+    parser.add_argument("--post", action="store_true", help="run post-forecast steps (optional post SQL + dashboard build)")
+    parser.add_argument("--dashboard", action="store_true", help="run a full dashboard build (build + swap)")
+    parser.add_argument("--mapping", action="store_true", help="run incremental mapping SQL (queued + changed stock keys)")
     args = parser.parse_args()
 
-    if not (args.pre or args.post or args.dashboard):
-        parser.error("Select at least one: --pre, --post, --dashboard")
+    if not (args.pre or args.post or args.dashboard or args.mapping):
+        parser.error("Select at least one: --pre, --post, --dashboard, --mapping")
 
     etl_dir = Path(__file__).resolve().parents[2] / "etl"
     sys.path.append(str(etl_dir))
@@ -24,10 +25,12 @@ def main() -> None:
 
     if args.pre:
         r.execute_sql_file(pg, r.CORE_WEEKLY_PRE_SQL)
+    if args.mapping:
+        r.execute_sql_file(pg, r.CORE_MAPPING_INCREMENTAL_SQL)
     if args.post:
-        r.execute_sql_file(pg, r.CORE_WEEKLY_POST_SQL)
-    if args.dashboard:
-        r.execute_sql_file(pg, r.CORE_DASHBOARD_SQL)
+        r.run_post_forecast(pg)
+    if args.dashboard and not args.post:
+        r.run_dashboard_refresh(pg, full=True)
 
     pg.close()
 
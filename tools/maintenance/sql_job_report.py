@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+
+import psycopg2
+
+
+def connect_pg():
+    return psycopg2.connect(
+        host=os.getenv("PG_HOST", "127.0.0.1"),
+        port=int(os.getenv("PG_PORT", "5432")),
+        dbname=os.getenv("PG_DB", "tkis_stockwise"),
+        user=os.getenv("PG_USER", "postgres"),
+        password=os.getenv("PG_PASSWORD", "postgres"),
+    )
+
+
+def slowest_statements(cur, days: int, limit: int, file_name: str = None):
+    sql = """
+        SELECT
+            file,
+            MAX(step) AS step,
+            stmt_index,
+            stmt_hash,
+            MAX(stmt_head) AS stmt_head,
+            COUNT(*) AS runs,
+            ROUND(AVG(duration_ms)) AS avg_ms,
+            ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration_ms)::numeric) AS p95_ms,
+            ROUND(MAX(duration_ms)) AS max_ms,
+            ROUND(AVG(row_count)) AS avg_rows,
+            SUM(CASE WHEN status <> 'ok' THEN 1 ELSE 0 END) AS errors,
+            COUNT(explain) AS explains
+        FROM core.sql_job_runs
+        WHERE started_at >= NOW() - (%s || ' days')::interval
+          AND (%s::text IS NULL OR file = %s)
+        GROUP BY file, stmt_index, stmt_hash
+        ORDER BY AVG(duration_ms) DESC
+        LIMIT %s
+    """
+    cur.execute(sql, (str(days), file_name, file_name, limit))
+    return cur.fetchall()
+
+
+def latest_plan(cur, stmt_hash: str):
+    cur.execute(
+        """
+        SELECT file, stmt_index, started_at, duration_ms, explain
+        FROM core.sql_job_runs
+        WHERE stmt_hash = %s
+          AND explain IS NOT NULL
+        ORDER BY started_at DESC
+        LIMIT 1
+        """,
+        (stmt_hash,),
+    )
+    return cur.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the slowest ETL SQL statements from core.sql_job_runs")
+    parser.add_argument("--days", type=int, default=14, help="look back this many days")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--file", help="only this SQL file (basename, e.g. core_weekly_pre_forecast.sql)")
+    parser.add_argument("--plan", metavar="STMT_HASH", help="print the latest EXPLAIN (ANALYZE, BUFFERS) sample for a statement")
+    args = parser.parse_args()
+
+    with connect_pg() as conn, conn.cursor() as cur:
+        if args.plan:
+            row = latest_plan(cur, args.plan)
+            if not row:
+                print(f"No EXPLAIN sample for {args.plan} (set SQL_EXPLAIN_SAMPLE > 0 in the ETL)")
+                return
+            file_name, stmt_index, started_at, duration_ms, plan = row
+            print(f"{file_name} #{stmt_index} at {started_at:%Y-%m-%d %H:%M} ({duration_ms} ms)")
+            print(json.dumps(plan, indent=2, ensure_ascii=False))
+            return
+
+        rows = slowest_statements(cur, args.days, args.limit, args.file)
+        if not rows:
+            print("No rows in core.sql_job_runs for the selected window")
+            return
+        print(
+            f"{'file':32} {'step':18} {'#':>4} {'hash':16} {'runs':>5} {'avg_ms':>9} {'p95_ms':>9} "
+            f"{'max_ms':>9} {'avg_rows':>10} {'err':>4} {'expl':>4}  statement"
+        )
+        for (file_name, step, stmt_index, stmt_hash, head, runs, avg_ms, p95_ms, max_ms, avg_rows, errors, explains) in rows:
+            print(
+                f"{file_name[:32]:32} {(step or '-')[:18]:18} {stmt_index:4d} {stmt_hash:16} {runs:5d} "
+                f"{avg_ms or 0:9.0f} {p95_ms or 0:9.0f} {max_ms or 0:9.0f} {avg_rows or 0:10.0f} "
+                f"{errors:4d} {explains:4d}  {(head or '')[:80]}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+# raw_sync stage -> raw/core table whose row count growth is reported for it
+STAGES = [
+    ("full_load_bom", "raw.raw_bom_consumption"),
+    ("full_load_stock", "raw.raw_stock_movements"),
+    ("full_load_stock_master", "raw.stock_master"),
+    ("incremental_bom", "raw.raw_bom_consumption"),
+    ("incremental_stock", "raw.raw_stock_movements"),
+    ("refresh_open_orders", "raw.raw_open_order_movements"),
+    ("incremental_bom_unique_materials", "core.bom_unique_materials"),
+    ("incremental_mapping", "core.bom_to_stock_map"),
+    ("incremental_raw_current_stock", "core.raw_current_stock"),
+    ("incremental_current_stock_by_variant", "core.current_stock_by_variant"),
+    ("incremental_seat_events", "core.seat_count_events"),
+    ("run_monthly_seat", "core.seat_count_events"),
+    ("run_dashboard_refresh", "core.dashboard_material_overview"),
+]
+
+
+class StageStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.fb_statements = 0
+
+
+def count_rows(pg, table: str) -> Optional[int]:
+    with pg.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if cur.fetchone()[0] is None:
+            return None
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        return int(cur.fetchone()[0])
+
+
+def instrument(r, fb_standin, pg, stats: Dict[str, StageStats]) -> None:
+    """
+    Wrap raw_sync stage functions so nested calls from run_full/run_incremental are timed.
+    pg is a separate autocommit connection, so counting never touches the ETL transaction.
+    """
+    active: List[str] = []
+
+    def wrap(name: str, table: str, fn: Callable):
+        def timed(*args, **kwargs):
+            if active:
+                # nested stage (e.g. run_monthly_seat inside incremental_seat_events): the outer stage owns the time
+                return fn(*args, **kwargs)
+            before = count_rows(pg, table) or 0
+            fb_before = fb_standin.STATEMENTS
+            active.append(name)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                active.pop()
+                s = stats.setdefault(name, StageStats())
+                s.calls += 1
+                s.seconds += elapsed
+                s.rows += max((count_rows(pg, table) or 0) - before, 0)
+                s.fb_statements += fb_standin.STATEMENTS - fb_before
+
+        return timed
+
+    for name, table in STAGES:
+        setattr(r, name, wrap(name, table, getattr(r, name)))
+
+
+def print_report(title: str, stats: Dict[str, StageStats], total_seconds: float) -> None:
+    print(f"\n== {title} ({total_seconds:.1f}s) ==")
+    print(f"{'stage':38} {'calls':>5} {'seconds':>9} {'rows':>10} {'rows/s':>10} {'fb_stmts':>9}")
+    for name, _ in STAGES:
+        s = stats.get(name)
+        if not s:
+            continue
+        rate = s.rows / s.seconds if s.seconds > 0 else 0.0
+        print(f"{name:38} {s.calls:5d} {s.seconds:9.2f} {s.rows:10d} {rate:10.0f} {s.fb_statements:9d}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run raw_sync run_full/run_incremental against the SQLite Firebird stand-in and a scratch PostgreSQL"
+    )
+    parser.add_argument("--fb-db", default="bench_fb.sqlite", help="stand-in SQLite file (generated if missing)")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the stand-in even if the file exists")
+    parser.add_argument("--materials", type=int, default=200)
+    parser.add_argument("--start", default="2023-01-01")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--orders-per-day", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--pg-db", required=True, help="scratch PostgreSQL database (raw tables are truncated)")
+    parser.add_argument("--allow-main-db", action="store_true", help="allow --pg-db tkis_stockwise")
+    parser.add_argument("--skip-full", action="store_true", help="only benchmark incremental rounds")
+    parser.add_argument("--rounds", type=int, default=3, help="incremental rounds after the full load")
+    parser.add_argument("--round-days", type=int, default=1, help="days of new activity appended before each round")
+    parser.add_argument("--with-refresh", action="store_true", help="also run open-order/dashboard refresh jobs in incremental rounds")
+    args = parser.parse_args()
+
+    if args.pg_db == "tkis_stockwise" and not args.allow_main_db:
+        parser.error("refusing to truncate the main database; pass a scratch --pg-db or --allow-main-db")
+
+    end = date.fromisoformat(args.start) + timedelta(days=args.days - 1)
+    os.environ.update({
+        "FB_SOURCE": f"sqlite:{os.path.abspath(args.fb_db)}",
+        "PG_DB": args.pg_db,
+        "FULL_START": args.start,
+        "FULL_END": end.isoformat(),
+        "BOM_BACKUP_DIR": "",
+        "FORECAST_MODE": "off",
+    })
+
+    sys.path.append(str(Path(__file__).resolve().parents[2] / "etl"))
+    import fb_standin
+    import raw_sync as r
+
+    r.setup_logger()
+    if args.regenerate or not os.path.exists(args.fb_db):
+        counts = fb_standin.generate(
+            args.fb_db,
+            materials=args.materials,
+            start=args.start,
+            days=args.days,
+            orders_per_day=args.orders_per_day,
+            seed=args.seed,
+        )
+        print(f"Generated {args.fb_db}: {counts}")
+
+    pg = r.connect_pg()
+    r.ensure_pg_schema(pg)
+    count_pg = r.connect_pg()
+    count_pg.autocommit = True
+
+    stats: Dict[str, StageStats] = {}
+    instrument(r, fb_standin, count_pg, stats)
+    if not args.skip_full:
+        started = time.perf_counter()
+        r.run_full(pg)
+        print_report("run_full", stats, time.perf_counter() - started)
+
+    for round_no in range(1, args.rounds + 1):
+        added = fb_standin.append_activity(args.fb_db, days=args.round_days, orders_per_day=args.orders_per_day, seed=args.seed + round_no)
+        stats.clear()
+        started = time.perf_counter()
+        r.run_incremental(pg, run_refresh_jobs=args.with_refresh)
+        print_report(f"run_incremental round {round_no} (+{added['headers']} headers)", stats, time.perf_counter() - started)
+
+    count_pg.close()
+    pg.close()
+    r.close_fb()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "etl"))
+
+import forecast_backtest as fb  # noqa: E402
+from run_forecast import build_conn_str  # noqa: E402
+
+
+def select(series, candidates, selection: str, counts: dict):
+    started = time.perf_counter()
+    sums = fb.backtest_material(series, candidates, counts, selection)
+    elapsed = time.perf_counter() - started
+    return sums, fb.choose_best_method(sums), elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare full 52-origin model selection with successive halving on core.weekly_consumption_sparse (read-only)"
+    )
+    parser.add_argument("--pg-conn", default=None, help="psycopg2 conninfo (default: PG_* env)")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N materials (0 = all)")
+    parser.add_argument("--no-prune", action="store_true", help="ignore demand-class candidate pruning")
+    parser.add_argument("--stride", type=int, default=fb.HALVING_STRIDE)
+    parser.add_argument("--keep", type=int, default=fb.HALVING_KEEP)
+    parser.add_argument("--out", default="", help="optional CSV with one row per material")
+    args = parser.parse_args()
+
+    fb.HALVING_STRIDE = args.stride
+    fb.HALVING_KEEP = args.keep
+
+    conn = fb.pg_conn(args.pg_conn or build_conn_str())
+    try:
+        df = fb.load_weekly(conn)
+    finally:
+        conn.close()
+    demand = fb.classify_demand(df)
+
+    counts = {
+        mode: {"fits": 0, "fits_avoided": 0, "ets_fits_avoided": 0, "halving_fits_avoided": 0}
+        for mode in ("full", "halving")
+    }
+    seconds = {"full": 0.0, "halving": 0.0}
+    compared = 0
+    agree = 0
+    regret_sum = 0.0
+    full_best = fb.MetricSums()
+    halving_best = fb.MetricSums()
+    rows = []
+
+    for i, (mat, g) in enumerate(df.groupby("bom_material_name")):
+        if args.limit and i >= args.limit:
+            break
+        s = g.set_index("week_start")["qty"].sort_index()
+        if fb.material_inactive(s):
+            continue
+        demand_class = str(demand.at[mat, "demand_class"])
+        candidates = None if args.no_prune else fb.DEMAND_CLASS_MODELS[demand_class]
+
+        full_sums, full_method, full_s = select(s, candidates, "full", counts["full"])
+        halving_sums, halving_method, halving_s = select(s, candidates, "halving", counts["halving"])
+        seconds["full"] += full_s
+        seconds["halving"] += halving_s
+        if full_method == "NO_DATA":
+            continue
+
+        compared += 1
+        agree += int(full_method == halving_method)
+        # regret: full-evaluation WAPE of the halving choice minus the best full WAPE
+        # (both modes backtest the same candidates; NO_DATA when every survivor scored inf)
+        chosen_full = full_sums.get(halving_method, fb.MetricSums(abs_err=float("inf")))
+        full_wape = full_sums[full_method].wape()
+        regret = chosen_full.wape() - full_wape
+        if regret != float("inf"):
+            regret_sum += regret
+        for total, sums in ((full_best, full_sums[full_method]), (halving_best, chosen_full)):
+            total.abs_err += sums.abs_err
+            total.actual_sum += sums.actual_sum
+            total.count += sums.count
+        rows.append({
+            "bom_material_name": mat,
+            "demand_class": demand_class,
+            "full_method": full_method,
+            "halving_method": halving_method,
+            "full_wape": round(full_wape, 3),
+            "halving_wape": round(chosen_full.wape(), 3),
+            "full_seconds": round(full_s, 4),
+            "halving_seconds": round(halving_s, 4),
+        })
+
+    print(f"Materials compared:        {compared}")
+    if compared:
+        print(f"Agreement rate:            {agree / compared * 100.0:.1f}%")
+        print(f"Mean WAPE regret (pp):     {regret_sum / compared:.3f}")
+    print(f"Overall WAPE full/halving: {full_best.wape():.2f} / {halving_best.wape():.2f}")
+    print(f"Backtest seconds:          full={seconds['full']:.1f} halving={seconds['halving']:.1f}", end="")
+    if seconds["full"] > 0:
+        print(f" (saved {(1 - seconds['halving'] / seconds['full']) * 100.0:.1f}%)")
+    else:
+        print()
+    for mode in ("full", "halving"):
+        c = counts[mode]
+        print(f"Model fits {mode:8}         run={c['fits']} halving_avoided={c['halving_fits_avoided']}")
+
+    if args.out and rows:
+        with open(args.out, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Per-material comparison written to {os.path.abspath(args.out)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
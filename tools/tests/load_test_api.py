@@ -0,0 +1,85 @@
+import argparse
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+
+DEFAULT_PATHS = [
+    "/materials?category=KUMA%C5%9E&page=1&page_size=50",
+    "/materials?category=OTHER&page=1&page_size=50",
+    "/forecast-details?category=KUMA%C5%9E&page=1&page_size=50",
+    "/open-orders?page=1&page_size=50",
+    "/suppliers",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def run_user(base_url: str, paths: List[str], deadline: float, results: Dict[str, List[float]], errors: Dict[str, int], lock: threading.Lock) -> None:
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.parse.urljoin(base_url, path), timeout=60) as resp:
+                resp.read()
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with lock:
+                results.setdefault(path, []).append(elapsed_ms)
+        except Exception:
+            with lock:
+                errors[path] = errors.get(path, 0) + 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent-user latency test for the materials API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--seconds", type=float, default=30.0, help="test duration")
+    parser.add_argument("--path", action="append", dest="paths", help="endpoint path (repeatable)")
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_PATHS
+    results: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    print(f"Load test {args.base_url} users={args.users} seconds={args.seconds}")
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for user in range(args.users):
+            # stagger the start so users do not hit the same endpoint in lockstep
+            user_paths = paths[user % len(paths):] + paths[: user % len(paths)]
+            pool.submit(run_user, args.base_url, user_paths, deadline, results, errors, lock)
+
+    all_latencies: List[float] = []
+    print(f"{'endpoint':60} {'n':>6} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for path in paths:
+        values = results.get(path, [])
+        all_latencies.extend(values)
+        print(
+            f"{path[:60]:60} {len(values):6d} {errors.get(path, 0):5d} "
+            f"{percentile(values, 50):9.1f} {percentile(values, 95):9.1f} {percentile(values, 99):9.1f}"
+        )
+    total_requests = len(all_latencies)
+    print(
+        f"{'ALL':60} {total_requests:6d} {sum(errors.values()):5d} "
+        f"{percentile(all_latencies, 50):9.1f} {percentile(all_latencies, 95):9.1f} {percentile(all_latencies, 99):9.1f}"
+    )
+    print(f"Throughput: {total_requests / args.seconds:.1f} req/s (latencies in ms)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())